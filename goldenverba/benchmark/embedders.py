@@ -0,0 +1,81 @@
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from wasabi import msg
+
+from goldenverba.benchmark.synthetic import synthetic_texts
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_embedder(embedder_name: str, chunks: int, words: int) -> dict:
+    """Embed synthetic chunks with one embedder in the current process
+    @parameter embedder_name : str - Key of the embedder in the EmbeddingManager
+    @parameter chunks : int - Number of chunks to embed
+    @parameter words : int - Words per chunk
+    @returns dict - Load time, throughput and peak RSS
+    """
+    from goldenverba.ingestion.embedding.manager import EmbeddingManager
+
+    texts = synthetic_texts(chunks, words)
+    embedder = EmbeddingManager().embedders[embedder_name]
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    embedder.ensure_loaded()
+    load_seconds = time.perf_counter() - start
+
+    # Warm-up so lazy allocations are not counted as throughput
+    embedder.vectorize_chunks(texts[:8])
+
+    start = time.perf_counter()
+    vectors = embedder.vectorize_chunks(texts)
+    seconds = time.perf_counter() - start
+
+    return {
+        "embedder": embedder_name,
+        "chunks": chunks,
+        "words_per_chunk": words,
+        "dimensions": len(vectors[0]) if vectors else 0,
+        "load_seconds": round(load_seconds, 3),
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(chunks / max(seconds, 1e-9), 2),
+        "rss_before_load_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def compare_embedders(embedder_names: list[str], chunks: int, words: int) -> list[dict]:
+    """Benchmark every embedder in its own process so peak RSS is not shared between backends
+    @parameter embedder_names : list[str] - Keys of the embedders in the EmbeddingManager
+    @parameter chunks : int - Number of chunks to embed
+    @parameter words : int - Words per chunk
+    @returns list[dict] - One result per embedder
+    """
+    results = []
+    for name in embedder_names:
+        msg.info(f"Benchmarking {name} on {chunks} chunks of {words} words")
+        completed = subprocess.run(
+            [sys.executable, "-m", "goldenverba.benchmark.embedders", name, str(chunks), str(words)],
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            msg.fail(f"{name} failed: {completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        msg.good(
+            f"{name}: {result['chunks_per_second']} chunks/s, peak RSS {result['peak_rss_mb']} MB"
+        )
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_embedder(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))))
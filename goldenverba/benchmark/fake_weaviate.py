@@ -0,0 +1,468 @@
+import copy
+import fnmatch
+import math
+import os
+import re
+import threading
+import time
+import uuid as uuid_lib
+
+from collections import Counter
+from typing import Callable, Optional
+
+from wasabi import msg
+
+WORD = re.compile(r"\w+")
+
+
+def _tokenize(text) -> list[str]:
+    return WORD.findall(str(text).lower())
+
+
+def _tenant_name(tenant) -> str:
+    return tenant if isinstance(tenant, str) else tenant.name
+
+
+class _Store:
+    """
+    Objects of the stand-in, by class and tenant. A single lock is enough, the stand-in exists to
+    measure Verba and not to be fast itself
+    """
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.classes: dict[str, dict] = {}
+        self.tenants: dict[str, set] = {}
+        self.objects: dict[tuple, dict] = {}
+        self.lock = threading.RLock()
+        self.calls = Counter()
+
+    def wait(self, operation: str) -> None:
+        self.calls[operation] += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def bucket(self, class_name: str, tenant: Optional[str]) -> dict:
+        """Objects of a class in a tenant, raises like Weaviate when the class or tenant is unknown"""
+        if class_name not in self.classes:
+            raise ValueError(f"class {class_name} does not exist")
+        if self.multi_tenant(class_name):
+            if tenant is None:
+                raise ValueError(f"class {class_name} has multi-tenancy enabled, but request was without tenant")
+            if tenant not in self.tenants[class_name]:
+                raise ValueError(f"tenant {tenant} not found for class {class_name}")
+        return self.objects.setdefault((class_name, tenant), {})
+
+    def multi_tenant(self, class_name: str) -> bool:
+        return self.classes[class_name].get("multiTenancyConfig", {}).get("enabled", False)
+
+
+class FakeQueryBuilder:
+    def __init__(self, store: _Store, class_name: str, properties):
+        self.store = store
+        self.class_name = class_name
+        self.properties = [properties] if isinstance(properties, str) else list(properties or [])
+        self.tenant = None
+        self.where = None
+        self.limit = None
+        self.offset = 0
+        self.after = None
+        self.additional = []
+        self.search = None
+
+    def with_tenant(self, tenant: str) -> "FakeQueryBuilder":
+        self.tenant = tenant
+        return self
+
+    def with_where(self, content: dict) -> "FakeQueryBuilder":
+        self.where = content
+        return self
+
+    def with_limit(self, limit: int) -> "FakeQueryBuilder":
+        self.limit = limit
+        return self
+
+    def with_offset(self, offset: int) -> "FakeQueryBuilder":
+        self.offset = offset
+        return self
+
+    def with_after(self, uuid: str) -> "FakeQueryBuilder":
+        """Cursor: objects in id order after the given id"""
+        self.after = str(uuid)
+        return self
+
+    def with_additional(self, properties) -> "FakeQueryBuilder":
+        if isinstance(properties, str):
+            properties = [properties]
+        self.additional += list(properties)
+        return self
+
+    def with_hybrid(self, query: str, alpha: float = None, vector=None, properties=None, **kwargs) -> "FakeQueryBuilder":
+        self.search = ("score", query, properties)
+        return self
+
+    def with_bm25(self, query: str, properties=None) -> "FakeQueryBuilder":
+        self.search = ("score", query, properties)
+        return self
+
+    def with_near_text(self, content: dict) -> "FakeQueryBuilder":
+        concepts = content.get("concepts", "")
+        query = " ".join(concepts) if isinstance(concepts, list) else concepts
+        self.search = ("distance", query, None)
+        return self
+
+    def with_generate(self, single_prompt: str = None, grouped_task: str = None, **kwargs) -> "FakeQueryBuilder":
+        self.additional.append("generate")
+        return self
+
+    def do(self) -> dict:
+        self.store.wait("query")
+        try:
+            with self.store.lock:
+                objects = list(self.store.bucket(self.class_name, self.tenant).items())
+                results = self._run(objects)
+        except ValueError as e:
+            return {"data": {"Get": {self.class_name: None}}, "errors": [{"message": str(e)}]}
+        return {"data": {"Get": {self.class_name: results}}}
+
+    def _run(self, objects: list) -> list[dict]:
+        if self.where is not None:
+            objects = [item for item in objects if _matches(item[1]["properties"], self.where)]
+        if self.after is not None:
+            objects = sorted((item for item in objects if item[0] > self.after), key=lambda item: item[0])
+
+        scores = {}
+        if self.search is not None:
+            _, query, properties = self.search
+            scores = _bm25(query, objects, properties)
+            objects = [item for item in objects if scores.get(item[0], 0) > 0]
+            objects.sort(key=lambda item: scores[item[0]], reverse=True)
+
+        end = None if self.limit is None else self.offset + self.limit
+        results = []
+        for object_id, item in objects[self.offset : end]:
+            result = {
+                name: copy.deepcopy(item["properties"].get(name))
+                for name in self.properties
+            }
+            additional = self._additional(object_id, item, scores)
+            if additional:
+                result["_additional"] = additional
+            results.append(result)
+        return results
+
+    def _additional(self, object_id: str, item: dict, scores: dict) -> dict:
+        additional = {}
+        for name in self.additional:
+            if name == "id":
+                additional["id"] = object_id
+            elif name == "score":
+                additional["score"] = str(scores.get(object_id, 0.0))
+            elif name == "distance":
+                # Map the unbounded keyword score into a cosine-like distance
+                additional["distance"] = 1.0 / (1.0 + scores.get(object_id, 0.0))
+            elif name == "vector":
+                additional["vector"] = item["vector"]
+            elif name == "generate":
+                additional["generate"] = {"groupedResult": "", "error": None}
+        return additional
+
+
+def _bm25(query: str, objects: list, properties: Optional[list], k1: float = 1.2, b: float = 0.75) -> dict:
+    """Okapi BM25 over the text properties, stands in for both keyword and vector search"""
+    terms = set(_tokenize(query))
+    if not terms or not objects:
+        return {}
+
+    documents = {}
+    for object_id, item in objects:
+        values = [
+            value
+            for name, value in item["properties"].items()
+            if isinstance(value, str) and (not properties or name in properties)
+        ]
+        documents[object_id] = Counter(_tokenize(" ".join(values)))
+
+    average_length = sum(sum(counts.values()) for counts in documents.values()) / len(documents)
+    frequencies = {term: sum(1 for counts in documents.values() if term in counts) for term in terms}
+
+    scores = {}
+    for object_id, counts in documents.items():
+        length = sum(counts.values())
+        score = 0.0
+        for term in terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(documents) - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / max(average_length, 1e-9)))
+        scores[object_id] = score
+    return scores
+
+
+def _matches(properties: dict, where: dict) -> bool:
+    operator = where["operator"]
+    if operator == "And":
+        return all(_matches(properties, operand) for operand in where["operands"])
+    if operator == "Or":
+        return any(_matches(properties, operand) for operand in where["operands"])
+
+    path = where["path"]
+    value = properties.get(path[-1] if isinstance(path, list) else path)
+    if operator == "IsNull":
+        return (value is None) == where.get("valueBoolean", True)
+
+    expected = next(
+        where[key]
+        for key in where
+        if key.startswith("value")
+    )
+    if operator == "Equal":
+        return value == expected
+    if operator == "NotEqual":
+        return value != expected
+    if operator == "Like":
+        return value is not None and fnmatch.fnmatchcase(str(value), expected)
+    if operator == "ContainsAny":
+        return value is not None and any(item in _as_list(value) for item in expected)
+    if operator == "ContainsAll":
+        return value is not None and all(item in _as_list(value) for item in expected)
+    if value is None:
+        return False
+    if operator == "GreaterThan":
+        return value > expected
+    if operator == "GreaterThanEqual":
+        return value >= expected
+    if operator == "LessThan":
+        return value < expected
+    if operator == "LessThanEqual":
+        return value <= expected
+    raise ValueError(f"Unsupported operator {operator}")
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+class FakeQuery:
+    def __init__(self, store: _Store):
+        self.store = store
+
+    def get(self, class_name: str, properties=None) -> FakeQueryBuilder:
+        return FakeQueryBuilder(self.store, class_name, properties)
+
+
+class FakeBatch:
+    """Objects are applied when added, the configured callback receives the results when the context exits"""
+
+    def __init__(self, store: _Store):
+        self.store = store
+        self.batch_size = None
+        self.callback: Optional[Callable] = None
+        self.pending = []
+
+    def configure(self, batch_size: int = None, callback: Callable = None, **kwargs) -> "FakeBatch":
+        self.batch_size = batch_size
+        self.callback = callback
+        return self
+
+    def __enter__(self) -> "FakeBatch":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        self.store.wait("batch")
+        results, self.pending = self.pending, []
+        if self.callback is not None:
+            self.callback(results)
+
+    def add_data_object(self, data_object: dict, class_name: str, uuid: str = None, vector=None, tenant: str = None) -> str:
+        object_id = str(uuid or uuid_lib.uuid4())
+        result = {"id": object_id, "class": class_name, "result": {}}
+        try:
+            with self.store.lock:
+                self.store.bucket(class_name, tenant)[object_id] = {
+                    "properties": copy.deepcopy(data_object),
+                    "vector": list(vector) if vector is not None else None,
+                    "creationTimeUnix": int(time.time() * 1000),
+                }
+        except ValueError as e:
+            result["result"] = {"errors": {"error": [{"message": str(e)}]}}
+        self.pending.append(result)
+
+        if self.batch_size and len(self.pending) >= self.batch_size:
+            self.flush()
+        return object_id
+
+    def delete_objects(self, class_name: str, where: dict, tenant: str = None, **kwargs) -> dict:
+        self.store.wait("batch_delete")
+        with self.store.lock:
+            bucket = self.store.bucket(class_name, tenant)
+            matches = [object_id for object_id, item in bucket.items() if _matches(item["properties"], where)]
+            for object_id in matches:
+                del bucket[object_id]
+        return {"results": {"matches": len(matches), "successful": len(matches), "failed": 0}}
+
+
+class FakeDataObject:
+    def __init__(self, store: _Store):
+        self.store = store
+
+    def get_by_id(self, uuid: str, class_name: str = None, tenant: str = None, **kwargs) -> Optional[dict]:
+        self.store.wait("data_object")
+        with self.store.lock:
+            item = self.store.bucket(class_name, tenant).get(str(uuid))
+            if item is None:
+                return None
+            return {
+                "class": class_name,
+                "id": str(uuid),
+                "properties": copy.deepcopy(item["properties"]),
+                "tenant": tenant or "",
+                "creationTimeUnix": item["creationTimeUnix"],
+                "lastUpdateTimeUnix": item["creationTimeUnix"],
+                "vectorWeights": None,
+            }
+
+    def exists(self, uuid: str, class_name: str = None, tenant: str = None, **kwargs) -> bool:
+        return self.get_by_id(uuid, class_name, tenant) is not None
+
+    def delete(self, uuid: str, class_name: str = None, tenant: str = None, **kwargs) -> None:
+        self.store.wait("data_object")
+        with self.store.lock:
+            self.store.bucket(class_name, tenant).pop(str(uuid), None)
+
+
+class FakeProperty:
+    def __init__(self, store: _Store):
+        self.store = store
+
+    def create(self, schema_class_name: str, schema_property: dict) -> None:
+        self.store.wait("schema")
+        with self.store.lock:
+            self.store.classes[schema_class_name].setdefault("properties", []).append(copy.deepcopy(schema_property))
+
+
+class FakeSchema:
+    def __init__(self, store: _Store):
+        self.store = store
+        self.property = FakeProperty(store)
+
+    def get(self, class_name: str = None) -> dict:
+        self.store.wait("schema")
+        with self.store.lock:
+            if class_name is not None:
+                return copy.deepcopy(self.store.classes[class_name])
+            return {"classes": copy.deepcopy(list(self.store.classes.values()))}
+
+    def exists(self, class_name: str) -> bool:
+        self.store.wait("schema")
+        return class_name in self.store.classes
+
+    def contains(self, schema: dict = None) -> bool:
+        if schema is None:
+            return bool(self.store.classes)
+        classes = schema.get("classes", [schema])
+        return all(_class["class"] in self.store.classes for _class in classes)
+
+    def create(self, schema: dict) -> None:
+        for _class in schema.get("classes", []):
+            self.create_class(_class)
+
+    def create_class(self, schema_class: dict) -> None:
+        self.store.wait("schema")
+        with self.store.lock:
+            if schema_class["class"] in self.store.classes:
+                raise ValueError(f"class {schema_class['class']} already exists")
+            self.store.classes[schema_class["class"]] = copy.deepcopy(schema_class)
+            self.store.tenants[schema_class["class"]] = set()
+
+    def update_config(self, class_name: str, config: dict) -> None:
+        self.store.wait("schema")
+        with self.store.lock:
+            _merge(self.store.classes[class_name], config)
+
+    def delete_class(self, class_name: str) -> None:
+        self.store.wait("schema")
+        with self.store.lock:
+            self.store.classes.pop(class_name, None)
+            self.store.tenants.pop(class_name, None)
+            for key in [key for key in self.store.objects if key[0] == class_name]:
+                del self.store.objects[key]
+
+    def delete_all(self) -> None:
+        for class_name in list(self.store.classes):
+            self.delete_class(class_name)
+
+    def add_class_tenants(self, class_name: str, tenants: list) -> None:
+        self.store.wait("schema")
+        with self.store.lock:
+            names = [_tenant_name(tenant) for tenant in tenants]
+            # Weaviate rejects the whole request when one of the tenants exists
+            existing = [name for name in names if name in self.store.tenants[class_name]]
+            if existing:
+                raise Exception(f"422: tenant {existing[0]} of {class_name} already exists")
+            self.store.tenants[class_name].update(names)
+
+    def get_class_tenants(self, class_name: str) -> list:
+        from weaviate import Tenant
+
+        self.store.wait("schema")
+        with self.store.lock:
+            return [Tenant(name=name) for name in sorted(self.store.tenants[class_name])]
+
+    def remove_class_tenants(self, class_name: str, tenants: list) -> None:
+        self.store.wait("schema")
+        with self.store.lock:
+            for name in (_tenant_name(tenant) for tenant in tenants):
+                self.store.tenants[class_name].discard(name)
+                self.store.objects.pop((class_name, name), None)
+
+
+def _merge(target: dict, update: dict) -> None:
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+class _Connection:
+    embedded_db = None
+
+
+class FakeWeaviateClient:
+    """
+    In-memory stand-in for the subset of the weaviate v3 Client used by Verba: query builder (hybrid, bm25,
+    near_text, where, limit), batch, data_object and schema tenants. Keyword BM25 scores stand in for vector search,
+    so answers are plausible but not semantic. Every call sleeps VERBA_WEAVIATE_STANDIN_LATENCY_MS to mimic the network
+    """
+
+    def __init__(self, latency_ms: float = None):
+        if latency_ms is None:
+            latency_ms = float(os.getenv("VERBA_WEAVIATE_STANDIN_LATENCY_MS", 0))
+        self._store = _Store(latency_ms)
+        self._connection = _Connection()
+        self.query = FakeQuery(self._store)
+        self.batch = FakeBatch(self._store)
+        self.data_object = FakeDataObject(self._store)
+        self.schema = FakeSchema(self._store)
+        msg.info(f"Using the in-memory Weaviate stand-in ({latency_ms} ms per call)")
+
+    def new_batch(self) -> FakeBatch:
+        """Batch of its own on the same store, like a weaviate Batch on the connection of the client"""
+        return FakeBatch(self._store)
+
+    def is_ready(self) -> bool:
+        return True
+
+    def is_live(self) -> bool:
+        return True
+
+    def calls(self) -> dict:
+        """Number of calls by operation, useful to assert how chatty a code path is"""
+        return dict(self._store.calls)
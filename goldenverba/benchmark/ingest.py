@@ -0,0 +1,377 @@
+import base64
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Callable, Iterator
+
+from wasabi import msg
+
+from goldenverba.benchmark.synthetic import synthetic_text
+
+# (documents, words per document), from a smoke test to a multi-GB corpus
+CORPUS_SIZES = {
+    "tiny": (20, 500),
+    "small": (200, 2000),
+    "medium": (2000, 5000),
+    "large": (20000, 5000),
+    "xlarge": (100000, 5000),
+}
+
+STAGES = [
+    "read_simple",
+    "read_path",
+    "chunk_word",
+    "chunk_sentence",
+    "check_chunks",
+    "embed_minilm",
+    "weaviate_batch",
+]
+
+
+def synthetic_corpus(documents: int, words: int, seed: int = 0) -> Iterator[tuple[str, str]]:
+    """Yield (file name, text) pairs so that corpora larger than memory can be generated
+    @parameter documents : int - Number of documents
+    @parameter words : int - Average words per document, actual sizes vary between half and one and a half times that
+    @parameter seed : int - Seed of the generator
+    """
+    rng = random.Random(seed)
+    for i in range(documents):
+        yield f"doc_{i:07d}.md", synthetic_text(rng.randint(words // 2, words * 3 // 2), rng)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.documents = 0
+        self.chunks = 0
+        self.peak_traced_bytes = 0
+        self.peak_rss_mb = 0.0
+        self.error = ""
+        self.skipped = ""
+
+    def to_dict(self) -> dict:
+        result = {
+            "stage": self.name,
+            "seconds": round(self.seconds, 3),
+            "documents": self.documents,
+            "chunks": self.chunks,
+            "docs_per_second": round(self.documents / self.seconds, 2) if self.seconds else 0.0,
+            "chunks_per_second": round(self.chunks / self.seconds, 2) if self.seconds else 0.0,
+            "peak_traced_mb": round(self.peak_traced_bytes / 1024 / 1024, 2),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+        }
+        if self.error:
+            result["error"] = self.error
+        if self.skipped:
+            result["skipped"] = self.skipped
+        return result
+
+
+class IngestBenchmark:
+    """
+    Runs the ingestion components stage by stage on a synthetic corpus, one batch of documents at a time
+    like consecutive uploads, and aggregates throughput, peak RSS and traced allocations per stage
+    """
+
+    def __init__(
+        self,
+        documents: int,
+        words: int,
+        batch_documents: int = 100,
+        embed_chunks: int = 2000,
+        units: int = 100,
+        overlap: int = 50,
+        stages: list[str] = None,
+        trace_allocations: bool = True,
+        quiet: bool = True,
+    ):
+        self.documents = documents
+        self.words = words
+        self.batch_documents = batch_documents
+        self.embed_chunks = embed_chunks
+        self.units = units
+        self.overlap = overlap
+        self.stages = stages or STAGES
+        self.trace_allocations = trace_allocations
+        self.quiet = quiet
+        self.stats = {name: StageStats(name) for name in self.stages}
+        self.corpus_bytes = 0
+
+    def measure(self, name: str, function: Callable, documents: int = 0, chunks: Callable = None):
+        """Run one stage on one batch and add its cost to the stage totals
+        @parameter name : str - Stage name
+        @parameter function : Callable - Stage body, its return value is passed through
+        @parameter documents : int - Documents processed by this call
+        @parameter chunks : Callable - Computes the chunks processed from the return value
+        """
+        stats = self.stats[name]
+        if stats.error or stats.skipped:
+            return None
+
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.quiet:
+                    # Components log every file and chunk, keep the terminal readable
+                    devnull = stack.enter_context(open(os.devnull, "w"))
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                result = function()
+        except Exception as e:
+            stats.error = f"{type(e).__name__}: {str(e)[:200]}"
+            msg.warn(f"Stage {name} failed: {stats.error}")
+            return None
+        stats.seconds += time.perf_counter() - start
+
+        if self.trace_allocations:
+            stats.peak_traced_bytes = max(
+                stats.peak_traced_bytes, tracemalloc.get_traced_memory()[1] - baseline
+            )
+        stats.peak_rss_mb = max(stats.peak_rss_mb, _peak_rss_mb())
+        stats.documents += documents
+        if chunks is not None:
+            stats.chunks += chunks(result)
+        return result
+
+    def run(self) -> dict:
+        from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+        from goldenverba.ingestion.reader.simplereader import SimpleReader
+        from goldenverba.ingestion.reader.pathreader import PathReader
+        from goldenverba.ingestion.reader.document import Document
+        from goldenverba.ingestion.chunking.wordchunker import WordChunker
+        from goldenverba.ingestion.chunking.sentencechunker import SentenceChunker
+        from goldenverba.ingestion.chunking.manager import ChunkerManager, get_encoding
+        from goldenverba.ingestion.embedding.ADAEmbedder import ADAEmbedder
+        from goldenverba.ingestion.schema import schema_generation
+
+        simple_reader, path_reader = SimpleReader(), PathReader()
+        word_chunker, sentence_chunker = WordChunker(), SentenceChunker()
+        chunker_manager = ChunkerManager()
+        minilm = self._load_minilm() if "embed_minilm" in self.stages else None
+        if "weaviate_batch" in self.stages:
+            client = FakeWeaviateClient(latency_ms=0)
+            schema_generation.init_documents(client, "text2vec-openai")
+            batch_embedder = ADAEmbedder()
+
+        # Library imports and model loads are startup costs, keep them out of the stage timings
+        for component in (simple_reader, path_reader, word_chunker, sentence_chunker):
+            component.ensure_loaded()
+        if "check_chunks" in self.stages:
+            try:
+                get_encoding()
+            except Exception as e:
+                self.stats["check_chunks"].error = f"{type(e).__name__}: {str(e)[:200]}"
+
+        if self.trace_allocations:
+            tracemalloc.start()
+        rss_start = _peak_rss_mb()
+        start = time.perf_counter()
+        embedded = 0
+
+        corpus = synthetic_corpus(self.documents, self.words)
+        with tempfile.TemporaryDirectory(prefix="verba-bench-") as directory:
+            while True:
+                batch = [item for _, item in zip(range(self.batch_documents), corpus)]
+                if not batch:
+                    break
+                self.corpus_bytes += sum(len(text.encode("utf-8")) for _, text in batch)
+                count = len(batch)
+
+                documents = None
+                if "read_simple" in self.stages:
+                    encoded = [base64.b64encode(text.encode("utf-8")).decode("ascii") for _, text in batch]
+                    names = [name for name, _ in batch]
+                    documents = self.measure(
+                        "read_simple",
+                        lambda: simple_reader.load(encoded, [], [], names, "Benchmark"),
+                        count,
+                    )
+                if not documents:
+                    documents = [Document(text=text, name=name, type="Benchmark") for name, text in batch]
+
+                if "read_path" in self.stages:
+                    batch_directory = Path(directory) / "batch"
+                    batch_directory.mkdir(exist_ok=True)
+                    for old in batch_directory.iterdir():
+                        old.unlink()
+                    for name, text in batch:
+                        (batch_directory / name).write_text(text, encoding="utf-8")
+                    self.measure(
+                        "read_path",
+                        lambda: path_reader.load([str(batch_directory)], "Benchmark"),
+                        count,
+                    )
+
+                if "chunk_sentence" in self.stages:
+                    copies = [Document(text=d.text, name=d.name, type=d.type) for d in documents]
+                    self.measure(
+                        "chunk_sentence",
+                        lambda: sentence_chunker.chunk(copies, max(1, self.units // 20), self.overlap // 20),
+                        count,
+                        lambda result: sum(len(d.chunks) for d in result or []),
+                    )
+
+                if "chunk_word" in self.stages:
+                    self.measure(
+                        "chunk_word",
+                        lambda: word_chunker.chunk(documents, self.units, self.overlap),
+                        count,
+                        lambda result: sum(len(d.chunks) for d in result or []),
+                    )
+                else:
+                    # The later stages need chunks even when chunking itself is not measured
+                    word_chunker.chunk(documents, self.units, self.overlap)
+
+                chunk_count = sum(len(d.chunks) for d in documents)
+                if "check_chunks" in self.stages:
+                    self.measure(
+                        "check_chunks",
+                        lambda: chunker_manager.check_chunks(documents),
+                        count,
+                        lambda _: chunk_count,
+                    )
+
+                # The batch path sizes Weaviate batches by token count, approximate it when the check did not run
+                for chunk in (c for d in documents for c in d.chunks):
+                    if not isinstance(chunk.tokens, list):
+                        chunk.set_tokens(chunk.text.split())
+
+                if minilm is not None and embedded < self.embed_chunks:
+                    texts = [c.text for d in documents for c in d.chunks][: self.embed_chunks - embedded]
+                    self.measure(
+                        "embed_minilm",
+                        lambda: minilm.vectorize_chunks(texts),
+                        0,
+                        lambda vectors: len(vectors or []),
+                    )
+                    embedded += len(texts)
+
+                if "weaviate_batch" in self.stages:
+                    self.measure(
+                        "weaviate_batch",
+                        lambda: batch_embedder.import_data(documents, client),
+                        count,
+                        lambda _: chunk_count,
+                    )
+
+        seconds = time.perf_counter() - start
+        if self.trace_allocations:
+            tracemalloc.stop()
+
+        return {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": {
+                "documents": self.documents,
+                "words_per_document": self.words,
+                "megabytes": round(self.corpus_bytes / 1024 / 1024, 2),
+                "batch_documents": self.batch_documents,
+                "units": self.units,
+                "overlap": self.overlap,
+            },
+            "tracemalloc": self.trace_allocations,
+            "seconds": round(seconds, 3),
+            "rss_start_mb": round(rss_start, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "stages": [self.stats[name].to_dict() for name in self.stages],
+        }
+
+    def _load_minilm(self):
+        from goldenverba.ingestion.embedding.MiniLMEmbedder import MiniLMEmbedder
+
+        embedder = MiniLMEmbedder()
+        try:
+            embedder.ensure_loaded()
+        except Exception:
+            pass
+        if embedder.model is None:
+            self.stats["embed_minilm"].skipped = "MiniLM model not available"
+            return None
+        return embedder
+
+
+def run_ingest_benchmark(size: str = "tiny", documents: int = None, words: int = None, output: str = None, **settings) -> dict:
+    """Run the ingestion benchmark and store the results as JSON
+    @parameter size : str - Key of CORPUS_SIZES, documents and words override it
+    @parameter output : str - JSON file, defaults to .verba/benchmarks/ingest-<size>-<commit>.json
+    @returns dict - Results
+    """
+    default_documents, default_words = CORPUS_SIZES[size]
+    benchmark = IngestBenchmark(documents or default_documents, words or default_words, **settings)
+    msg.info(
+        f"Benchmarking ingestion on {benchmark.documents} documents of ~{benchmark.words} words"
+    )
+    results = benchmark.run()
+
+    for stage in results["stages"]:
+        if "error" in stage or "skipped" in stage:
+            msg.warn(f"{stage['stage']:<16} {stage.get('error') or stage.get('skipped')}")
+            continue
+        msg.info(
+            f"{stage['stage']:<16} {stage['seconds']:>9.2f}s {stage['docs_per_second']:>10.1f} docs/s {stage['chunks_per_second']:>10.1f} chunks/s {stage['peak_traced_mb']:>8.1f} MB traced"
+        )
+    msg.good(f"{results['corpus']['megabytes']} MB in {results['seconds']}s, peak RSS {results['peak_rss_mb']} MB")
+
+    if output is None:
+        output = os.path.join(".verba", "benchmarks", f"ingest-{size}-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    msg.good(f"Results written to {output}")
+    return results
+
+
+def compare_results(baseline: dict, candidate: dict) -> list[dict]:
+    """Throughput and memory ratios of two ingestion benchmark results, per stage
+    @parameter baseline : dict - Results of the reference commit
+    @parameter candidate : dict - Results of the commit under test
+    @returns list[dict] - One row per stage present in both runs
+    """
+    before = {stage["stage"]: stage for stage in baseline["stages"]}
+    rows = []
+    for stage in candidate["stages"]:
+        reference = before.get(stage["stage"])
+        if reference is None or not reference["seconds"] or not stage["seconds"]:
+            continue
+        rows.append(
+            {
+                "stage": stage["stage"],
+                "speedup": round(reference["seconds"] / stage["seconds"], 2),
+                "traced_mb_before": reference["peak_traced_mb"],
+                "traced_mb_after": stage["peak_traced_mb"],
+            }
+        )
+    return rows
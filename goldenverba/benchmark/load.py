@@ -0,0 +1,155 @@
+import base64
+import itertools
+import random
+import threading
+import time
+import uuid
+
+from typing import Callable
+
+import requests
+
+from wasabi import msg
+
+from goldenverba.benchmark.synthetic import synthetic_text
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Percentile with linear interpolation between the closest ranks
+    @parameter values : list[float] - Samples
+    @parameter q : float - Percentile between 0 and 100
+    @returns float - Value at the percentile, 0 without samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    """Throughput and latency percentiles of a run, latencies in seconds"""
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(count / max(seconds, 1e-9), 2),
+        "mean_ms": round(sum(latencies) / count * 1000, 1) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def query_payloads(questions: list[str] = None, seed: int = 0) -> Callable[[int], dict]:
+    """Payloads for /api/query, cycles through the given questions or generates synthetic ones"""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def payload(i: int) -> dict:
+        if questions:
+            return {"query": questions[i % len(questions)]}
+        with lock:
+            return {"query": synthetic_text(12, rng)}
+
+    return payload
+
+
+def load_data_payloads(
+    words: int = 2000,
+    reader: str = "SimpleReader",
+    chunker: str = "WordChunker",
+    embedder: str = "ADAEmbedder",
+    seed: int = 0,
+) -> Callable[[int], dict]:
+    """Payloads for /api/load_data, one synthetic document per request with a unique name so none is skipped as a duplicate"""
+    rng = random.Random(seed)
+    run_id = uuid.uuid4().hex[:8]
+    lock = threading.Lock()
+
+    def payload(i: int) -> dict:
+        with lock:
+            text = synthetic_text(words, rng)
+        return {
+            "reader": reader,
+            "chunker": chunker,
+            "embedder": embedder,
+            "fileBytes": [base64.b64encode(text.encode("utf-8")).decode("ascii")],
+            "fileNames": [f"bench_{run_id}_{i}.txt"],
+            "filePath": "",
+            "document_type": "Benchmark",
+            "chunkUnits": 100,
+            "chunkOverlap": 50,
+        }
+
+    return payload
+
+
+def _succeeded(endpoint: str, response: requests.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    if endpoint == "load_data":
+        # load_data reports failures in the body with a 200
+        return str(response.json().get("status")) == "200"
+    return True
+
+
+def run_load(
+    base_url: str,
+    endpoint: str,
+    payload: Callable[[int], dict],
+    concurrency: int = 8,
+    requests_count: int = 100,
+    timeout: float = 120.0,
+) -> dict:
+    """Send requests_count POST requests to one endpoint with a fixed number of concurrent workers
+    @parameter base_url : str - URL of the Verba API, e.g. http://localhost:8000/api
+    @parameter endpoint : str - Endpoint name, query or load_data
+    @parameter payload : Callable[[int], dict] - Builds the JSON body of the i-th request
+    @parameter concurrency : int - Number of requests in flight
+    @parameter requests_count : int - Total number of requests
+    @parameter timeout : float - Timeout of a single request
+    @returns dict - Throughput, error count and latency percentiles
+    """
+    url = f"{base_url.rstrip('/')}/{endpoint}"
+    counter = itertools.count()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            i = next(counter)
+            if i >= requests_count:
+                return
+            body = payload(i)
+            start = time.perf_counter()
+            try:
+                response = session.post(url, json=body, timeout=timeout)
+                ok = _succeeded(endpoint, response)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(i)
+
+    msg.info(f"Sending {requests_count} requests to {url} with concurrency {concurrency}")
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    result = {"endpoint": endpoint, "concurrency": concurrency, **summarize(latencies, len(errors), seconds)}
+    msg.good(
+        f"{endpoint}: {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, {result['errors']} errors"
+    )
+    return result
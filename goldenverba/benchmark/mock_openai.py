@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+
+import numpy as np
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from goldenverba.benchmark.synthetic import synthetic_text
+
+
+def _count_tokens(text: str) -> int:
+    # Close enough to cl100k for English prose and does not need to download an encoding
+    return max(1, round(len(text.split()) * 4 / 3))
+
+
+def _embedding(text: str, dimensions: int) -> list[float]:
+    """Deterministic unit vector derived from the text, so identical chunks get identical vectors"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(
+    latency_ms: float = None,
+    tokens_per_second: float = None,
+    completion_tokens: int = None,
+    dimensions: int = None,
+    error_rate: float = None,
+) -> FastAPI:
+    """Mock of the OpenAI chat completion and embeddings endpoints, in both the OpenAI and the Azure URL layouts
+    @parameter latency_ms : float - Time to first token of every call
+    @parameter tokens_per_second : float - Generation speed, completions take completion_tokens / tokens_per_second longer
+    @parameter completion_tokens : int - Length of every completion
+    @parameter dimensions : int - Dimensions of the embeddings
+    @parameter error_rate : float - Share of calls answered with a 429, to exercise retry and rate limiting paths
+    @returns FastAPI - The app, serve it with uvicorn
+    """
+    latency = (
+        latency_ms if latency_ms is not None else float(os.getenv("VERBA_MOCK_OPENAI_LATENCY_MS", 300))
+    ) / 1000
+    tokens_per_second = tokens_per_second or float(os.getenv("VERBA_MOCK_OPENAI_TOKENS_PER_SECOND", 50))
+    completion_tokens = completion_tokens or int(os.getenv("VERBA_MOCK_OPENAI_COMPLETION_TOKENS", 150))
+    dimensions = dimensions or int(os.getenv("VERBA_MOCK_OPENAI_EMBEDDING_DIMENSIONS", 1536))
+    error_rate = error_rate if error_rate is not None else float(os.getenv("VERBA_MOCK_OPENAI_ERROR_RATE", 0))
+
+    app = FastAPI()
+    rng = random.Random(0)
+
+    def rate_limited() -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": "1"},
+            content={"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "429"}},
+        )
+
+    async def chat_completion(request: Request, model: str = None) -> JSONResponse:
+        body = await request.json()
+        if error_rate and rng.random() < error_rate:
+            return rate_limited()
+
+        prompt_tokens = sum(_count_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+        await asyncio.sleep(latency + completion_tokens / tokens_per_second)
+        content = synthetic_text(round(completion_tokens * 3 / 4), rng)
+
+        return JSONResponse(
+            content={
+                "id": f"chatcmpl-mock-{rng.getrandbits(32):08x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model or body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    async def embeddings(request: Request, model: str = None) -> JSONResponse:
+        body = await request.json()
+        if error_rate and rng.random() < error_rate:
+            return rate_limited()
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(latency)
+
+        return JSONResponse(
+            content={
+                "object": "list",
+                "model": model or body.get("model", "mock"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": _embedding(str(text), dimensions)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {
+                    "prompt_tokens": sum(_count_tokens(str(text)) for text in inputs),
+                    "total_tokens": sum(_count_tokens(str(text)) for text in inputs),
+                },
+            }
+        )
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat_completion(request: Request):
+        return await chat_completion(request)
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_chat_completion(deployment: str, request: Request):
+        return await chat_completion(request, deployment)
+
+    @app.post("/v1/embeddings")
+    async def openai_embeddings(request: Request):
+        return await embeddings(request)
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def azure_embeddings(deployment: str, request: Request):
+        return await embeddings(request, deployment)
+
+    return app
+
+
+def serve(port: int, **settings) -> None:
+    import uvicorn
+
+    uvicorn.run(create_app(**settings), host="127.0.0.1", port=port, log_level="warning")
@@ -0,0 +1,145 @@
+import base64
+import json
+import random
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from wasabi import msg
+
+from goldenverba.benchmark.load import _succeeded, summarize
+from goldenverba.benchmark.synthetic import synthetic_text
+
+
+def read_log(path: str, kinds: tuple = ("query", "retrieve", "ingest")) -> list[dict]:
+    """Records of a query log, oldest first
+    @parameter path : str - JSONL query log written by the server
+    @parameter kinds : tuple - Kinds of records to keep, query, retrieve and/or ingest
+    @returns list[dict] - Log records sorted by timestamp
+    """
+    records = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("kind") in kinds:
+                    records.append(record)
+    return sorted(records, key=lambda record: record["ts"])
+
+
+def replay_schedule(records: list[dict], speedup: float = 1.0) -> list[float]:
+    """Seconds after the start of the replay at which each record is sent, keeping the gaps of the capture divided by speedup"""
+    if not records:
+        return []
+    if speedup <= 0:
+        raise ValueError("speedup must be positive")
+    start = records[0]["ts"]
+    return [(record["ts"] - start) / speedup for record in records]
+
+
+def replay_request(record: dict, rng: random.Random) -> tuple[str, dict]:
+    """Endpoint and JSON body that reproduce a logged request.
+    Uploaded files are not in the log, ingest requests are replayed with synthetic files of the same size
+    """
+    if record["kind"] in ("query", "retrieve"):
+        return record["kind"], {"query": record["query"]}
+
+    files = []
+    for i, size in enumerate(record.get("file_sizes") or []):
+        # About 6 bytes per synthetic word with its separator
+        text = synthetic_text(max(size // 6, 1), rng)
+        files.append((f"replay_{int(record['ts'] * 1000)}_{rng.getrandbits(32):08x}_{i}.txt", text))
+    return "load_data", {
+        "reader": record.get("reader", "SimpleReader"),
+        "chunker": record.get("chunker", "WordChunker"),
+        "embedder": record.get("embedder", "ADAEmbedder"),
+        "fileBytes": [base64.b64encode(text.encode("utf-8")).decode("ascii") for _, text in files],
+        "fileNames": [name for name, _ in files],
+        "filePath": "",
+        "document_type": record.get("document_type", "Documentation"),
+        "chunkUnits": record.get("units", 100),
+        "chunkOverlap": record.get("overlap", 50),
+    }
+
+
+def replay(
+    records: list[dict],
+    base_url: str,
+    speedup: float = 1.0,
+    max_in_flight: int = 64,
+    timeout: float = 120.0,
+    seed: int = 0,
+) -> dict:
+    """Re-issue logged requests open loop: each one is sent at its scheduled time whether or not the previous ones answered
+    @parameter records : list[dict] - Log records, oldest first
+    @parameter base_url : str - URL of the Verba API, e.g. http://localhost:8000/api
+    @parameter speedup : float - 10 replays an hour of traffic in 6 minutes
+    @parameter max_in_flight : int - Requests in flight at most, later ones are sent late rather than piling up threads
+    @parameter timeout : float - Timeout of a single request
+    @returns dict - Latency summary per endpoint and how late requests were sent
+    """
+    schedule = replay_schedule(records, speedup)
+    rng = random.Random(seed)
+    latencies = {"query": [], "retrieve": [], "load_data": []}
+    errors = {"query": 0, "retrieve": 0, "load_data": 0}
+    lags = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(endpoint: str, body: dict) -> None:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = local.session.post(f"{base_url.rstrip('/')}/{endpoint}", json=body, timeout=timeout)
+            ok = _succeeded(endpoint, response)
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[endpoint].append(elapsed)
+            if not ok:
+                errors[endpoint] += 1
+
+    msg.info(
+        f"Replaying {len(records)} requests spanning {schedule[-1] if schedule else 0:.1f} s against {base_url} (speed-up x{speedup})"
+    )
+    slots = threading.BoundedSemaphore(max_in_flight)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for record, at in zip(records, schedule):
+            endpoint, body = replay_request(record, rng)
+            delay = at - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            lags.append(max(time.perf_counter() - start - at, 0.0))
+
+            def task(endpoint=endpoint, body=body):
+                try:
+                    send(endpoint, body)
+                finally:
+                    slots.release()
+
+            pool.submit(task)
+    seconds = time.perf_counter() - start
+
+    result = {
+        "speedup": speedup,
+        "seconds": round(seconds, 3),
+        "max_send_lag_ms": round(max(lags, default=0.0) * 1000, 1),
+    }
+    for endpoint, values in latencies.items():
+        if values:
+            result[endpoint] = summarize(values, errors[endpoint], seconds)
+            msg.good(
+                f"{endpoint}: {result[endpoint]['requests']} requests, p50 {result[endpoint]['p50_ms']} ms, p95 {result[endpoint]['p95_ms']} ms, p99 {result[endpoint]['p99_ms']} ms, {errors[endpoint]} errors"
+            )
+    if result["max_send_lag_ms"] > 1000:
+        msg.warn(
+            f"Requests were sent up to {result['max_send_lag_ms']} ms late, raise --max-in-flight or lower the speed-up"
+        )
+    return result
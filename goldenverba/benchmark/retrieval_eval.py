@@ -0,0 +1,173 @@
+import json
+import time
+
+from pathlib import Path
+from typing import Callable
+
+from wasabi import msg
+
+from goldenverba.benchmark.load import percentile
+
+
+def load_questions(path: str) -> list[dict]:
+    """Read a golden question set, one JSON object per line:
+    {"question": "How are refunds settled?", "expected_docs": ["refunds.md"]}
+    @parameter path : str - JSONL file
+    @returns list[dict] - Questions with their expected source documents
+    """
+    questions = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                item = json.loads(line)
+                questions.append(
+                    {"question": item["question"], "expected_docs": list(item["expected_docs"])}
+                )
+    return questions
+
+
+def _doc_key(name: str) -> str:
+    # Readers name documents by path or by file name, compare file names only
+    return Path(str(name)).name
+
+
+def rank_metrics(retrieved_docs: list[str], expected_docs: list[str]) -> tuple[float, float]:
+    """Recall and reciprocal rank of one question
+    @parameter retrieved_docs : list[str] - Document names of the retrieved chunks, best first
+    @parameter expected_docs : list[str] - Document names that answer the question
+    @returns tuple[float, float] - (recall, reciprocal rank)
+    """
+    expected = {_doc_key(name) for name in expected_docs}
+    ranked = list(dict.fromkeys(_doc_key(name) for name in retrieved_docs))
+    if not expected:
+        return 0.0, 0.0
+
+    recall = len(expected.intersection(ranked)) / len(expected)
+    reciprocal_rank = next(
+        (1 / (rank + 1) for rank, name in enumerate(ranked) if name in expected), 0.0
+    )
+    return recall, reciprocal_rank
+
+
+def cheapest_configuration(results: list[dict], recall_target: float) -> dict:
+    """Configuration with the fewest prompt tokens among the ones that meet the recall target, None if none does"""
+    candidates = [result for result in results if result["recall"] >= recall_target]
+    return min(candidates, key=lambda result: result["prompt_tokens"], default=None)
+
+
+class RetrievalEvaluation:
+    """
+    Ingests a corpus into one scratch tenant per (units, overlap) setting, then replays a golden question set
+    against every tenant for each top-k and window size. Only the retrieval runs, prompt tokens are counted
+    from the messages that would be sent to the model, so an evaluation costs no completion quota
+    """
+
+    def __init__(
+        self,
+        manager,
+        questions: list[dict],
+        settings: list[tuple[int, int]],
+        ks: list[int],
+        windows: list[int],
+        count_tokens: Callable[[str], int] = None,
+        keep_tenants: bool = False,
+    ):
+        from goldenverba.retrieval.advanced_engine import AdvancedVerbaQueryEngine
+
+        self.manager = manager
+        self.questions = questions
+        self.settings = settings
+        self.ks = ks
+        self.windows = windows
+        self.keep_tenants = keep_tenants
+        self.engine = AdvancedVerbaQueryEngine(manager.client)
+
+        if count_tokens is None:
+            from goldenverba.ingestion.chunking.manager import get_encoding
+
+            encoding = get_encoding()
+            count_tokens = lambda text: len(encoding.encode(text, disallowed_special=()))
+        self.count_tokens = count_tokens
+
+    @staticmethod
+    def tenant_name(units: int, overlap: int) -> str:
+        return f"eval_{units}_{overlap}"
+
+    def ingest(self, corpus_path: str, units: int, overlap: int, tenant: str) -> int:
+        """Chunk and import the corpus into a scratch tenant
+        @returns int - Number of chunks imported
+        """
+        from goldenverba.ingestion.schema import schema_generation
+
+        embedder = self.manager.embedder_manager.selected_embedder
+        schema_generation.init_documents(self.manager.client, embedder.vectorizer, tenant=tenant)
+
+        documents = self.manager.reader_manager.load([], [], [corpus_path], [], "Evaluation")
+        documents = self.manager.chunker_manager.chunk(documents, units, overlap)
+        embedder.embed(documents, self.manager.client, tenant)
+        return sum(len(document.chunks) for document in documents)
+
+    def evaluate(self, tenant: str, k: int, window: int) -> dict:
+        """Replay the question set against one tenant
+        @returns dict - Mean recall@k, MRR, prompt tokens per answer and retrieval latency percentiles
+        """
+        recalls, reciprocal_ranks, prompt_tokens, latencies = [], [], [], []
+        for item in self.questions:
+            start = time.perf_counter()
+            results, context = self.engine.retrieve(
+                item["question"], limit=k, window=window, tenant=tenant
+            )
+            latencies.append(time.perf_counter() - start)
+
+            recall, reciprocal_rank = rank_metrics(
+                [result["doc_name"] for result in results], item["expected_docs"]
+            )
+            recalls.append(recall)
+            reciprocal_ranks.append(reciprocal_rank)
+            prompt_tokens.append(
+                sum(
+                    self.count_tokens(message["content"])
+                    for message in self.engine.build_messages(item["question"], context)
+                )
+            )
+
+        count = max(len(self.questions), 1)
+        return {
+            "k": k,
+            "window": window,
+            "recall": round(sum(recalls) / count, 4),
+            "mrr": round(sum(reciprocal_ranks) / count, 4),
+            "prompt_tokens": round(sum(prompt_tokens) / count, 1),
+            "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "latency_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        }
+
+    def run(self, corpus_path: str) -> list[dict]:
+        results = []
+        for units, overlap in self.settings:
+            tenant = self.tenant_name(units, overlap)
+            msg.info(f"Ingesting {corpus_path} with units={units} overlap={overlap} into tenant {tenant}")
+            try:
+                chunks = self.ingest(corpus_path, units, overlap, tenant)
+                for window in self.windows:
+                    for k in self.ks:
+                        result = {"units": units, "overlap": overlap, "chunks": chunks}
+                        result.update(self.evaluate(tenant, k, window))
+                        msg.info(
+                            f"units={units:<4} overlap={overlap:<4} k={k:<3} window={window}: recall {result['recall']:.3f}, MRR {result['mrr']:.3f}, {result['prompt_tokens']:.0f} prompt tokens, p95 {result['latency_p95_ms']} ms"
+                        )
+                        results.append(result)
+            finally:
+                if not self.keep_tenants:
+                    self.remove_tenant(tenant)
+        return results
+
+    def remove_tenant(self, tenant: str) -> None:
+        from goldenverba.ingestion.schema.schema_generation import strip_non_letters
+
+        vectorizer = strip_non_letters(self.manager.embedder_manager.selected_embedder.vectorizer)
+        for class_name in (f"Document_{vectorizer}", f"Chunk_{vectorizer}"):
+            try:
+                self.manager.client.schema.remove_class_tenants(class_name=class_name, tenants=[tenant])
+            except Exception as e:
+                msg.warn(f"Could not remove tenant {tenant} of {class_name}: {e}")
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from wasabi import msg
+
+
+def wait_until_ready(url: str, timeout: float, process: subprocess.Popen = None) -> bool:
+    """Poll an endpoint until it answers with HTTP 200
+    @parameter url : str - Endpoint to poll
+    @parameter timeout : float - Seconds before giving up
+    @parameter process : subprocess.Popen - Server process, stop polling if it exits
+    @returns bool - Whether the endpoint became ready in time
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def measure_startup(
+    port: int = 8999, timeout: float = 120.0, health_path: str = "/api/health"
+) -> float:
+    """Start `verba start` in a subprocess and measure the seconds until it reports ready
+    @parameter port : int - Port of the benchmarked server
+    @parameter timeout : float - Seconds before giving up
+    @parameter health_path : str - Endpoint that returns 200 once the server is ready
+    @returns float - Seconds from spawn to ready
+    """
+    command = [sys.executable, "-m", "goldenverba.server.cli", "start", "--port", str(port)]
+    url_prefix = os.environ.get("URL_PREFIX", "")
+    url = f"http://127.0.0.1:{port}{'/' + url_prefix if url_prefix else ''}{health_path}"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready = wait_until_ready(url, timeout, process)
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    if not ready:
+        raise Exception(f"Verba did not become ready at {url} within {timeout}s")
+
+    msg.info(f"Verba ready after {elapsed:.2f}s")
+    return elapsed
@@ -0,0 +1,36 @@
+import random
+
+# Small fixed vocabulary with a rough Zipf distribution, enough to look like prose to tokenizers and spaCy
+VOCABULARY = (
+    "the of and to a in is that for it as was with be by on not he this are or his from at which "
+    "but have an they you were her she there one all we their been has when who will more no if out "
+    "so said what up its about into than them can only other new some could time these two may then "
+    "do first any my now such like our over man me even most made after also did many before must "
+    "through back years where much your way well down should because each just those people how too "
+    "vector database tenant chunk embedding query document retrieval latency weaviate index schema "
+    "payment terminal merchant settlement transaction acquirer issuer authorization refund invoice"
+).split()
+
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def synthetic_text(words: int, rng: random.Random) -> str:
+    """Generate prose-like text with sentences of 8 to 24 words
+    @parameter words : int - Number of words
+    @parameter rng : random.Random - Seeded random generator for reproducible corpora
+    @returns str - Generated text
+    """
+    tokens = rng.choices(VOCABULARY, weights=WEIGHTS, k=words)
+    sentences = []
+    i = 0
+    while i < len(tokens):
+        length = rng.randint(8, 24)
+        sentence = " ".join(tokens[i : i + length])
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+        i += length
+    return " ".join(sentences)
+
+
+def synthetic_texts(count: int, words: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [synthetic_text(words, rng) for _ in range(count)]
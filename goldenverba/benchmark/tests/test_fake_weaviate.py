@@ -0,0 +1,87 @@
+from weaviate import Tenant
+
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.schema import schema_generation
+
+
+def make_client():
+    client = FakeWeaviateClient(latency_ms=0)
+    schema_generation.init_documents(client, "text2vec-openai")
+    return client
+
+
+def test_schema_tenants_are_created_once():
+    client = make_client()
+    schema_generation.init_documents(client, "text2vec-openai")
+
+    assert client.schema.exists("Chunk_text2vec_openai")
+    tenants = client.schema.get_class_tenants("Chunk_text2vec_openai")
+    assert [tenant.name for tenant in tenants] == [schema_generation.TENANT]
+
+
+def test_batch_import_then_hybrid_search_and_filters():
+    client = make_client()
+    tenant = schema_generation.TENANT
+    texts = [
+        "The merchant terminal sends the authorization to the acquirer",
+        "Settlement files are produced every night",
+        "Refunds reuse the original transaction reference",
+    ]
+    with client.batch as batch:
+        batch.batch_size = 10
+        for i, text in enumerate(texts):
+            batch.add_data_object(
+                {"text": text, "doc_name": "guide.md", "chunk_id": i},
+                "Chunk_text2vec_openai",
+                tenant=tenant,
+            )
+
+    results = (
+        client.query.get("Chunk_text2vec_openai", ["text", "chunk_id"])
+        .with_tenant(tenant)
+        .with_hybrid(query="settlement night")
+        .with_additional(properties=["score"])
+        .with_limit(2)
+        .do()
+    )["data"]["Get"]["Chunk_text2vec_openai"]
+    assert [result["chunk_id"] for result in results] == [1]
+    assert float(results[0]["_additional"]["score"]) > 0
+
+    neighbors = (
+        client.query.get("Chunk_text2vec_openai", ["chunk_id"])
+        .with_tenant(tenant)
+        .with_where(
+            {
+                "operator": "And",
+                "operands": [
+                    {"path": ["doc_name"], "operator": "Equal", "valueText": "guide.md"},
+                    {"path": ["chunk_id"], "operator": "GreaterThanEqual", "valueNumber": 1},
+                ],
+            }
+        )
+        .do()
+    )["data"]["Get"]["Chunk_text2vec_openai"]
+    assert sorted(result["chunk_id"] for result in neighbors) == [1, 2]
+
+    deleted = client.batch.delete_objects(
+        "Chunk_text2vec_openai",
+        where={"path": ["doc_name"], "operator": "Equal", "valueText": "guide.md"},
+        tenant=tenant,
+    )
+    assert deleted["results"]["matches"] == 3
+
+
+def test_unknown_tenant_is_reported_like_weaviate():
+    client = make_client()
+    errors = []
+    client.batch.configure(callback=errors.extend)
+    with client.batch as batch:
+        batch.add_data_object({"text": "x"}, "Chunk_text2vec_openai", tenant="missing")
+    assert "errors" in errors[0]["result"]
+
+    response = client.query.get("Chunk_text2vec_openai", ["text"]).with_tenant("missing").do()
+    assert "errors" in response
+
+    client.schema.add_class_tenants("Chunk_text2vec_openai", [Tenant(name="missing")])
+    response = client.query.get("Chunk_text2vec_openai", ["text"]).with_tenant("missing").do()
+    assert response == {"data": {"Get": {"Chunk_text2vec_openai": []}}}
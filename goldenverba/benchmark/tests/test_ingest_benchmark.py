@@ -0,0 +1,47 @@
+import json
+
+from goldenverba.benchmark.ingest import (
+    IngestBenchmark,
+    compare_results,
+    run_ingest_benchmark,
+    synthetic_corpus,
+)
+
+
+def test_synthetic_corpus_is_reproducible():
+    assert list(synthetic_corpus(3, 50, seed=1)) == list(synthetic_corpus(3, 50, seed=1))
+    assert [name for name, _ in synthetic_corpus(2, 50)] == ["doc_0000000.md", "doc_0000001.md"]
+
+
+def test_benchmark_reports_every_stage(tmp_path):
+    output = tmp_path / "results.json"
+    results = run_ingest_benchmark(
+        "tiny",
+        documents=6,
+        words=300,
+        output=str(output),
+        batch_documents=4,
+        stages=["read_simple", "chunk_word", "weaviate_batch"],
+    )
+
+    assert json.loads(output.read_text()) == results
+    stages = {stage["stage"]: stage for stage in results["stages"]}
+    assert list(stages) == ["read_simple", "chunk_word", "weaviate_batch"]
+    assert stages["read_simple"]["documents"] == 6
+    assert stages["chunk_word"]["chunks"] > 6
+    assert stages["weaviate_batch"]["chunks"] == stages["chunk_word"]["chunks"]
+    assert "error" not in stages["weaviate_batch"]
+
+    rows = compare_results(results, results)
+    assert all(row["speedup"] == 1.0 for row in rows)
+
+
+def test_failing_stage_is_recorded_and_skipped():
+    benchmark = IngestBenchmark(1, 10, stages=["read_simple"], trace_allocations=False)
+
+    def fail():
+        raise ValueError("boom")
+
+    assert benchmark.measure("read_simple", fail, 1) is None
+    assert benchmark.measure("read_simple", lambda: "ok", 1) is None
+    assert benchmark.stats["read_simple"].to_dict()["error"] == "ValueError: boom"
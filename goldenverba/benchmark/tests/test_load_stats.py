@@ -0,0 +1,18 @@
+from goldenverba.benchmark.load import percentile, summarize
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [0.4, 0.1, 0.3, 0.2]
+    assert percentile(values, 0) == 0.1
+    assert percentile(values, 100) == 0.4
+    assert abs(percentile(values, 50) - 0.25) < 1e-9
+    assert percentile([], 99) == 0.0
+
+
+def test_summarize_reports_throughput_and_percentiles():
+    result = summarize([0.1] * 99 + [1.0], errors=2, seconds=10.0)
+    assert result["requests"] == 100
+    assert result["throughput_rps"] == 10.0
+    assert result["p50_ms"] == 100.0
+    assert result["p99_ms"] > 100.0
+    assert result["errors"] == 2
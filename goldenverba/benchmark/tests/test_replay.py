@@ -0,0 +1,20 @@
+import base64
+import random
+
+from goldenverba.benchmark.replay import replay_request, replay_schedule
+
+
+def test_schedule_keeps_gaps_divided_by_speedup():
+    records = [{"ts": 100.0}, {"ts": 101.0}, {"ts": 110.0}]
+    assert replay_schedule(records, speedup=10) == [0.0, 0.1, 1.0]
+
+
+def test_ingest_is_replayed_with_files_of_the_logged_size():
+    record = {"ts": 1.0, "kind": "ingest", "file_sizes": [6000], "units": 200, "overlap": 20}
+    endpoint, body = replay_request(record, random.Random(0))
+    assert endpoint == "load_data"
+    assert (body["chunkUnits"], body["chunkOverlap"]) == (200, 20)
+    size = len(base64.b64decode(body["fileBytes"][0]))
+    assert 3000 < size < 12000
+
+    assert replay_request({"ts": 2.0, "kind": "query", "query": "hi"}, random.Random(0)) == ("query", {"query": "hi"})
@@ -0,0 +1,65 @@
+from goldenverba.benchmark.retrieval_eval import (
+    RetrievalEvaluation,
+    cheapest_configuration,
+    rank_metrics,
+)
+from goldenverba.ingestion.chunking.manager import ChunkerManager
+
+
+def test_rank_metrics():
+    assert rank_metrics(["a.md", "b.md", "a.md"], ["b.md"]) == (1.0, 0.5)
+    assert rank_metrics(["/data/a.md"], ["a.md", "c.md"]) == (0.5, 1.0)
+    assert rank_metrics(["a.md"], ["c.md"]) == (0.0, 0.0)
+
+
+def test_cheapest_configuration_meets_the_recall_target():
+    results = [
+        {"recall": 0.95, "prompt_tokens": 2400},
+        {"recall": 0.92, "prompt_tokens": 1100},
+        {"recall": 0.70, "prompt_tokens": 500},
+    ]
+    assert cheapest_configuration(results, 0.9)["prompt_tokens"] == 1100
+    assert cheapest_configuration(results, 0.99) is None
+
+
+def test_evaluation_on_scratch_tenants(tmp_path, monkeypatch):
+    monkeypatch.setenv("VERBA_WEAVIATE_STANDIN", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    # tiktoken downloads its encoding, token counts are not what is under test here
+    def check_chunks(self, documents):
+        for document in documents:
+            for chunk in document.chunks:
+                chunk.set_tokens(chunk.text.split())
+        return True
+
+    monkeypatch.setattr(ChunkerManager, "check_chunks", check_chunks)
+    from goldenverba.verba_manager import VerbaManager
+
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "refunds.md").write_text("Refunds reuse the original transaction reference. " * 30)
+    (corpus / "settlement.md").write_text("Settlement files are produced every night. " * 30)
+
+    manager = VerbaManager()
+    evaluation = RetrievalEvaluation(
+        manager,
+        [
+            {"question": "How are refunds referenced?", "expected_docs": ["refunds.md"]},
+            {"question": "When are settlement files produced?", "expected_docs": ["settlement.md"]},
+        ],
+        settings=[(50, 10), (100, 20)],
+        ks=[1, 4],
+        windows=[0, 1],
+        count_tokens=lambda text: len(text.split()),
+    )
+    results = evaluation.run(str(corpus))
+
+    assert len(results) == 2 * 2 * 2
+    assert all(result["recall"] == 1.0 and result["mrr"] == 1.0 for result in results)
+    by_key = {(r["units"], r["k"], r["window"]): r for r in results}
+    assert by_key[(50, 4, 1)]["prompt_tokens"] > by_key[(50, 1, 0)]["prompt_tokens"]
+    assert by_key[(50, 1, 0)]["chunks"] > by_key[(100, 1, 0)]["chunks"]
+
+    tenants = manager.client.schema.get_class_tenants("Chunk_text2vec_openai")
+    assert "eval_50_10" not in [tenant.name for tenant in tenants]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from goldenverba.benchmark.vector_index import estimate_memory_bytes, exact_neighbours, recall_at_k
+
+
+def test_exact_neighbours_by_cosine():
+    vectors = np.array([[1.0, 0.0], [0.0, 1.0], [10.0, 1.0], [-1.0, 0.0]])
+    queries = np.array([[1.0, -0.05], [0.0, -1.0]])
+
+    nearest = exact_neighbours(vectors, queries, 2)
+
+    assert nearest[0] == [0, 2]
+    assert set(nearest[1]) == {0, 3}
+
+
+def test_recall_at_k():
+    assert recall_at_k([[1, 2, 3], [4, 5, 6]], [[1, 2, 3], [4, 7, 8]]) == (1 + 1 / 3) / 2
+    assert recall_at_k([], []) == 0.0
+
+
+def test_compression_shrinks_the_estimate():
+    count, dimensions = 100000, 1536
+    hnsw = estimate_memory_bytes(count, dimensions, "hnsw", {})
+    pq = estimate_memory_bytes(count, dimensions, "hnsw", {"pq": {"enabled": True, "segments": 256}})
+    bq = estimate_memory_bytes(count, dimensions, "hnsw", {"bq": {"enabled": True}})
+
+    assert hnsw == count * (dimensions * 4 + 64 * 10)
+    assert bq < pq < hnsw
+    assert estimate_memory_bytes(count, dimensions, "flat", {}) == 0
+    assert estimate_memory_bytes(count, dimensions, "flat", {"bq": {"enabled": True, "cache": True}}) == count * 192
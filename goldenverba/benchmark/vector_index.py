@@ -0,0 +1,193 @@
+import math
+import time
+import uuid
+
+import numpy as np
+
+from wasabi import msg
+
+from goldenverba.benchmark.load import percentile
+from goldenverba.ingestion.schema.schema_generation import strip_non_letters, vector_index_config
+
+# Weaviate's default maxConnections, used for the estimate when the preset does not set it
+DEFAULT_MAX_CONNECTIONS = 64
+
+
+def estimate_memory_bytes(count: int, dimensions: int, index_type: str, config: dict) -> int:
+    """Rough in-memory size of a vector index, after Weaviate's rules of thumb: float vectors take 4 bytes per
+    dimension, the HNSW graph about 10 bytes per connection, PQ one byte per segment plus its codebook and BQ one
+    bit per dimension. A flat index only keeps the BQ codes it caches
+    @parameter count : int - Objects in the index
+    @parameter dimensions : int - Vector dimensions
+    @parameter index_type : str - hnsw or flat
+    @parameter config : dict - vectorIndexConfig
+    @returns int - Bytes
+    """
+    pq = config.get("pq", {})
+    bq = config.get("bq", {})
+    if index_type == "flat":
+        return count * math.ceil(dimensions / 8) if bq.get("enabled") and bq.get("cache") else 0
+
+    graph = count * config.get("maxConnections", DEFAULT_MAX_CONNECTIONS) * 10
+    if pq.get("enabled"):
+        # Weaviate picks the segments itself when they are not set, a quarter of the dimensions is close
+        segments = pq.get("segments") or max(dimensions // 4, 1)
+        centroids = pq.get("centroids", 256)
+        return graph + count * segments + centroids * dimensions * 4
+    if bq.get("enabled"):
+        return graph + count * math.ceil(dimensions / 8)
+    return graph + count * dimensions * 4
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[list[int]]:
+    """Positions of the k nearest vectors of each query by cosine distance, Weaviate's default metric"""
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    similarities = queries @ vectors.T
+    k = min(k, vectors.shape[0])
+    nearest = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    return [
+        [int(position) for position in row[np.argsort(-similarities[index, row])]]
+        for index, row in enumerate(nearest)
+    ]
+
+
+def recall_at_k(found: list[list[int]], exact: list[list[int]]) -> float:
+    """Share of the exact neighbours the index returned, averaged over the queries"""
+    if not exact:
+        return 0.0
+    return sum(len(set(got) & set(want)) / max(len(want), 1) for got, want in zip(found, exact)) / len(exact)
+
+
+def read_vectors(client, class_name: str, tenant: str, limit: int, page: int = 500) -> np.ndarray:
+    """Vectors of the first objects of a class in a tenant, read with the cursor API
+    @returns np.ndarray - One row per object
+    """
+    vectors = []
+    after = None
+    while len(vectors) < limit:
+        query = (
+            client.query.get(class_name, ["chunk_id"])
+            .with_tenant(tenant)
+            .with_additional(["id", "vector"])
+            .with_limit(min(page, limit - len(vectors)))
+        )
+        if after is not None:
+            query = query.with_after(after)
+        objects = query.do()["data"]["Get"][class_name]
+        if not objects:
+            break
+        vectors += [item["_additional"]["vector"] for item in objects]
+        after = objects[-1]["_additional"]["id"]
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class VectorIndexBenchmark:
+    """
+    Imports the same vectors into one scratch class per vector index preset, then measures recall@k of near_vector
+    queries against exact search, query latency and the estimated index memory. The queries are vectors held out
+    of the import, so recall reflects neighbours of unseen vectors
+    """
+
+    def __init__(self, client, presets: list[str], k: int = 10, queries: int = 100, keep_classes: bool = False):
+        self.client = client
+        self.presets = presets
+        self.k = k
+        self.queries = queries
+        self.keep_classes = keep_classes
+
+    @staticmethod
+    def class_name(preset: str) -> str:
+        return f"IndexBench_{strip_non_letters(preset)}"
+
+    def import_vectors(self, preset: str, vectors: np.ndarray) -> tuple[str, float]:
+        """Create the scratch class of a preset and import the vectors, positions as UUIDs
+        @returns tuple[str, float] - Class name and import seconds
+        """
+        class_name = self.class_name(preset)
+        # Presets as shipped, VERBA_VECTOR_INDEX_CONFIG is tuned for one index type
+        index = vector_index_config(preset, {})
+        config = dict(index.get("vectorIndexConfig", {}))
+        # Older Weaviate versions train PQ on existing vectors only, enable it after the import like a migration does
+        pq = config.pop("pq", None)
+
+        if self.client.schema.exists(class_name):
+            self.client.schema.delete_class(class_name)
+        self.client.schema.create_class(
+            {
+                "class": class_name,
+                "vectorizer": "none",
+                "vectorIndexType": index["vectorIndexType"],
+                "vectorIndexConfig": config,
+                "properties": [{"name": "position", "dataType": ["int"]}],
+            }
+        )
+
+        start = time.perf_counter()
+        with self.client.batch as batch:
+            batch.configure(batch_size=500)
+            for position, vector in enumerate(vectors):
+                batch.add_data_object(
+                    {"position": position}, class_name, uuid=str(uuid.UUID(int=position)), vector=vector.tolist()
+                )
+        if pq is not None:
+            self.client.schema.update_config(class_name, {"vectorIndexConfig": {"pq": pq}})
+        return class_name, time.perf_counter() - start
+
+    def search(self, class_name: str, queries: np.ndarray) -> tuple[list[list[int]], list[float]]:
+        found, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results = (
+                self.client.query.get(class_name, ["position"])
+                .with_near_vector({"vector": query.tolist()})
+                .with_limit(self.k)
+                .do()
+            )
+            latencies.append(time.perf_counter() - start)
+            found.append([item["position"] for item in results["data"]["Get"][class_name]])
+        return found, latencies
+
+    def run(self, vectors: np.ndarray) -> list[dict]:
+        """Benchmark every preset on the vectors
+        @parameter vectors : np.ndarray - Sample of the tenant's vectors, one row per object
+        @returns list[dict] - One result per preset
+        """
+        rng = np.random.default_rng(0)
+        held_out = rng.permutation(len(vectors))
+        queries = vectors[held_out[: self.queries]]
+        corpus = vectors[np.sort(held_out[self.queries :])]
+        exact = exact_neighbours(corpus, queries, self.k)
+        baseline = estimate_memory_bytes(len(corpus), corpus.shape[1], "hnsw", {})
+
+        results = []
+        for preset in self.presets:
+            class_name, import_seconds = self.import_vectors(preset, corpus)
+            try:
+                found, latencies = self.search(class_name, queries)
+            finally:
+                if not self.keep_classes:
+                    self.client.schema.delete_class(class_name)
+
+            index = vector_index_config(preset, {})
+            memory = estimate_memory_bytes(
+                len(corpus), corpus.shape[1], index["vectorIndexType"], index.get("vectorIndexConfig", {})
+            )
+            result = {
+                "preset": preset,
+                "objects": len(corpus),
+                "dimensions": int(corpus.shape[1]),
+                "k": self.k,
+                "recall": round(recall_at_k(found, exact), 4),
+                "memory_mb_estimate": round(memory / 2**20, 1),
+                "memory_vs_hnsw": round(memory / max(baseline, 1), 3),
+                "import_seconds": round(import_seconds, 2),
+                "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "latency_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            }
+            msg.info(
+                f"{preset:<13} recall@{self.k} {result['recall']:.3f}, ~{result['memory_mb_estimate']} MB "
+                f"({result['memory_vs_hnsw']:.0%} of hnsw), p95 {result['latency_p95_ms']} ms"
+            )
+            results.append(result)
+        return results
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class Chunk:
     def __init__(
         self,
@@ -6,12 +9,18 @@ class Chunk:
         doc_type: str = "",
         doc_uuid: str = "",
         chunk_id: str = "",
+        span_start: Optional[int] = None,
+        gap: Optional[str] = None,
     ):
         self._text = text
         self._doc_name = doc_name
         self._doc_type = doc_type
         self._doc_uuid = doc_uuid
         self._chunk_id = chunk_id
+        # Characters at the start of the text that repeat the end of the previous chunk, None if unknown
+        self._span_start = span_start
+        # Text of the document between the previous chunk and this one, e.g. a paragraph break, None if unknown
+        self._gap = gap
         self._tokens = 0
         self._vector = None
 
@@ -19,9 +28,19 @@ class Chunk:
     def text(self):
         return self._text
 
+    @property
+    def span_start(self):
+        return self._span_start
+
+    @property
+    def gap(self):
+        return self._gap
+
     @property
     def text_no_overlap(self):
-        return self._text_no_overlap
+        if self._span_start is None:
+            return None
+        return self._text[self._span_start :]
 
     @property
     def doc_name(self):
@@ -55,3 +74,21 @@ class Chunk:
 
     def set_vector(self, vector):
         self._vector = vector
+
+
+def join_chunks(chunks: list[dict]) -> str:
+    """Text of consecutive chunks without their overlap, the document text when given all of its chunks.
+    Joining the results of consecutive chunk ranges gives the same text
+    @parameter chunks : list[dict] - Chunks ordered by chunk_id, with text, chunk_id, span_start and gap
+    @returns str - Text of the chunks
+    """
+    text = ""
+    for chunk in chunks:
+        span_start = int(chunk.get("span_start") or 0)
+        if chunk.get("gap") is not None:
+            text += chunk["gap"]
+        elif int(chunk["chunk_id"]) > 0 and span_start == 0:
+            # Imported before the gaps were kept, the whitespace between the chunks is unknown
+            text += " "
+        text += chunk["text"][span_start:]
+    return text
@@ -1,14 +1,24 @@
 import tiktoken
 import os
 
+from functools import lru_cache
+from typing import Optional
+
 from goldenverba.ingestion.chunking.wordchunker import WordChunker
 from goldenverba.ingestion.chunking.sentencechunker import SentenceChunker
 from goldenverba.ingestion.chunking.interface import Chunker
 from goldenverba.ingestion.reader.document import Document
+from goldenverba.metrics import INGEST_STAGE_SECONDS
 
 from wasabi import msg
 
 
+@lru_cache(maxsize=None)
+def get_encoding() -> tiktoken.Encoding:
+    """Load the tiktoken encoding once per process instead of once per upload"""
+    return tiktoken.encoding_for_model("gpt-3.5-turbo")
+
+
 class ChunkerManager:
     def __init__(self):
         self.chunker: dict[str, Chunker] = {
@@ -18,27 +28,40 @@ class ChunkerManager:
         self.selected_chunker: Chunker = self.chunker["WordChunker"]
 
     def chunk(
-        self, documents: list[Document], units: int, overlap: int
+        self, documents: list[Document], units: int, overlap: int, chunker: Optional[str] = None
     ) -> list[Document]:
         """Chunk verba documents into chunks based on n and overlap
         @parameter: documents : list[Document] - List of Verba documents
         @parameter: units : int - How many units per chunk (words, sentences, etc.)
         @parameter: overlap : int - How much overlap between the chunks
+        @parameter: chunker : Optional[str] - Chunker to use instead of the selected one
         @returns list[str] - List of documents that contain the chunks
         """
-        chunked_docs = self.selected_chunker.chunk(documents, units, overlap)
-        if self.check_chunks(chunked_docs):
-            return chunked_docs
+        with INGEST_STAGE_SECONDS.time(stage="chunk"):
+            chunked_docs = self.get_chunker(chunker).chunk(documents, units, overlap)
+        with INGEST_STAGE_SECONDS.time(stage="token_check"):
+            if self.check_chunks(chunked_docs):
+                return chunked_docs
         return []
 
     def set_chunker(self, chunker: str) -> bool:
         if chunker in self.chunker:
             self.selected_chunker = self.chunker[chunker]
+            self.selected_chunker.ensure_loaded()
             return True
         else:
             msg.warn(f"Chunker {chunker} not found")
             return False
 
+    def get_chunker(self, chunker: Optional[str] = None) -> Chunker:
+        """Chunker of the given name, ready to use, or the selected one"""
+        if chunker is None:
+            return self.selected_chunker
+        if chunker not in self.chunker:
+            raise Exception(f"Chunker {chunker} not found")
+        self.chunker[chunker].ensure_loaded()
+        return self.chunker[chunker]
+
     def get_chunkers(self) -> dict[str, Chunker]:
         return self.chunker
 
@@ -47,7 +70,7 @@ class ChunkerManager:
         @parameter: documents : list[Document] - List of Verba documents
         @returns bool - Whether the chunks are within the token range
         """
-        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        encoding = get_encoding()
 
         context_size = int(os.getenv("VERBA_MODEL_CONTEXT_SIZE",8000))
         max_token_number=(context_size-100)/8
@@ -1,10 +1,5 @@
 from wasabi import msg
 
-try:
-    import spacy
-except:
-    pass
-
 from goldenverba.ingestion.chunking.interface import Chunker
 from goldenverba.ingestion.chunking.chunk import Chunk
 from goldenverba.ingestion.reader.document import Document
@@ -23,7 +18,12 @@ class SentenceChunker(Chunker):
         self.default_units = 3
         self.default_overlap = 2
         self.description = "Chunk documents by sentences. You can specify how many sentences should overlap between chunks to improve retrieval."
+        self.nlp = None
+
+    def load_resources(self) -> None:
         try:
+            import spacy
+
             self.nlp = spacy.blank("en")
             self.nlp.add_pipe("sentencizer")
         except:
@@ -38,6 +38,8 @@ class SentenceChunker(Chunker):
         @parameter: overlap : int - How much overlap between the chunks
         @returns list[str] - List of documents that contain the chunks
         """
+        self.ensure_loaded()
+
         for document in documents:
             # Skip if document already contains chunks
             if len(document.chunks) > 0:
@@ -59,6 +61,8 @@ class SentenceChunker(Chunker):
 
             i = 0
             split_id_counter = 0
+            previous_end = 0
+            previous_end_char = 0
             while i < len(doc):
                 # Overlap
                 start_i = i
@@ -66,18 +70,28 @@ class SentenceChunker(Chunker):
                 if end_i > len(doc):
                     end_i = len(doc)  # Adjust for the last chunk
 
-                text = ""
-                for sent in doc[start_i:end_i]:
-                    text += sent.text
+                # The sentences with the whitespace between them, as in the document
+                start_char = doc[start_i].start_char
+                end_char = doc[end_i - 1].end_char
+                span_start = 0
+                gap = ""
+                if start_i < previous_end:
+                    span_start = previous_end_char - start_char
+                else:
+                    gap = document.text[previous_end_char:start_char]
 
                 doc_chunk = Chunk(
-                    text=text,
+                    text=document.text[start_char:end_char],
                     doc_name=document.name,
                     doc_type=document.type,
                     chunk_id=split_id_counter,
+                    span_start=span_start,
+                    gap=gap,
                 )
                 document.chunks.append(doc_chunk)
                 split_id_counter += 1
+                previous_end = end_i
+                previous_end_char = end_char
 
                 # Exit loop if this was the last possible chunk
                 if end_i == len(doc):
@@ -0,0 +1,39 @@
+from goldenverba.ingestion.chunking.chunk import join_chunks
+from goldenverba.ingestion.chunking.sentencechunker import SentenceChunker
+from goldenverba.ingestion.reader.document import Document
+
+chunker = SentenceChunker()
+
+TEXT = (
+    "The setup is as follows. And then it runs.\n\nA new paragraph starts here.  "
+    "Two spaces came before this one. The end."
+)
+
+
+def as_dicts(chunks):
+    return [
+        {"text": chunk.text, "chunk_id": chunk.chunk_id, "span_start": chunk.span_start, "gap": chunk.gap}
+        for chunk in chunks
+    ]
+
+
+def test_chunks_keep_the_whitespace_between_sentences():
+    documents = chunker.chunk([Document(text=TEXT)], 2, 1)
+    assert documents[0].chunks[0].text == "The setup is as follows. And then it runs."
+
+
+def test_overlapping_sentences_rebuild_the_text():
+    documents = chunker.chunk([Document(text=TEXT)], 3, 2)
+    chunks = as_dicts(documents[0].chunks)
+
+    assert join_chunks(chunks) == TEXT
+    assert join_chunks(chunks[:2]) + join_chunks(chunks[2:]) == TEXT
+
+
+def test_sentences_without_overlap_rebuild_the_text():
+    documents = chunker.chunk([Document(text=TEXT)], 2, 0)
+    chunks = as_dicts(documents[0].chunks)
+
+    assert all(chunk["span_start"] == 0 for chunk in chunks)
+    assert join_chunks(chunks) == TEXT
+    assert join_chunks(chunks[:1]) + join_chunks(chunks[1:]) == TEXT
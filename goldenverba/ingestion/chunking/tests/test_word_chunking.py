@@ -1,3 +1,4 @@
+from goldenverba.ingestion.chunking.chunk import join_chunks
 from goldenverba.ingestion.chunking.wordchunker import WordChunker
 from goldenverba.ingestion.reader.document import Document
 
@@ -68,3 +69,39 @@ def test_long_lengths():
     ]
     modified_documents = chunker.chunk(documents, 11, 2)
     assert len(modified_documents[0].chunks) == 2
+
+
+def as_dicts(chunks):
+    return [
+        {"text": chunk.text, "chunk_id": chunk.chunk_id, "span_start": chunk.span_start, "gap": chunk.gap}
+        for chunk in chunks
+    ]
+
+
+def test_spans_rebuild_the_text():
+    text = "This is a test sentence.\n\nAnother  test sentence, and a third one."
+    documents = chunker.chunk([Document(text=text)], 5, 2)
+    chunks = as_dicts(documents[0].chunks)
+
+    assert join_chunks(chunks) == text
+    # Pages of chunks join into the same text
+    assert join_chunks(chunks[:2]) + join_chunks(chunks[2:]) == text
+    assert documents[0].chunks[1].text_no_overlap == ".\n\nAnother"
+
+
+def test_chunks_without_overlap_keep_their_separators():
+    text = "First paragraph ends here.\n\nSecond  paragraph, with two spaces."
+    documents = chunker.chunk([Document(text=text)], 4, 0)
+    chunks = as_dicts(documents[0].chunks)
+
+    assert all(chunk["span_start"] == 0 for chunk in chunks)
+    assert join_chunks(chunks) == text
+    assert join_chunks(chunks[:3]) + join_chunks(chunks[3:]) == text
+
+
+def test_chunks_imported_without_gaps_are_joined_with_a_space():
+    chunks = [
+        {"text": "First part", "chunk_id": 0, "span_start": 0},
+        {"text": "second part", "chunk_id": 1, "span_start": 0},
+    ]
+    assert join_chunks(chunks) == "First part second part"
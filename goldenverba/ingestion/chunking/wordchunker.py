@@ -1,10 +1,5 @@
 from wasabi import msg
 
-try:
-    import spacy
-except:
-    pass
-
 from goldenverba.ingestion.chunking.interface import Chunker
 from goldenverba.ingestion.chunking.chunk import Chunk
 from goldenverba.ingestion.reader.document import Document
@@ -23,7 +18,12 @@ class WordChunker(Chunker):
         self.default_units = 100
         self.default_overlap = 50
         self.description = "Chunk documents by words. You can specify how many words should overlap between chunks to improve retrieval."
+        self.nlp = None
+
+    def load_resources(self) -> None:
         try:
+            import spacy
+
             self.nlp = spacy.blank("en")
         except:
             self.nlp = None
@@ -37,6 +37,8 @@ class WordChunker(Chunker):
         @parameter: overlap : int - How much overlap between the chunks
         @returns list[str] - List of documents that contain the chunks
         """
+        self.ensure_loaded()
+
         for document in documents:
             # Skip if document already contains chunks
             if len(document.chunks) > 0:
@@ -53,6 +55,8 @@ class WordChunker(Chunker):
 
             i = 0
             split_id_counter = 0
+            previous_end = 0
+            previous_end_char = 0
             while i < len(doc):
                 # Overlap
                 start_i = i
@@ -60,14 +64,27 @@ class WordChunker(Chunker):
                 if end_i > len(doc):
                     end_i = len(doc)  # Adjust for the last chunk
 
+                # The text after the previous chunk's last word, with its whitespace, is new to this chunk
+                span = doc[start_i:end_i]
+                span_start = 0
+                gap = ""
+                if start_i < previous_end:
+                    span_start = previous_end_char - span.start_char
+                else:
+                    gap = document.text[previous_end_char : span.start_char]
+
                 doc_chunk = Chunk(
-                    text=doc[start_i:end_i].text,
+                    text=span.text,
                     doc_name=document.name,
                     doc_type=document.type,
                     chunk_id=split_id_counter,
+                    span_start=span_start,
+                    gap=gap,
                 )
                 document.chunks.append(doc_chunk)
                 split_id_counter += 1
+                previous_end = end_i
+                previous_end_char = span.end_char
 
                 # Exit loop if this was the last possible chunk
                 if end_i == len(doc):
@@ -1,3 +1,6 @@
+import threading
+
+
 class VerbaComponent:
     """
     Base Class for Verba Readers, Chunkers, Embedders, Retrievers, and Generators
@@ -8,3 +11,21 @@ class VerbaComponent:
         self.requires_env = []
         self.requires_library = []
         self.description = ""
+        self._resources_loaded = False
+        self._resources_lock = threading.Lock()
+
+    def load_resources(self) -> None:
+        """Load heavy resources (models, NLP pipelines, ...). Components are registered as cheap
+        descriptors, this is only called once the component is actually used
+        """
+        pass
+
+    def ensure_loaded(self) -> None:
+        """Load the resources of the component once, safe to call from several threads.
+        Raises what load_resources raises, the next call tries to load again"""
+        if self._resources_loaded:
+            return
+        with self._resources_lock:
+            if not self._resources_loaded:
+                self.load_resources()
+                self._resources_loaded = True
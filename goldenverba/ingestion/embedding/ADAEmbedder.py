@@ -1,15 +1,15 @@
+import os
+
+import openai
 from weaviate import Client
 from wasabi import msg
 
 from goldenverba.ingestion.embedding.interface import Embedder
 from goldenverba.ingestion.reader.document import Document
-from goldenverba.ingestion.reader.interface import InputForm
-from goldenverba.ingestion.schema.schema_generation import (
-    VECTORIZERS,
-    EMBEDDINGS,
-    strip_non_letters,
-)
+from goldenverba.ratelimit import BULK, estimate_tokens, get_openai_limiter
+
 
+TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
 
 class ADAEmbedder(Embedder):
     """
@@ -23,16 +23,55 @@ class ADAEmbedder(Embedder):
         self.requires_library = ["openai"]
         self.description = "Embeds and retrieves objects using OpenAI's ADA model"
         self.vectorizer = "text2vec-openai"
+        # By default Weaviate calls OpenAI (text2vec-openai), in client-side mode Verba computes
+        # the vectors itself so that they can be served from the embedding cache
+        self.client_side = (
+            os.getenv("VERBA_ADA_CLIENT_SIDE_EMBEDDING", "false").lower() == "true"
+        )
+        self.batch_size = int(os.getenv("VERBA_ADA_EMBEDDING_BATCH_SIZE", 16))
+        self.model = os.getenv(
+            "AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"
+        )
+        self.cache_model = f"openai/{self.model}"
 
     def embed(
         self,
         documents: list[Document],
         client: Client,
+        tenant: str = TENANT,
     ) -> bool:
         """Embed verba documents and its chunks to Weaviate
         @parameter: documents : list[Document] - List of Verba documents
         @parameter: client : Client - Weaviate Client
-        @parameter: batch_size : int - Batch Size of Input
+        @parameter: tenant : str - Weaviate tenant
         @returns bool - Bool whether the embedding what successful
         """
-        return self.import_data(documents, client)
+        if self.client_side:
+            self.vectorize_documents(documents)
+
+        return self.import_data(documents, client, tenant)
+
+    def vectorize_chunks(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the OpenAI embeddings API
+        @parameter: texts : list[str] - Texts to embed
+        @returns list[list[float]] - One vector per text
+        """
+        limiter = get_openai_limiter()
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i : i + self.batch_size]
+            arguments = {"input": batch}
+            if openai.api_type == "azure":
+                arguments["deployment_id"] = self.model
+            else:
+                arguments["model"] = self.model
+
+            estimated_tokens = sum(estimate_tokens(text) for text in batch)
+            limiter.acquire(tokens=estimated_tokens, priority=BULK)
+            response = openai.Embedding.create(**arguments)
+            limiter.settle(estimated_tokens, response.get("usage"))
+            data = sorted(response["data"], key=lambda item: item["index"])
+            vectors += [item["embedding"] for item in data]
+
+        msg.info(f"Embedded {len(texts)} chunks with {self.model}")
+        return vectors
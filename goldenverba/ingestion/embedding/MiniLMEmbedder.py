@@ -1,18 +1,24 @@
+import os
+import time
+
 from weaviate import Client
 from wasabi import msg
 import numpy as np
 
 from goldenverba.ingestion.embedding.interface import Embedder
+from goldenverba.ingestion.embedding.pooling import (
+    mean_pool,
+    l2_normalize,
+    plan_batches,
+    pad_batch,
+    combine_windows,
+)
 from goldenverba.ingestion.reader.document import Document
 from goldenverba.ingestion.chunking.chunk import Chunk
-from goldenverba.ingestion.reader.interface import InputForm
-from goldenverba.ingestion.schema.schema_generation import (
-    VECTORIZERS,
-    EMBEDDINGS,
-    strip_non_letters,
-)
 
 
+TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
+
 class MiniLMEmbedder(Embedder):
     """
     MiniLMEmbedder for Verba
@@ -24,84 +30,135 @@ class MiniLMEmbedder(Embedder):
         self.requires_library = ["torch", "transformers"]
         self.description = "Embeds and retrieves objects using SentenceTransformer's all-MiniLM-L6-v2 model"
         self.vectorizer = "MiniLM"
+        self.model_name = "sentence-transformers/all-MiniLM-L6-v2"
+        self.cache_model = self.model_name
+        # Padded tokens per forward pass, bounds the activation memory of one batch
+        self.max_batch_tokens = int(os.getenv("VERBA_MINILM_BATCH_TOKENS", 16384))
+        # Overlap in tokens between the windows of chunks longer than the model input
+        self.stride = int(os.getenv("VERBA_MINILM_STRIDE", 32))
+        # Chunks tokenized per call, bounds the memory of the tokenizer output
+        self.chunks_per_call = int(os.getenv("VERBA_MINILM_CHUNKS_PER_CALL", 1024))
+        # CPU threads used by torch, 0 keeps the torch default
+        self.threads = int(os.getenv("VERBA_MINILM_THREADS", 0))
         self.model = None
         self.tokenizer = None
+
+    def load_resources(self) -> None:
         try:
+            import torch
             from transformers import AutoTokenizer, AutoModel
 
-            self.model = AutoModel.from_pretrained(
-                "sentence-transformers/all-MiniLM-L6-v2"
-            )
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                "sentence-transformers/all-MiniLM-L6-v2"
-            )
+            if self.threads > 0:
+                torch.set_num_threads(self.threads)
+
+            self.model = AutoModel.from_pretrained(self.model_name)
+            self.model.eval()
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+
+        # from_pretrained raises OSError for a model it cannot download or find, ValueError for a broken config
+        except (ImportError, OSError, ValueError) as e:
+            raise self.load_failed(self.model_name, e)
 
-        except:
-            pass
+    def load_failed(self, model: str, error: Exception) -> Exception:
+        """Log why the model could not be loaded, ensure_loaded raises the returned error and tries again next call
+        @parameter model : str - Model name or path
+        @parameter error : Exception - Cause
+        @returns Exception - Error to raise
+        """
+        self.model = None
+        self.tokenizer = None
+        msg.fail(f"{self.name} could not load {model}: {error}")
+        return Exception(f"{self.name} is not available, loading {model} failed: {error}")
 
     def embed(
         self,
         documents: list[Document],
         client: Client,
+        tenant: str = TENANT,
     ) -> bool:
         """Embed verba documents and its chunks to Weaviate
         @parameter: documents : list[Document] - List of Verba documents
         @parameter: client : Client - Weaviate Client
-        @parameter: batch_size : int - Batch Size of Input
+        @parameter: tenant : str - Weaviate tenant
         @returns bool - Bool whether the embedding what successful
         """
+        self.vectorize_documents(documents)
 
-        for document in documents:
-            for chunk in document.chunks:
-                chunk.set_vector(self.vectorize_chunk(chunk))
+        return self.import_data(documents, client, tenant)
 
-        return self.import_data(documents, client)
+    def vectorize_chunk(self, chunk: Chunk) -> list[float]:
+        return self.vectorize_chunks([chunk.text])[0]
 
-    def vectorize_chunk(self, chunk) -> list[float]:
-        try:
-            import torch
+    def vectorize_chunks(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with mask-aware mean pooling and L2 normalization.
+        Texts longer than the model input are split into strided windows whose embeddings are averaged.
+        @parameter texts : list[str] - Texts to embed
+        @returns list[list[float]] - One normalized vector per text
+        """
+        if not texts:
+            return []
+
+        self.ensure_loaded()
+        start = time.perf_counter()
+        vectors = []
+        for i in range(0, len(texts), self.chunks_per_call):
+            vectors.append(self._vectorize_group(texts[i : i + self.chunks_per_call]))
+        vectors = np.concatenate(vectors)
+
+        elapsed = time.perf_counter() - start
+        msg.info(
+            f"Embedded {len(texts)} chunks with {self.name} in {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-9):.1f} chunks/s)"
+        )
+        return vectors.tolist()
+
+    def _vectorize_group(self, texts: list[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.max_length(),
+            stride=self.window_stride(),
+            return_overflowing_tokens=True,
+            padding=False,
+        )
+        windows = encoded["input_ids"]
+        owners = encoded["overflow_to_sample_mapping"]
+        lengths = [len(window) for window in windows]
+
+        window_embeddings = None
+        for batch in plan_batches(lengths, self.max_batch_tokens):
+            input_ids, attention_mask = pad_batch(
+                [windows[i] for i in batch], self.tokenizer.pad_token_id
+            )
+            pooled = mean_pool(self.forward(input_ids, attention_mask), attention_mask)
+            if window_embeddings is None:
+                window_embeddings = np.zeros(
+                    (len(windows), pooled.shape[1]), dtype=np.float32
+                )
+            window_embeddings[batch] = pooled
 
-            text = chunk.text
-            tokens = self.tokenizer.tokenize(text)
+        return l2_normalize(
+            combine_windows(window_embeddings, owners, lengths, len(texts))
+        )
 
-            max_length = (
-                self.tokenizer.model_max_length
-            )  # Get the max sequence length for the model
-            batches = []
-            batch = []
-            token_count = 0
+    def max_length(self) -> int:
+        # Some tokenizers report a huge sentinel value instead of the real limit
+        return min(self.tokenizer.model_max_length, 512)
 
-            for token in tokens:
-                token_length = len(
-                    self.tokenizer.encode(token, add_special_tokens=False)
-                )
-                if token_count + token_length <= max_length:
-                    batch.append(token)
-                    token_count += token_length
-                else:
-                    batches.append(" ".join(batch))
-                    batch = [token]
-                    token_count = token_length
-
-            # Don't forget to add the last batch
-            if batch:
-                batches.append(" ".join(batch))
-
-            embeddings = []
-
-            for batch in batches:
-                inputs = self.tokenizer(
-                    batch, return_tensors="pt", padding=True, truncation=True
-                )
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                # Taking the mean of the hidden states to obtain an embedding for the batch
-                embedding = outputs.last_hidden_state.mean(dim=1)
-                embeddings.append(embedding)
+    def window_stride(self) -> int:
+        # The tokenizer rejects a stride that leaves no new tokens per window, e.g. VERBA_MINILM_STRIDE=512
+        return max(min(self.stride, self.max_length() // 2), 0)
 
-            # Concatenate the embeddings to make averaging easier
-            all_embeddings = torch.cat(embeddings)
+    def forward(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Run the model on one padded batch
+        @parameter input_ids : np.ndarray - (batch, tokens) token ids
+        @parameter attention_mask : np.ndarray - (batch, tokens) attention mask
+        @returns np.ndarray - (batch, tokens, dim) last hidden state
+        """
+        import torch
 
-            return all_embeddings
-        except:
-            return []
+        with torch.inference_mode():
+            outputs = self.model(
+                input_ids=torch.from_numpy(input_ids),
+                attention_mask=torch.from_numpy(attention_mask),
+            )
+        return outputs.last_hidden_state.float().numpy()
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+
+from goldenverba.ingestion.embedding.MiniLMEmbedder import MiniLMEmbedder
+
+ONNX_MODEL_FILE = "model_quantized.onnx"
+
+
+class MiniLMONNXEmbedder(MiniLMEmbedder):
+    """
+    MiniLMONNXEmbedder for Verba, runs an int8-quantized all-MiniLM-L6-v2 export through ONNX Runtime on CPU.
+    Tokenization, batching, pooling and normalization are shared with MiniLMEmbedder, so both produce vectors of the same space
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.name = "MiniLMONNXEmbedder"
+        self.requires_library = ["onnxruntime", "transformers"]
+        self.requires_env = ["VERBA_MINILM_ONNX_PATH"]
+        self.description = "Embeds and retrieves objects locally using an int8-quantized all-MiniLM-L6-v2 model on ONNX Runtime"
+        # Directory with model_quantized.onnx and the tokenizer files, see `verba export-onnx`
+        self.model_path = os.getenv("VERBA_MINILM_ONNX_PATH", "")
+        self.cache_model = f"{self.model_name}:onnx-int8"
+        self.session = None
+        self.input_names = []
+
+    def load_resources(self) -> None:
+        model_file = os.path.join(self.model_path, ONNX_MODEL_FILE)
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise self.load_failed(model_file, e)
+        from onnxruntime.capi.onnxruntime_pybind11_state import (
+            Fail,
+            InvalidArgument,
+            InvalidGraph,
+            InvalidProtobuf,
+            NoModel,
+            NoSuchFile,
+        )
+
+        try:
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = (
+                onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            )
+            if self.threads > 0:
+                options.intra_op_num_threads = self.threads
+
+            self.session = onnxruntime.InferenceSession(
+                model_file,
+                options,
+                providers=["CPUExecutionProvider"],
+            )
+            self.input_names = [i.name for i in self.session.get_inputs()]
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.model_path, local_files_only=True
+            )
+
+        # ONNX Runtime raises its own errors for a missing or broken model file, the tokenizer OSError or ValueError
+        except (OSError, ValueError, Fail, InvalidArgument, InvalidGraph, InvalidProtobuf, NoModel, NoSuchFile) as e:
+            self.session = None
+            raise self.load_failed(model_file, e)
+
+    def forward(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Run the ONNX model on one padded batch
+        @parameter input_ids : np.ndarray - (batch, tokens) token ids
+        @parameter attention_mask : np.ndarray - (batch, tokens) attention mask
+        @returns np.ndarray - (batch, tokens, dim) last hidden state
+        """
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        return self.session.run(None, inputs)[0].astype(np.float32)
+
+
+def export_minilm_onnx(
+    output_dir: str, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+) -> str:
+    """Export MiniLM to ONNX and quantize its weights to int8, requires torch, transformers and onnxruntime
+    @parameter output_dir : str - Directory that receives the model and tokenizer files
+    @parameter model_name : str - Hugging Face model to export
+    @returns str - Path of the quantized model
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["Verba export sample"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    dynamic_axes = {"batch": 0, "tokens": 1}
+
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic_axes,
+                "attention_mask": dynamic_axes,
+                "token_type_ids": dynamic_axes,
+                "last_hidden_state": dynamic_axes,
+            },
+            opset_version=14,
+        )
+
+    quantized_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+
+    return quantized_path
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from typing import Optional
+
+import numpy as np
+
+from wasabi import msg
+
+# Seconds after which the byte total is read from the file again, other processes write to it too
+_SIZE_SYNC_INTERVAL = 60.0
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed embedding cache, keyed by (embedding model, sha256 of the chunk text).
+    Backed by SQLite so that all tenant processes on a host can share one file. Vectors are stored as float32 blobs,
+    the least recently used entries are evicted once the blobs exceed max_bytes
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running total of the vector bytes, only the inserts of this process are added between syncs
+        self._bytes = None
+        self._bytes_synced = 0.0
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[list[float]]]:
+        """Look up the vectors of several texts
+        @parameter model : str - Embedding model identifier
+        @parameter texts : list[str] - Chunk texts
+        @returns list[Optional[list[float]]] - Cached vector or None for every text
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i : i + 500]
+                rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+                self._connection.commit()
+
+            vectors = [
+                np.frombuffer(found[h], dtype="<f4").tolist() if h in found else None
+                for h in hashes
+            ]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+
+        return vectors
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store the vectors of several texts and evict the least recently used entries if needed
+        @parameter model : str - Embedding model identifier
+        @parameter texts : list[str] - Chunk texts
+        @parameter vectors : list[list[float]] - Vectors in the same order as texts
+        """
+        now = time.time()
+        rows = [
+            (model, self.text_hash(text), np.asarray(vector, dtype="<f4").tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            # Replaced entries do not add their size again
+            replaced = 0
+            for i in range(0, len(rows), 500):
+                batch = [row[1] for row in rows[i : i + 500]]
+                replaced += self._connection.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchone()[0]
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(sum(len(row[2]) for row in rows) - replaced)
+            self._connection.commit()
+
+    def _size(self) -> int:
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def _evict(self, added: int) -> None:
+        now = time.monotonic()
+        if self._bytes is None or now - self._bytes_synced > _SIZE_SYNC_INTERVAL:
+            self._bytes, self._bytes_synced = self._size(), now
+        else:
+            self._bytes += added
+        if self._bytes <= self.max_bytes:
+            return
+
+        # Read the actual total before evicting, other processes may have evicted meanwhile
+        total = self._size()
+        self._bytes, self._bytes_synced = total, now
+        if total <= self.max_bytes:
+            return
+
+        # Free a little more than needed so that eviction does not run on every insert
+        to_free = total - int(self.max_bytes * 0.9)
+        victims = []
+        for model, text_hash, size in self._connection.execute(
+            "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+        ):
+            victims.append((model, text_hash))
+            to_free -= size
+            self._bytes -= size
+            if to_free <= 0:
+                break
+
+        self._connection.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims
+        )
+        msg.info(f"Evicted {len(victims)} entries from the embedding cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process wide embedding cache, None if disabled with VERBA_EMBEDDING_CACHE_MAX_MB=0"""
+    global _cache
+
+    max_mb = float(os.getenv("VERBA_EMBEDDING_CACHE_MAX_MB", 1024))
+    if max_mb <= 0:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                os.getenv(
+                    "VERBA_EMBEDDING_CACHE_PATH", "./.verba/embedding_cache.sqlite"
+                ),
+                int(max_mb * 1024 * 1024),
+            )
+    return _cache
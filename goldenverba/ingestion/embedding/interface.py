@@ -3,9 +3,13 @@ import os
 
 from weaviate import Client
 
+from goldenverba.ingestion.chunking.chunk import join_chunks
 from goldenverba.ingestion.reader.document import Document
 from goldenverba.ingestion.reader.interface import InputForm
 from goldenverba.ingestion.component import VerbaComponent
+from goldenverba.ingestion.embedding.cache import get_embedding_cache
+from goldenverba.metrics import INGEST_STAGE_SECONDS, record_cache
+from goldenverba.ratelimit import BULK, estimate_tokens, get_openai_limiter
 
 from goldenverba.ingestion.schema.schema_generation import (
     VECTORIZERS,
@@ -17,6 +21,21 @@ from wasabi import msg
 
 TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
 
+# False keeps Document objects metadata only, their text is rebuilt from the chunks when it is read
+STORE_DOCUMENT_TEXT = os.getenv("VERBA_STORE_DOCUMENT_TEXT", "true").lower() == "true"
+
+
+def rebuilds_text(document: Document) -> bool:
+    """Whether joining the chunks of a document gives its exact text back"""
+    if not document.chunks or any(chunk.span_start is None for chunk in document.chunks):
+        return False
+    chunks = [
+        {"text": chunk.text, "chunk_id": chunk.chunk_id, "span_start": chunk.span_start, "gap": chunk.gap}
+        for chunk in document.chunks
+    ]
+    return join_chunks(chunks) == document.text
+
+
 class Embedder(VerbaComponent):
     """
     Interface for Verba Embedding
@@ -26,6 +45,7 @@ class Embedder(VerbaComponent):
         super().__init__()
         self.input_form = InputForm.TEXT.value  # Default for all Embedders
         self.vectorizer = ""
+        self.cache_model = ""  # Identifies the embedding model in the embedding cache
 
     def embed(documents: list[Document], client: Client, batch_size: int = 100) -> bool:
         """Embed verba documents and its chunks to Weaviate
@@ -36,15 +56,55 @@ class Embedder(VerbaComponent):
         """
         raise NotImplementedError("embed method must be implemented by a subclass.")
 
+    def vectorize_chunks(self, texts: list[str]) -> list[list[float]]:
+        """Compute the vectors of texts on the client side
+        @parameter: texts : list[str] - Texts to embed
+        @returns list[list[float]] - One vector per text
+        """
+        raise NotImplementedError(
+            "vectorize_chunks method must be implemented by a subclass."
+        )
+
+    def vectorize_documents(self, documents: list[Document]) -> None:
+        """Set the vector of every chunk, vectors of unchanged texts come from the embedding cache
+        @parameter: documents : list[Document] - List of Verba documents
+        """
+        chunks = [chunk for document in documents for chunk in document.chunks]
+        texts = [chunk.text for chunk in chunks]
+        if not texts:
+            return
+
+        cache = get_embedding_cache()
+        vectors = cache.get_many(self.cache_model, texts) if cache else [None] * len(texts)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if cache:
+            record_cache("embedding", len(texts) - len(missing), len(missing))
+        if missing:
+            with INGEST_STAGE_SECONDS.time(stage="vectorize"):
+                computed = self.vectorize_chunks([texts[i] for i in missing])
+            if cache:
+                cache.put_many(self.cache_model, [texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+
+        msg.info(
+            f"Vectorized {len(texts)} chunks with {self.name} ({len(texts) - len(missing)} from cache)"
+        )
+
+        for chunk, vector in zip(chunks, vectors):
+            chunk.set_vector(vector)
+
     def import_data(
         self,
         documents: list[Document],
         client: Client,
+        tenant: str = TENANT,
     ) -> bool:
         """Import verba documents and its chunks to Weaviate
         @parameter: documents : list[Document] - List of Verba documents
         @parameter: client : Client - Weaviate Client
-        @parameter: batch_size : int - Batch Size of Input
+        @parameter: tenant : str - Weaviate tenant
         @returns bool - Bool whether the embedding what successful
         """
         try:
@@ -74,10 +134,12 @@ class Embedder(VerbaComponent):
                     f"({i+1}/{len(documents)}) Importing document {document.name} with {len(batches)} batches"
                 )
 
+                # Chunks without spans, e.g. of a .verba corpus, or that do not give the text back keep it
+                store_text = STORE_DOCUMENT_TEXT or not rebuilds_text(document)
                 with client.batch as batch:
                     batch.batch_size = 1
                     properties = {
-                        "text": str(document.text),
+                        "text": str(document.text) if store_text else "",
                         "doc_name": str(document.name),
                         "doc_type": str(document.type),
                         "doc_link": str(document.link),
@@ -86,47 +148,63 @@ class Embedder(VerbaComponent):
                     }
 
                     class_name = "Document_" + strip_non_letters(self.vectorizer)
-                    uuid = client.batch.add_data_object(properties, class_name,tenant=TENANT)
+                    uuid = client.batch.add_data_object(properties, class_name,tenant=tenant)
 
                     for chunk in document.chunks:
                         chunk.set_uuid(uuid)
 
-                for batch_id, chunk_batch in enumerate(batches):
-                    with client.batch as batch:
-                        batch.batch_size = len(chunk_batch)
-                        for i, chunk in enumerate(chunk_batch):
-                            msg.info(
-                                f"({i+1}/{len(document.chunks)} of batch ({batch_id+1})) Importing chunk of {document.name} ({self.vectorizer})"
-                            )
-
-                            properties = {
-                                "text": chunk.text,
-                                "doc_name": str(document.name),
-                                "doc_uuid": chunk.doc_uuid,
-                                "doc_type": chunk.doc_type,
-                                "chunk_id": chunk.chunk_id,
-                            }
-                            class_name = "Chunk_" + strip_non_letters(self.vectorizer)
-
-                            # Check if vector already exists
-                            if chunk.vector == None:
-                                client.batch.add_data_object(properties, class_name,tenant=TENANT)
-                            else:
-                                client.batch.add_data_object(
-                                    properties, class_name, vector=chunk.vector,tenant=TENANT
+                with INGEST_STAGE_SECONDS.time(stage="weaviate_batch"):
+                    for batch_id, chunk_batch in enumerate(batches):
+                        if self.vectorizer == "text2vec-openai":
+                            # Weaviate embeds the chunks without a vector with OpenAI, one request per object
+                            missing = [chunk for chunk in chunk_batch if chunk.vector is None]
+                            if missing:
+                                get_openai_limiter().acquire(
+                                    requests=len(missing),
+                                    tokens=sum(estimate_tokens(chunk.text) for chunk in missing),
+                                    priority=BULK,
                                 )
-                            #client.batch.add_data_object(properties, "Chunk")
-                            wait_time_ms = int(os.getenv("VERBA_WAIT_TIME_BETWEEN_INGESTION_QUERIES_MS","0"))
-                            time.sleep(float(wait_time_ms)/1000)
-
-                self.check_document_status(
-                    client,
-                    uuid,
-                    document.name,
-                    "Document_" + strip_non_letters(self.vectorizer),
-                    "Chunk_" + strip_non_letters(self.vectorizer),
-                    len(document.chunks),
-                )
+                        with client.batch as batch:
+                            batch.batch_size = len(chunk_batch)
+                            for i, chunk in enumerate(chunk_batch):
+                                msg.info(
+                                    f"({i+1}/{len(document.chunks)} of batch ({batch_id+1})) Importing chunk of {document.name} ({self.vectorizer})"
+                                )
+
+                                properties = {
+                                    "text": chunk.text,
+                                    "doc_name": str(document.name),
+                                    "doc_uuid": chunk.doc_uuid,
+                                    "doc_type": chunk.doc_type,
+                                    "chunk_id": chunk.chunk_id,
+                                }
+                                if chunk.span_start is not None:
+                                    properties["span_start"] = chunk.span_start
+                                if chunk.gap is not None:
+                                    properties["gap"] = chunk.gap
+                                class_name = "Chunk_" + strip_non_letters(self.vectorizer)
+
+                                # Check if vector already exists
+                                if chunk.vector == None:
+                                    client.batch.add_data_object(properties, class_name,tenant=tenant)
+                                else:
+                                    client.batch.add_data_object(
+                                        properties, class_name, vector=chunk.vector,tenant=tenant
+                                    )
+                                #client.batch.add_data_object(properties, "Chunk")
+                                wait_time_ms = int(os.getenv("VERBA_WAIT_TIME_BETWEEN_INGESTION_QUERIES_MS","0"))
+                                time.sleep(float(wait_time_ms)/1000)
+
+                with INGEST_STAGE_SECONDS.time(stage="verification"):
+                    self.check_document_status(
+                        client,
+                        uuid,
+                        document.name,
+                        "Document_" + strip_non_letters(self.vectorizer),
+                        "Chunk_" + strip_non_letters(self.vectorizer),
+                        len(document.chunks),
+                        tenant,
+                    )
             return True
         except Exception as e:
             raise Exception(e)
@@ -139,6 +217,7 @@ class Embedder(VerbaComponent):
         doc_class_name: str,
         chunk_class_name: str,
         chunk_count: int,
+        tenant: str = TENANT,
     ):
         """Verifies that imported documents and its chunks exist in the database, if not, remove everything that was added and rollback
         @parameter: client : Client - Weaviate Client
@@ -147,12 +226,13 @@ class Embedder(VerbaComponent):
         @parameter: doc_class_name : str - Class name of Document
         @parameter: chunk_class_name : str - Class name of Chunks
         @parameter: chunk_count : int - Number of expected chunks
+        @parameter: tenant : str - Weaviate tenant
         @returns Optional[Exception] - Raises Exceptions if imported fail, will be catched by the manager
         """
         document = client.data_object.get_by_id(
             doc_uuid,
             class_name=doc_class_name,
-            tenant=TENANT
+            tenant=tenant
         )
 
         if document != None:
@@ -163,7 +243,7 @@ class Embedder(VerbaComponent):
                         "doc_name",
                     ],
                 )
-                .with_tenant(TENANT)
+                .with_tenant(tenant)
                 .with_where(
                     {
                         "path": ["doc_uuid"],
@@ -177,7 +257,7 @@ class Embedder(VerbaComponent):
 
             if len(results["data"]["Get"][chunk_class_name]) != chunk_count:
                 # Rollback if fails
-                self.remove_document(client, doc_name, doc_class_name, chunk_class_name)
+                self.remove_document(client, doc_name, doc_class_name, chunk_class_name, tenant)
                 raise Exception(
                     f"Chunk mismatch for {doc_uuid} {len(results['data']['Get'][chunk_class_name])} != {chunk_count}"
                 )
@@ -185,24 +265,30 @@ class Embedder(VerbaComponent):
             raise Exception(f"Document {doc_uuid} not found {document}")
 
     def remove_document(
-        self, client: Client, doc_name: str, doc_class_name: str, chunk_class_name: str
+        self,
+        client: Client,
+        doc_name: str,
+        doc_class_name: str,
+        chunk_class_name: str,
+        tenant: str = TENANT,
     ) -> None:
         """Deletes documents and its chunks
         @parameter: client : Client - Weaviate Client
         @parameter: doc_name : str - Document name
         @parameter: doc_class_name : str - Class name of Document
         @parameter: chunk_class_name : str - Class name of Chunks
+        @parameter: tenant : str - Weaviate tenant
         """
         client.batch.delete_objects(
             class_name=doc_class_name,
             where={"path": ["doc_name"], "operator": "Equal", "valueText": doc_name},
-            tenant=TENANT
+            tenant=tenant
         )
 
         client.batch.delete_objects(
             class_name=chunk_class_name,
             where={"path": ["doc_name"], "operator": "Equal", "valueText": doc_name},
-            tenant=TENANT
+            tenant=tenant
         )
 
         msg.warn(f"Deleted document {doc_name} and its chunks")
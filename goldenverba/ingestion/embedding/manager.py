@@ -1,9 +1,12 @@
+from typing import Optional
+
 from weaviate import Client
 
 from goldenverba.ingestion.reader.document import Document
 from goldenverba.ingestion.embedding.interface import Embedder
 from goldenverba.ingestion.embedding.ADAEmbedder import ADAEmbedder
 from goldenverba.ingestion.embedding.MiniLMEmbedder import MiniLMEmbedder
+from goldenverba.ingestion.embedding.MiniLMONNXEmbedder import MiniLMONNXEmbedder
 
 from wasabi import msg
 
@@ -11,29 +14,45 @@ from wasabi import msg
 class EmbeddingManager:
     def __init__(self):
         self.embedders: dict[str, Embedder] = {
-            "MiniLMEmbedder": MiniLMEmbedder(),
             "ADAEmbedder": ADAEmbedder(),
+            "MiniLMEmbedder": MiniLMEmbedder(),
+            "MiniLMONNXEmbedder": MiniLMONNXEmbedder(),
         }
         self.selected_embedder: Embedder = self.embedders["ADAEmbedder"]
 
     def embed(
-        self, documents: list[Document], client: Client, batch_size: int = 100
+        self,
+        documents: list[Document],
+        client: Client,
+        batch_size: int = 100,
+        embedder: Optional[str] = None,
     ) -> bool:
         """Embed verba documents and its chunks to Weaviate
         @parameter: documents : list[Document] - List of Verba documents
         @parameter: client : Client - Weaviate Client
         @parameter: batch_size : int - Batch Size of Input
+        @parameter: embedder : Optional[str] - Embedder to use instead of the selected one
         @returns bool - Bool whether the embedding what successful
         """
-        return self.selected_embedder.embed(documents, client)
+        return self.get_embedder(embedder).embed(documents, client)
 
     def set_embedder(self, embedder: str) -> bool:
         if embedder in self.embedders:
             self.selected_embedder = self.embedders[embedder]
+            self.selected_embedder.ensure_loaded()
             return True
         else:
             msg.warn(f"Embedder {embedder} not found")
             return False
 
+    def get_embedder(self, embedder: Optional[str] = None) -> Embedder:
+        """Embedder of the given name, ready to use, or the selected one"""
+        if embedder is None:
+            return self.selected_embedder
+        if embedder not in self.embedders:
+            raise Exception(f"Embedder {embedder} not found")
+        self.embedders[embedder].ensure_loaded()
+        return self.embedders[embedder]
+
     def get_embedders(self) -> dict[str, Embedder]:
         return self.embedders
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def mean_pool(hidden_states: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Average token embeddings while ignoring padding
+    @parameter hidden_states : np.ndarray - (batch, tokens, dim) last hidden state
+    @parameter attention_mask : np.ndarray - (batch, tokens) 1 for real tokens, 0 for padding
+    @returns np.ndarray - (batch, dim) sentence embeddings
+    """
+    mask = attention_mask[..., None].astype(hidden_states.dtype)
+    summed = (hidden_states * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return summed / counts
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length so dot product equals cosine similarity
+    @parameter vectors : np.ndarray - (n, dim) vectors
+    @returns np.ndarray - (n, dim) normalized vectors
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def plan_batches(lengths: list[int], max_tokens: int, max_batch_size: int = 256) -> list[list[int]]:
+    """Group sequences into padded batches whose size (rows * longest row) stays within a token budget.
+    Sequences are sorted by length first so that little compute is spent on padding.
+    @parameter lengths : list[int] - Token count of every sequence
+    @parameter max_tokens : int - Budget of padded tokens per batch
+    @parameter max_batch_size : int - Upper bound of sequences per batch
+    @returns list[list[int]] - Batches of indices into lengths
+    """
+    batches = []
+    batch = []
+    longest = 0
+
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        candidate_longest = max(longest, lengths[index])
+        if batch and (
+            candidate_longest * (len(batch) + 1) > max_tokens
+            or len(batch) >= max_batch_size
+        ):
+            batches.append(batch)
+            batch = []
+            candidate_longest = lengths[index]
+        batch.append(index)
+        longest = candidate_longest
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def pad_batch(sequences: list[list[int]], pad_id: int) -> tuple[np.ndarray, np.ndarray]:
+    """Right-pad token id sequences into a dense batch
+    @parameter sequences : list[list[int]] - Token ids per sequence
+    @parameter pad_id : int - Id of the padding token
+    @returns tuple[np.ndarray, np.ndarray] - (input_ids, attention_mask), both int64
+    """
+    longest = max(len(sequence) for sequence in sequences)
+    input_ids = np.full((len(sequences), longest), pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(sequences), longest), dtype=np.int64)
+    for row, sequence in enumerate(sequences):
+        input_ids[row, : len(sequence)] = sequence
+        attention_mask[row, : len(sequence)] = 1
+    return input_ids, attention_mask
+
+
+def combine_windows(
+    window_embeddings: np.ndarray, owners: list[int], weights: list[int], count: int
+) -> np.ndarray:
+    """Merge the embeddings of overflow windows back into one embedding per input text
+    @parameter window_embeddings : np.ndarray - (windows, dim) pooled window embeddings
+    @parameter owners : list[int] - Index of the input text every window belongs to
+    @parameter weights : list[int] - Token count of every window
+    @parameter count : int - Number of input texts
+    @returns np.ndarray - (count, dim) token-weighted average per input text
+    """
+    weights = np.asarray(weights, dtype=window_embeddings.dtype)[:, None]
+    combined = np.zeros((count, window_embeddings.shape[1]), dtype=window_embeddings.dtype)
+    totals = np.zeros((count, 1), dtype=window_embeddings.dtype)
+    np.add.at(combined, owners, window_embeddings * weights)
+    np.add.at(totals, owners, weights)
+    return combined / np.clip(totals, 1e-9, None)
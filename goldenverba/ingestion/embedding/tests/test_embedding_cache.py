@@ -0,0 +1,83 @@
+from goldenverba.ingestion.chunking.chunk import Chunk
+from goldenverba.ingestion.embedding import interface
+from goldenverba.ingestion.embedding.cache import EmbeddingCache
+from goldenverba.ingestion.embedding.interface import Embedder
+from goldenverba.ingestion.reader.document import Document
+
+
+class CountingEmbedder(Embedder):
+    def __init__(self):
+        super().__init__()
+        self.name = "CountingEmbedder"
+        self.cache_model = "counting"
+        self.computed = []
+
+    def vectorize_chunks(self, texts):
+        self.computed += texts
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_get_and_put(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=1 << 20)
+    cache.put_many("model", ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many("model", ["b", "c", "a"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert cache.get_many("other-model", ["a"]) == [None]
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+    assert stats["bytes"] == 16
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Every vector takes 8 bytes, so the cap holds four of them
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=32)
+    for text in ["a", "b", "c", "d"]:
+        cache.put_many("model", [text], [[0.0, 0.0]])
+    cache.get_many("model", ["a"])
+    cache.put_many("model", ["e"], [[0.0, 0.0]])
+
+    vectors = dict(zip("abcde", cache.get_many("model", list("abcde"))))
+    assert vectors["a"] is not None and vectors["e"] is not None
+    assert vectors["b"] is None
+    assert cache.stats()["bytes"] <= 32
+
+
+def test_unchanged_text_is_never_embedded_twice(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=1 << 20)
+    monkeypatch.setattr(interface, "get_embedding_cache", lambda: cache)
+    embedder = CountingEmbedder()
+
+    def document(*texts):
+        doc = Document(text=" ".join(texts), name="doc")
+        doc.chunks = [Chunk(text=text, chunk_id=i) for i, text in enumerate(texts)]
+        return doc
+
+    embedder.vectorize_documents([document("one", "two")])
+    second = document("two", "three")
+    embedder.vectorize_documents([second])
+
+    assert embedder.computed == ["one", "two", "three"]
+    assert [chunk.vector for chunk in second.chunks] == [[3.0, 1.0], [5.0, 1.0]]
+
+
+def test_puts_only_scan_the_table_when_the_total_crosses_the_cap(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=80)
+    scans = []
+
+    def trace(statement):
+        if statement == "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings":
+            scans.append(statement)
+
+    cache._connection.set_trace_callback(trace)
+
+    # Every vector takes 8 bytes, replacing an entry does not count twice
+    for text in "abcdefghij":
+        cache.put_many("model", [text], [[0.0, 0.0]])
+    cache.put_many("model", ["a"], [[1.0, 1.0]])
+    assert len(scans) == 1
+    assert cache.stats()["bytes"] == 80
+
+    cache.put_many("model", ["k"], [[0.0, 0.0]])
+    assert len(scans) == 2
+    assert cache._bytes == cache.stats()["bytes"] <= 72
@@ -0,0 +1,27 @@
+import sys
+
+import pytest
+
+from goldenverba.ingestion.embedding.MiniLMEmbedder import MiniLMEmbedder
+
+
+def test_missing_model_raises_a_clear_error_on_every_use(monkeypatch):
+    # None in sys.modules makes the import fail, whether torch is installed or not
+    monkeypatch.setitem(sys.modules, "torch", None)
+    embedder = MiniLMEmbedder()
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="MiniLMEmbedder is not available, loading sentence-transformers"):
+            embedder.ensure_loaded()
+    with pytest.raises(Exception, match="MiniLMEmbedder is not available"):
+        embedder.vectorize_chunks(["text"])
+
+
+def test_missing_onnx_export_names_the_model_file(monkeypatch, tmp_path):
+    monkeypatch.setenv("VERBA_MINILM_ONNX_PATH", str(tmp_path))
+    from goldenverba.ingestion.embedding.MiniLMONNXEmbedder import MiniLMONNXEmbedder
+
+    embedder = MiniLMONNXEmbedder()
+    with pytest.raises(Exception, match="MiniLMONNXEmbedder is not available, loading .*model_quantized.onnx"):
+        embedder.ensure_loaded()
+    assert embedder.session is None
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+
+from goldenverba.ingestion.embedding.MiniLMEmbedder import MiniLMEmbedder
+from goldenverba.ingestion.embedding.MiniLMONNXEmbedder import MiniLMONNXEmbedder
+
+TEXTS = [
+    "Verba is a retrieval augmented generation application.",
+    "Weaviate stores the chunks of every tenant in its own shard.",
+    "short",
+    " ".join(["A long chunk that needs several overflow windows."] * 120),
+]
+
+
+@pytest.mark.skipif(
+    not os.path.isdir(os.getenv("VERBA_MINILM_ONNX_PATH", "")),
+    reason="VERBA_MINILM_ONNX_PATH does not point to an exported model",
+)
+def test_onnx_matches_pytorch():
+    torch_vectors = np.array(MiniLMEmbedder().vectorize_chunks(TEXTS))
+    onnx_vectors = np.array(MiniLMONNXEmbedder().vectorize_chunks(TEXTS))
+
+    assert onnx_vectors.shape == torch_vectors.shape
+    # Both are L2-normalized, so the row-wise dot product is the cosine similarity
+    cosine = (torch_vectors * onnx_vectors).sum(axis=1)
+    assert cosine.min() > 0.98
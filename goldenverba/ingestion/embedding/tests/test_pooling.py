@@ -0,0 +1,62 @@
+import numpy as np
+
+from goldenverba.ingestion.embedding.pooling import (
+    mean_pool,
+    l2_normalize,
+    plan_batches,
+    pad_batch,
+    combine_windows,
+)
+
+
+def test_mean_pool_ignores_padding():
+    hidden = np.array([[[1.0, 1.0], [3.0, 3.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(mean_pool(hidden, mask), [[2.0, 2.0]])
+
+
+def test_l2_normalize():
+    vectors = l2_normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert np.allclose(vectors[0], [0.6, 0.8])
+    assert np.allclose(vectors[1], [0.0, 0.0])
+
+
+def test_plan_batches_respects_token_budget():
+    lengths = [10, 200, 12, 190, 11, 50]
+    batches = plan_batches(lengths, max_tokens=400)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) == 1 or max(lengths[i] for i in batch) * len(batch) <= 400
+    # Short sequences end up together instead of being padded to the longest one
+    assert {0, 2, 4} <= set(batches[0])
+
+
+def test_plan_batches_oversized_sequence_gets_its_own_batch():
+    assert plan_batches([1000, 5], max_tokens=100) == [[1], [0]]
+
+
+def test_pad_batch():
+    input_ids, attention_mask = pad_batch([[5, 6, 7], [8]], pad_id=0)
+    assert input_ids.tolist() == [[5, 6, 7], [8, 0, 0]]
+    assert attention_mask.tolist() == [[1, 1, 1], [1, 0, 0]]
+
+
+def test_combine_windows_weights_by_tokens():
+    windows = np.array([[1.0, 0.0], [0.0, 1.0], [2.0, 2.0]])
+    combined = combine_windows(windows, owners=[0, 0, 1], weights=[3, 1, 5], count=2)
+    assert np.allclose(combined, [[0.75, 0.25], [2.0, 2.0]])
+
+
+def test_window_stride_leaves_new_tokens_in_every_window():
+    from types import SimpleNamespace
+
+    from goldenverba.ingestion.embedding.MiniLMEmbedder import MiniLMEmbedder
+
+    embedder = MiniLMEmbedder()
+    embedder.tokenizer = SimpleNamespace(model_max_length=256)
+    assert embedder.window_stride() == 32
+    embedder.stride = 512
+    assert embedder.window_stride() == 128
+    # Sentinel model_max_length of tokenizers without a limit
+    embedder.tokenizer = SimpleNamespace(model_max_length=10**30)
+    assert embedder.window_stride() == 256
@@ -0,0 +1,114 @@
+import contextlib
+import os
+import threading
+
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from wasabi import msg
+
+from goldenverba.metrics import record_weaviate_error
+
+# Idle Weaviate batches kept for the next imports, more concurrent imports create extra ones
+INGEST_BATCH_POOL_SIZE = int(os.getenv("VERBA_INGEST_BATCH_POOL_SIZE", 4))
+
+
+class IngestIncomplete(Exception):
+    """A batch of an import failed after earlier batches were written to Weaviate"""
+
+    def __init__(self, cause: str, imported_documents: list):
+        super().__init__(
+            f"{cause}\n{len(imported_documents)} documents were imported before the failure and stay in Weaviate"
+        )
+        self.imported_documents = imported_documents
+
+
+@dataclass(frozen=True)
+class PipelineSpec:
+    """
+    Components and settings of one import, fixed for its whole run.
+    Imports take a spec instead of reading the selected components of the managers, so concurrent imports
+    with different components do not see each other's choices
+    """
+
+    reader: str
+    chunker: str
+    embedder: str
+    units: int
+    overlap: int
+    document_type: str = "Documentation"
+
+    def __post_init__(self):
+        if self.units <= 0:
+            raise ValueError(f"Chunk units must be positive, got {self.units}")
+        if not 0 <= self.overlap < self.units:
+            raise ValueError(
+                f"Chunk overlap must be between 0 and the units (Units {self.units}/ Overlap {self.overlap})"
+            )
+
+
+class IngestClient:
+    """
+    Weaviate client of one import: shares the connection of the manager's client but batches into a batch
+    of its own, so concurrent imports neither flush nor configure each other's objects.
+    Batch errors are kept on the lease instead of on the manager
+    """
+
+    def __init__(self, client: Any, batch: Any):
+        self._client = client
+        self.batch = batch
+        self.last_error = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def pop_last_error(self):
+        last_error = self.last_error
+        self.last_error = None
+        return last_error
+
+
+class BatchPool:
+    """Weaviate batches lent to imports one at a time, created on demand and reused afterwards"""
+
+    def __init__(self, client: Any, new_batch: Callable[[], Any], size: int = INGEST_BATCH_POOL_SIZE):
+        self.client = client
+        self.new_batch = new_batch
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[IngestClient]:
+        with self._lock:
+            batch = self._idle.pop() if self._idle else None
+        if batch is None:
+            batch = self.new_batch()
+        lease = IngestClient(self.client, batch)
+
+        def batch_callback(logs: Optional[list]):
+            if logs is not None:
+                for result in logs:
+                    if "result" in result and "errors" in result["result"]:
+                        if "error" in result["result"]["errors"]:
+                            msg.fail(result["result"])
+                            record_weaviate_error("batch")
+                            lease.last_error = result["result"]
+
+        batch.configure(callback=batch_callback)
+        try:
+            yield lease
+        finally:
+            # A batch left with objects by a failed import is dropped rather than flushed into the next one
+            if not _pending(batch):
+                with self._lock:
+                    if len(self._idle) < self.size:
+                        self._idle.append(batch)
+
+
+def _pending(batch: Any) -> int:
+    """Objects added to a batch and not sent yet"""
+    try:
+        return batch.num_objects() + batch.num_references()
+    except AttributeError:
+        return len(getattr(batch, "pending", []))
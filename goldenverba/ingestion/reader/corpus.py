@@ -0,0 +1,268 @@
+import json
+import struct
+
+from typing import Iterator, Optional
+
+import numpy as np
+
+from goldenverba.ingestion.reader.document import Document
+from goldenverba.ingestion.chunking.chunk import Chunk
+
+# On-disk layout of a .verba corpus file (all integers little endian)
+#
+#   magic     8 bytes   b"VERBACRP"
+#   version   uint32    FORMAT_VERSION
+#   hlen      uint32    Length of the JSON header in bytes
+#   header    hlen      UTF-8 JSON: document metadata, counts and section table
+#   sections  ...       Each section starts on a 64 byte boundary
+#
+# Sections
+#   doc_text_offsets    uint64 (n_docs + 1)      Byte offsets into doc_text
+#   doc_text            uint8                    Concatenated UTF-8 document texts
+#   doc_chunk_offsets   uint64 (n_docs + 1)      Chunk index range of every document
+#   chunk_ids           int64  (n_chunks)        Chunk id within its document
+#   chunk_text_offsets  uint64 (n_chunks + 1)    Byte offsets into chunk_text
+#   chunk_text          uint8                    Concatenated UTF-8 chunk texts
+#   vectors             float32 (n_chunks, dim)  Optional, only if all chunks carry a vector
+
+MAGIC = b"VERBACRP"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _encode_texts(texts: list[str]) -> tuple[np.ndarray, bytes]:
+    """Encode texts into one blob and an offset table
+    @parameter texts : list[str] - Texts to encode
+    @returns tuple[np.ndarray, bytes] - Offsets (len(texts) + 1) and the blob
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    if encoded:
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return offsets, b"".join(encoded)
+
+
+def _collect_vectors(chunks: list[Chunk]) -> Optional[np.ndarray]:
+    """Stack chunk vectors into a float32 matrix, chunks either all carry a vector or none
+    @parameter chunks : list[Chunk] - All chunks of the corpus
+    @returns Optional[np.ndarray] - (n_chunks, dim) matrix or None
+    """
+    with_vector = [chunk.vector is not None and len(chunk.vector) > 0 for chunk in chunks]
+    if not chunks or not any(with_vector):
+        return None
+    if not all(with_vector):
+        raise ValueError("Either all chunks or none of them must have a vector")
+    return np.asarray([chunk.vector for chunk in chunks], dtype="<f4")
+
+
+def write_corpus(
+    documents: list[Document], file_path: str, vectorizer: str = ""
+) -> None:
+    """Write chunked (and optionally embedded) documents to a .verba corpus file
+    @parameter documents : list[Document] - List of Verba documents
+    @parameter file_path : str - Target path, must end with .verba
+    @parameter vectorizer : str - Vectorizer that produced the chunk vectors
+    """
+    if not file_path.endswith(".verba"):
+        raise ValueError("The file extension must be .verba")
+
+    chunks = [chunk for document in documents for chunk in document.chunks]
+
+    doc_text_offsets, doc_text = _encode_texts([d.text for d in documents])
+    chunk_text_offsets, chunk_text = _encode_texts([c.text for c in chunks])
+
+    doc_chunk_offsets = np.zeros(len(documents) + 1, dtype="<u8")
+    if documents:
+        doc_chunk_offsets[1:] = np.cumsum([len(d.chunks) for d in documents])
+
+    chunk_ids = np.asarray(
+        [
+            int(chunk.chunk_id) if chunk.chunk_id != "" else i
+            for document in documents
+            for i, chunk in enumerate(document.chunks)
+        ],
+        dtype="<i8",
+    )
+
+    vectors = _collect_vectors(chunks)
+    if vectors is not None and not vectorizer:
+        raise ValueError("The vectorizer that produced the chunk vectors must be given")
+
+    arrays = {
+        "doc_text_offsets": doc_text_offsets,
+        "doc_text": np.frombuffer(doc_text, dtype=np.uint8),
+        "doc_chunk_offsets": doc_chunk_offsets,
+        "chunk_ids": chunk_ids,
+        "chunk_text_offsets": chunk_text_offsets,
+        "chunk_text": np.frombuffer(chunk_text, dtype=np.uint8),
+    }
+    if vectors is not None:
+        arrays["vectors"] = vectors
+
+    header = {
+        "version": FORMAT_VERSION,
+        "vectorizer": vectorizer,
+        "n_documents": len(documents),
+        "n_chunks": len(chunks),
+        "dim": int(vectors.shape[1]) if vectors is not None else 0,
+        "documents": [
+            {
+                "name": d.name,
+                "type": d.type,
+                "path": d.path,
+                "link": d.link,
+                "timestamp": d.timestamp,
+                "reader": d.reader,
+                "meta": d.meta,
+            }
+            for d in documents
+        ],
+        "sections": {},
+    }
+
+    # The section table depends on the header length, so lay it out until the serialized header is stable.
+    # Offsets only grow with the header length, so this converges
+    header_bytes = b""
+    while True:
+        offset = _align(_PREAMBLE.size + len(header_bytes))
+        for name, array in arrays.items():
+            header["sections"][name] = {
+                "offset": offset,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+            }
+            offset = _align(offset + array.nbytes)
+        new_header_bytes = json.dumps(header, default=str).encode("utf-8")
+        if new_header_bytes == header_bytes:
+            break
+        header_bytes = new_header_bytes
+
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+    if any(section["offset"] < data_start for section in header["sections"].values()):
+        raise Exception(f"Corpus sections of {file_path} overlap its header, nothing was written")
+
+    with open(file_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (header["sections"][name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class VerbaCorpus:
+    """
+    Memory-mapped read access to a .verba corpus file, nothing is loaded until it is accessed
+    """
+
+    def __init__(self, file_path: str):
+        if not file_path.endswith(".verba"):
+            raise ValueError("The file extension must be .verba")
+
+        self.file_path = file_path
+
+        with open(file_path, "rb") as f:
+            magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{file_path} is not a Verba corpus file")
+            if version > FORMAT_VERSION:
+                raise ValueError(
+                    f"{file_path} uses corpus format version {version}, this Verba supports up to {FORMAT_VERSION}"
+                )
+            self.header = json.loads(f.read(header_length).decode("utf-8"))
+
+        self.version = version
+        self._mmap = np.memmap(file_path, dtype=np.uint8, mode="r")
+        self._sections = {
+            name: self._section(name) for name in self.header["sections"]
+        }
+
+    def _section(self, name: str) -> np.ndarray:
+        section = self.header["sections"][name]
+        dtype = np.dtype(section["dtype"])
+        shape = tuple(section["shape"])
+        count = int(np.prod(shape)) if shape else 0
+        return np.frombuffer(
+            self._mmap, dtype=dtype, count=count, offset=section["offset"]
+        ).reshape(shape)
+
+    @property
+    def vectorizer(self) -> str:
+        return self.header["vectorizer"]
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        """(n_chunks, dim) float32 view backed by the file, or None if the corpus is not embedded"""
+        return self._sections.get("vectors")
+
+    @property
+    def document_count(self) -> int:
+        return self.header["n_documents"]
+
+    def __len__(self) -> int:
+        return self.header["n_chunks"]
+
+    def _text(self, blob: str, offsets: str, index: int) -> str:
+        start, end = self._sections[offsets][index : index + 2]
+        return self._sections[blob][int(start) : int(end)].tobytes().decode("utf-8")
+
+    def chunk_text(self, index: int) -> str:
+        return self._text("chunk_text", "chunk_text_offsets", index)
+
+    def document_text(self, index: int) -> str:
+        return self._text("doc_text", "doc_text_offsets", index)
+
+    def chunk_range(self, doc_index: int) -> range:
+        start, end = self._sections["doc_chunk_offsets"][doc_index : doc_index + 2]
+        return range(int(start), int(end))
+
+    def document(self, doc_index: int, with_chunks: bool = True) -> Document:
+        """Materialize one document (and its chunks) from the corpus
+        @parameter doc_index : int - Index of the document in the corpus
+        @parameter with_chunks : bool - Also load chunk texts and vectors
+        @returns Document - Verba document
+        """
+        meta = self.header["documents"][doc_index]
+        document = Document(
+            text=self.document_text(doc_index),
+            type=meta["type"],
+            name=meta["name"],
+            path=meta["path"],
+            link=meta["link"],
+            timestamp=meta["timestamp"],
+            reader=meta["reader"],
+            meta=meta["meta"],
+        )
+
+        if with_chunks:
+            vectors = self.vectors
+            for i in self.chunk_range(doc_index):
+                chunk = Chunk(
+                    text=self.chunk_text(i),
+                    doc_name=document.name,
+                    doc_type=document.type,
+                    chunk_id=int(self._sections["chunk_ids"][i]),
+                )
+                if vectors is not None:
+                    chunk.set_vector(vectors[i].tolist())
+                document.chunks.append(chunk)
+
+        return document
+
+    def iter_documents(self, with_chunks: bool = True) -> Iterator[Document]:
+        """Yield documents one at a time so large corpora never have to fit in memory"""
+        for doc_index in range(self.document_count):
+            yield self.document(doc_index, with_chunks)
+
+
+def read_corpus(file_path: str) -> list[Document]:
+    """Read all documents and chunks of a .verba corpus file
+    @parameter file_path : str - Path to the .verba file
+    @returns list[Document] - List of Verba documents
+    """
+    return list(VerbaCorpus(file_path).iter_documents())
@@ -1,4 +1,3 @@
-import pickle
 from goldenverba.ingestion.chunking.chunk import Chunk
 
 
@@ -57,18 +56,22 @@ class Document:
         return self._meta
 
     @classmethod
-    def serialize_to_verba(cls, document, file_path: str) -> None:
-        """Serialize the document to a binary .verba file"""
-        if not file_path.endswith(".verba"):
-            raise ValueError("The file extension must be .verba")
-        with open(file_path, "wb") as f:
-            pickle.dump(document, f)
+    def serialize_to_verba(cls, document, file_path: str, vectorizer: str = "") -> None:
+        """Serialize the document and its chunks to a .verba corpus file, with the chunk vectors if they are set.
+        The vectorizer names the embedder that computed them, load-corpus embeds the chunks again without it"""
+        from goldenverba.ingestion.reader.corpus import write_corpus
+
+        write_corpus([document], file_path, vectorizer)
 
     @classmethod
     def deserialize_verba(cls, file_path: str):
-        """Deserialize a .verba file to a Document object"""
-        if not file_path.endswith(".verba"):
-            raise ValueError("The file extension must be .verba")
-        with open(file_path, "rb") as f:
-            document = pickle.load(f)
-        return document
+        """Deserialize a .verba corpus file of a single document to a Document object,
+        read corpora of several documents with VerbaCorpus"""
+        from goldenverba.ingestion.reader.corpus import VerbaCorpus
+
+        corpus = VerbaCorpus(file_path)
+        if corpus.document_count != 1:
+            raise ValueError(
+                f"{file_path} holds {corpus.document_count} documents, read it with VerbaCorpus.iter_documents"
+            )
+        return corpus.document(0)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from goldenverba.ingestion.reader.simplereader import SimpleReader
 from goldenverba.ingestion.reader.pathreader import PathReader
 from goldenverba.ingestion.reader.interface import Reader
@@ -21,6 +23,7 @@ class ReaderManager:
         paths: list[str] = [],
         fileNames: list[str] = [],
         document_type: str = "Documentation",
+        reader: Optional[str] = None,
     ) -> list[Document]:
         """Ingest data into Weaviate
         @parameter: bytes : list[str] - List of bytes
@@ -28,19 +31,30 @@ class ReaderManager:
         @parameter: paths : list[str] - List of paths to files
         @parameter: fileNames : list[str] - List of file names
         @parameter: document_type : str - Document type
+        @parameter: reader : Optional[str] - Reader to use instead of the selected one
         @returns list[str] - List of strings
         """
-        return self.selected_reader.load(
+        return self.get_reader(reader).load(
             bytes, contents, paths, fileNames, document_type
         )
 
     def set_reader(self, reader: str) -> bool:
         if reader in self.readers:
             self.selected_reader = self.readers[reader]
+            self.selected_reader.ensure_loaded()
             return True
         else:
             msg.warn(f"Reader {reader} not found")
             return False
 
+    def get_reader(self, reader: Optional[str] = None) -> Reader:
+        """Reader of the given name, ready to use, or the selected one"""
+        if reader is None:
+            return self.selected_reader
+        if reader not in self.readers:
+            raise Exception(f"Reader {reader} not found")
+        self.readers[reader].ensure_loaded()
+        return self.readers[reader]
+
     def get_readers(self) -> dict[str, Reader]:
         return self.readers
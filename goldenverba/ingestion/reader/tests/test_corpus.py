@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from goldenverba.ingestion.chunking.chunk import Chunk
+from goldenverba.ingestion.reader.corpus import _PREAMBLE, VerbaCorpus, _align, read_corpus, write_corpus
+from goldenverba.ingestion.reader.document import Document
+
+
+def make_document(name: str, texts: list[str], vectors=None) -> Document:
+    document = Document(text=" ".join(texts), name=name, type="Documentation")
+    for i, text in enumerate(texts):
+        chunk = Chunk(text=text, doc_name=name, doc_type="Documentation", chunk_id=i)
+        if vectors is not None:
+            chunk.set_vector(vectors[i])
+        document.chunks.append(chunk)
+    return document
+
+
+def test_roundtrip_without_vectors(tmp_path):
+    path = str(tmp_path / "corpus.verba")
+    documents = [
+        make_document("a.md", ["Hello wörld", "second chunk"]),
+        make_document("b.md", []),
+        make_document("c.md", ["🐕 only chunk"]),
+    ]
+    write_corpus(documents, path)
+
+    corpus = VerbaCorpus(path)
+    assert corpus.vectors is None
+    assert len(corpus) == 3
+    assert corpus.document_count == 3
+    assert corpus.chunk_text(2) == "🐕 only chunk"
+    assert list(corpus.chunk_range(1)) == []
+
+    loaded = read_corpus(path)
+    assert [d.name for d in loaded] == ["a.md", "b.md", "c.md"]
+    assert loaded[0].text == "Hello wörld second chunk"
+    assert [c.text for c in loaded[0].chunks] == ["Hello wörld", "second chunk"]
+    assert [c.chunk_id for c in loaded[0].chunks] == [0, 1]
+
+
+def test_vectors_are_memory_mapped(tmp_path):
+    path = str(tmp_path / "corpus.verba")
+    vectors = np.random.default_rng(0).random((2, 8)).astype(np.float32)
+    write_corpus(
+        [make_document("a.md", ["one", "two"], vectors.tolist())],
+        path,
+        vectorizer="MiniLM",
+    )
+
+    corpus = VerbaCorpus(path)
+    assert corpus.vectorizer == "MiniLM"
+    assert corpus.vectors.dtype == np.float32
+    assert np.array_equal(corpus.vectors, vectors)
+    assert np.allclose(corpus.document(0).chunks[1].vector, vectors[1])
+
+
+def test_mixed_vectors_rejected(tmp_path):
+    document = make_document("a.md", ["one", "two"])
+    document.chunks[0].set_vector([0.1, 0.2])
+    with pytest.raises(ValueError):
+        write_corpus([document], str(tmp_path / "corpus.verba"))
+
+
+def test_vectors_need_their_vectorizer(tmp_path):
+    document = make_document("a.md", ["one", "two"], [[0.1, 0.2], [0.3, 0.4]])
+    with pytest.raises(ValueError):
+        write_corpus([document], str(tmp_path / "corpus.verba"))
+
+    path = str(tmp_path / "doc.verba")
+    Document.serialize_to_verba(document, path, "MiniLM")
+    assert VerbaCorpus(path).vectorizer == "MiniLM"
+
+
+def test_document_serialization(tmp_path):
+    path = str(tmp_path / "doc.verba")
+    Document.serialize_to_verba(make_document("a.md", ["one", "two"]), path)
+    document = Document.deserialize_verba(path)
+    assert document.name == "a.md"
+    assert len(document.chunks) == 2
+
+    write_corpus([make_document("a.md", ["one"]), make_document("b.md", ["two"])], path)
+    with pytest.raises(ValueError):
+        Document.deserialize_verba(path)
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "corpus.verba"
+    path.write_bytes(b"not a corpus at all")
+    with pytest.raises(ValueError):
+        VerbaCorpus(str(path))
+
+
+# Name lengths that put the end of the header 1 byte before, on and 1 byte past a 64 byte boundary, which
+# moves the sections one alignment further, and past the one where their offsets gain a digit
+@pytest.mark.parametrize("name_length", [26, 27, 28, 279, 280])
+def test_roundtrip_with_header_at_alignment_boundaries(tmp_path, name_length):
+    path = str(tmp_path / "corpus.verba")
+    documents = [make_document("d" * name_length + ".md", ["one", "two"])]
+    write_corpus(documents, path)
+
+    with open(path, "rb") as f:
+        _, _, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+    sections = VerbaCorpus(path).header["sections"].values()
+    assert min(section["offset"] for section in sections) == _align(_PREAMBLE.size + header_length)
+    loaded = read_corpus(path)
+    assert [d.name for d in loaded] == [d.name for d in documents]
+    assert [[c.text for c in d.chunks] for d in loaded] == [["one", "two"]]
@@ -1,4 +1,10 @@
+import hashlib
+import json
 import re
+import shutil
+import time
+
+from pathlib import Path
 
 from wasabi import msg  # type: ignore[import]
 from weaviate import Client
@@ -12,6 +18,41 @@ EMBEDDINGS = set() #["MiniLM"])  # Custom Vectors
 
 TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
 
+# Schema and tenants this host last verified on each cluster, lets an unchanged setup skip the checks at startup
+SCHEMA_FINGERPRINT_PATH = os.getenv("VERBA_SCHEMA_FINGERPRINT_PATH", "./.verba/schema_fingerprint.json")
+# A tenant verified longer ago is checked again, in case it was removed behind Verba's back
+SCHEMA_FINGERPRINT_TTL = float(os.getenv("VERBA_SCHEMA_FINGERPRINT_TTL_S", 24 * 3600))
+# Tenants created per add_class_tenants request
+TENANT_BATCH_SIZE = 100
+
+# Vector index of the Chunk classes, one of VECTOR_INDEX_PRESETS
+VECTOR_INDEX = os.getenv("VERBA_VECTOR_INDEX", "hnsw")
+# JSON merged over the vectorIndexConfig of the preset, e.g. {"ef": 128, "efConstruction": 256, "maxConnections": 32}
+VECTOR_INDEX_CONFIG = os.getenv("VERBA_VECTOR_INDEX_CONFIG", "")
+
+VECTOR_INDEX_PRESETS = {
+    # Weaviate's defaults, full float vectors in memory
+    "hnsw": ("hnsw", {}),
+    # ef follows the limit of each query, between dynamicEfMin and dynamicEfMax
+    "hnsw-dynamic": ("hnsw", {"ef": -1, "dynamicEfMin": 100, "dynamicEfMax": 500, "dynamicEfFactor": 8}),
+    # Product quantization, trained on the first trainingLimit vectors of each tenant
+    "hnsw-pq": ("hnsw", {"pq": {"enabled": True, "trainingLimit": 100000}}),
+    # Binary quantization, one bit per dimension in memory, rescored with the float vectors on disk
+    "hnsw-bq": ("hnsw", {"bq": {"enabled": True}}),
+    # Brute force over the vectors on disk, for tenants of a few thousand chunks
+    "flat": ("flat", {}),
+    "flat-bq": ("flat", {"bq": {"enabled": True, "rescoreLimit": 200}}),
+}
+
+# Where verba rebuild-schema keeps the objects of a class while it is recreated, resumable after a crash
+REBUILD_SPOOL_PATH = os.getenv("VERBA_REBUILD_SPOOL_PATH", "./.verba/rebuild")
+
+# Filter operand key of each dataType
+FILTER_VALUE_KEYS = {"int": "valueInt", "number": "valueNumber", "boolean": "valueBoolean", "date": "valueDate"}
+
+# vectorIndexConfig settings Weaviate lets an existing class change, the others need a new class
+MUTABLE_INDEX_KEYS = {"ef", "dynamicEfMin", "dynamicEfMax", "dynamicEfFactor", "flatSearchCutoff", "vectorCacheMaxObjects", "pq"}
+
 def strip_non_letters(s: str):
     return re.sub(r"[^a-zA-Z0-9]", "_", s)
 
@@ -122,8 +163,401 @@ def init_schemas(
         return False
 
 
+def vector_index_config(preset: str = None, overrides: dict = None) -> dict:
+    """Vector index type and settings of the Chunk classes
+    @parameter preset : str - Key of VECTOR_INDEX_PRESETS, default VERBA_VECTOR_INDEX
+    @parameter overrides : dict - Merged over the vectorIndexConfig of the preset, default VERBA_VECTOR_INDEX_CONFIG
+    @returns dict - vectorIndexType and, unless it is Weaviate's default, vectorIndexConfig
+    """
+    preset = VECTOR_INDEX if preset is None else preset
+    if preset not in VECTOR_INDEX_PRESETS:
+        raise ValueError(f"Unknown vector index {preset}, choose one of {', '.join(VECTOR_INDEX_PRESETS)}")
+    if overrides is None:
+        try:
+            overrides = json.loads(VECTOR_INDEX_CONFIG) if VECTOR_INDEX_CONFIG.strip() else {}
+        except ValueError as e:
+            raise ValueError(f"VERBA_VECTOR_INDEX_CONFIG is not valid JSON: {e}")
+
+    index_type, config = VECTOR_INDEX_PRESETS[preset]
+    config = _merged(config, overrides)
+    schema = {"vectorIndexType": index_type}
+    if config:
+        schema["vectorIndexConfig"] = config
+    return schema
+
+
+def _merged(base: dict, update: dict) -> dict:
+    merged = dict(base)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merged(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def index_changes(current: dict, wanted: dict) -> tuple[dict, list[str]]:
+    """Differences between the vector index of a class in Weaviate and the wanted one
+    @parameter current : dict - Class as returned by the schema endpoint
+    @parameter wanted : dict - Class as generated
+    @returns tuple[dict, list[str]] - vectorIndexConfig update Weaviate applies in place, settings that need a new class
+    """
+    updates, rebuild = {}, []
+    if current.get("vectorIndexType", "hnsw") != wanted.get("vectorIndexType", "hnsw"):
+        rebuild.append("vectorIndexType")
+    have = current.get("vectorIndexConfig", {})
+    for key, value in wanted.get("vectorIndexConfig", {}).items():
+        if _covers(have.get(key), value):
+            continue
+        if key in MUTABLE_INDEX_KEYS:
+            updates[key] = value
+        else:
+            rebuild.append(key)
+    return updates, rebuild
+
+
+def _covers(have, want) -> bool:
+    # Weaviate returns every setting, only the ones Verba sets are compared
+    if isinstance(want, dict):
+        return isinstance(have, dict) and all(_covers(have.get(key), value) for key, value in want.items())
+    return have == want
+
+
+def migrate_vector_index(client: Client, vectorizers, apply: bool = False) -> list[dict]:
+    """Bring the vector index of existing Chunk classes to the configured one. Search settings and product
+    quantization change in place; the index type, the graph settings and binary quantization are fixed when a class
+    is created, those are only reported
+    @parameter client : Client - Weaviate client
+    @parameter vectorizers : Iterable[str] - Vectorizers and embeddings whose classes to migrate
+    @parameter apply : bool - Update the classes, otherwise only report what would change
+    @returns list[dict] - Per class that differs: in-place updates, settings that need a rebuild, whether applied
+    """
+    existing = {_class["class"]: _class for _class in client.schema.get().get("classes", [])}
+    plan = []
+    for class_schema in required_classes(vectorizers):
+        class_name = class_schema["class"]
+        if "vectorIndexType" not in class_schema or class_name not in existing:
+            continue
+        updates, rebuild = index_changes(existing[class_name], class_schema)
+        if not updates and not rebuild:
+            continue
+        if apply and updates:
+            client.schema.update_config(class_name, {"vectorIndexConfig": updates})
+            msg.good(f"{class_name} vector index updated with {updates}")
+        if rebuild:
+            msg.warn(f"{class_name}: {', '.join(rebuild)} only change by a rebuild, see verba rebuild-schema")
+        plan.append({"class": class_name, "updates": updates, "rebuild": rebuild, "applied": apply and bool(updates)})
+    return plan
+
+
+def property_changes(current: dict, wanted: dict) -> list[str]:
+    """Properties whose type, tokenization or indexes differ between a class in Weaviate and the wanted schema,
+    Weaviate cannot change those in place
+    @parameter current : dict - Class as returned by the schema endpoint
+    @parameter wanted : dict - Class as generated
+    @returns list[str] - Names of the properties that differ
+    """
+    have = {property["name"]: property for property in current.get("properties", [])}
+    changes = []
+    for property in wanted.get("properties", []):
+        existing = have.get(property["name"])
+        if existing is None:
+            continue
+        settings = {
+            key: property[key]
+            for key in ("dataType", "tokenization", "indexFilterable", "indexSearchable")
+            if key in property
+        }
+        if not _covers(existing, settings):
+            changes.append(property["name"])
+    return changes
+
+
+def schema_changes(current: dict, wanted: dict) -> list[str]:
+    """Everything that differs between a class in Weaviate and the wanted schema and needs a rebuild"""
+    changes = property_changes(current, wanted)
+    if "vectorIndexType" in wanted:
+        changes += index_changes(current, wanted)[1]
+    return changes
+
+
+_filter_value_keys: dict[tuple[str, str], str] = {}
+
+
+def filter_value_key(client: Client, class_name: str, property_name: str) -> str:
+    """Key of the filter value for a property as it is typed in Weaviate, e.g. valueInt, so that queries work on
+    classes created before and after a type change. Looked up once per process
+    @parameter client : Client - Weaviate client
+    @parameter class_name : str - Class of the property
+    @parameter property_name : str - Filtered property
+    @returns str - valueText, valueInt, valueNumber...
+    """
+    key = (class_name, property_name)
+    if key not in _filter_value_keys:
+        data_type = "text"
+        for property in client.schema.get(class_name).get("properties", []):
+            if property["name"] == property_name:
+                data_type = property["dataType"][0]
+        _filter_value_keys[key] = FILTER_VALUE_KEYS.get(data_type, "valueText")
+    return _filter_value_keys[key]
+
+
+def rebuild_schemas(client: Client, vectorizers, spool_path: str = REBUILD_SPOOL_PATH, apply: bool = False) -> list[dict]:
+    """Recreate the classes whose properties or vector index differ from the generated schema, with all their
+    tenants and objects. Weaviate keeps one schema per class, so every tenant of a changed class is rebuilt
+    @parameter client : Client - Weaviate client
+    @parameter vectorizers : Iterable[str] - Vectorizers and embeddings whose classes to check
+    @parameter spool_path : str - Directory the objects are written to while their class is recreated
+    @parameter apply : bool - Rebuild, otherwise only report what would be rebuilt
+    @returns list[dict] - Per class to rebuild: what differs, and tenants and objects once rebuilt
+    """
+    existing = {_class["class"]: _class for _class in client.schema.get().get("classes", [])}
+    plan = []
+    for class_schema in required_classes(vectorizers):
+        class_name = class_schema["class"]
+        spool = Path(spool_path) / class_name
+        # A rebuild interrupted after the export is resumed even if the class already has its new schema
+        interrupted = (spool / "tenants.json").exists()
+        changes = schema_changes(existing[class_name], class_schema) if class_name in existing else []
+        if not changes and not interrupted:
+            continue
+        entry = {"class": class_name, "changes": changes, "rebuilt": False}
+        if apply:
+            entry.update(rebuild_class(client, class_schema, str(spool)))
+            entry["rebuilt"] = True
+        else:
+            msg.info(f"{class_name} would be rebuilt for {', '.join(changes) or 'an interrupted rebuild'}")
+        plan.append(entry)
+    return plan
+
+
+def rebuild_class(client: Client, class_schema: dict, spool: str, page: int = 500) -> dict:
+    """Export every tenant of a class to spool files, recreate the class with its new schema and import the objects
+    back with their ids and vectors. Rerunning after a failure resumes from the spool files
+    @parameter client : Client - Weaviate client
+    @parameter class_schema : dict - New schema of the class
+    @parameter spool : str - Directory of the spool files of this class
+    @parameter page : int - Objects per cursor page and per batch
+    @returns dict - Tenants and number of objects rebuilt
+    """
+    class_name = class_schema["class"]
+    spool = Path(spool)
+    marker = spool / "tenants.json"
+
+    if not marker.exists():
+        # Properties the new schema adds are not in the old class yet
+        names = [property["name"] for property in client.schema.get(class_name).get("properties", [])]
+        spool.mkdir(parents=True, exist_ok=True)
+        tenants = [tenant.name for tenant in client.schema.get_class_tenants(class_name)]
+        for tenant in tenants:
+            count = _export_tenant(client, class_name, names, tenant, spool / f"{tenant}.jsonl", page)
+            msg.info(f"Exported {count} objects of {class_name} tenant {tenant}")
+        marker.write_text(json.dumps(tenants), encoding="utf-8")
+        client.schema.delete_class(class_name)
+        msg.warn(f"{class_name} deleted, its objects are in {spool}")
+    tenants = json.loads(marker.read_text(encoding="utf-8"))
+
+    if not client.schema.exists(class_name):
+        client.schema.create_class(class_schema)
+    # A resumed rebuild may have created some of them already
+    present = {tenant.name for tenant in client.schema.get_class_tenants(class_name)}
+    missing = [tenant for tenant in tenants if tenant not in present]
+    for i in range(0, len(missing), TENANT_BATCH_SIZE):
+        client.schema.add_class_tenants(
+            class_name=class_name, tenants=[Tenant(name=tenant) for tenant in missing[i : i + TENANT_BATCH_SIZE]]
+        )
+
+    types = {property["name"]: property["dataType"][0] for property in class_schema["properties"]}
+    errors = []
+
+    def batch_callback(logs) -> None:
+        for result in logs or []:
+            if "result" in result and "errors" in result["result"]:
+                errors.append(result["result"]["errors"])
+
+    objects = 0
+    with client.batch as batch:
+        batch.configure(batch_size=page, callback=batch_callback)
+        for tenant in tenants:
+            with open(spool / f"{tenant}.jsonl", encoding="utf-8") as file:
+                for line in file:
+                    item = json.loads(line)
+                    properties = {
+                        name: _convert(value, types.get(name)) for name, value in item["properties"].items()
+                    }
+                    # Same id, so an import repeated after a failure overwrites instead of duplicating
+                    batch.add_data_object(
+                        properties, class_name, uuid=item["id"], vector=item["vector"], tenant=tenant
+                    )
+                    objects += 1
+    if errors:
+        raise Exception(f"Rebuild of {class_name} failed for {len(errors)} objects, rerun to resume: {errors[0]}")
+
+    shutil.rmtree(spool)
+    _filter_value_keys.clear()
+    msg.good(f"{class_name} rebuilt with {len(tenants)} tenants and {objects} objects")
+    return {"tenants": len(tenants), "objects": objects}
+
+
+def _export_tenant(client: Client, class_name: str, names: list[str], tenant: str, path: Path, page: int) -> int:
+    count = 0
+    after = None
+    with open(path, "w", encoding="utf-8") as file:
+        while True:
+            query = (
+                client.query.get(class_name, names)
+                .with_tenant(tenant)
+                .with_additional(["id", "vector"])
+                .with_limit(page)
+            )
+            if after is not None:
+                query = query.with_after(after)
+            results = query.do()
+            if "errors" in results:
+                raise Exception(f"Export of {class_name} tenant {tenant} failed: {results['errors']}")
+            objects = results["data"]["Get"][class_name]
+            if not objects:
+                return count
+            for item in objects:
+                additional = item.pop("_additional")
+                after = additional["id"]
+                line = {"id": after, "vector": additional.get("vector"), "properties": item}
+                file.write(json.dumps(line) + "\n")
+            count += len(objects)
+
+
+def _convert(value, data_type: str):
+    """Value of an old property in its new type, e.g. chunk_id stored as number before it was an int"""
+    if value is None or value == "":
+        return None if data_type in ("int", "number", "uuid") else value
+    if data_type == "int":
+        return int(value)
+    if data_type == "number":
+        return float(value)
+    return value
+
+
+def required_classes(vectorizers) -> list[dict]:
+    """Document, Chunk and Cache class schemas of every vectorizer"""
+    classes = []
+    for vectorizer in sorted(vectorizers):
+        document_schema, chunk_schema = document_schemas(vectorizer)
+        classes += document_schema["classes"] + chunk_schema["classes"] + cache_schema(vectorizer)["classes"]
+    return classes
+
+
+def bootstrap_schemas(
+    client: Client,
+    vectorizers,
+    tenants: list[str],
+    reset: bool = False,
+    fingerprint_path: str = SCHEMA_FINGERPRINT_PATH,
+) -> dict:
+    """Create the missing classes and tenants of all vectorizers with one schema fetch, one tenant listing per class
+    and bulk tenant creation. Skips everything when the fingerprint file says this schema and these tenants were
+    verified on this cluster recently
+    @parameter client : Client - Weaviate client
+    @parameter vectorizers : Iterable[str] - Vectorizers and embeddings whose classes are needed
+    @parameter tenants : list[str] - Tenants every class must have
+    @parameter reset : bool - Remove the tenants first, which deletes their objects
+    @parameter fingerprint_path : str - Fingerprint file, None to always check
+    @returns dict - Created classes, number of tenants added per class, and whether the checks were skipped
+    """
+    classes = required_classes(vectorizers)
+    digest = hashlib.sha256(json.dumps(classes, sort_keys=True).encode("utf-8")).hexdigest()
+    tenants = list(dict.fromkeys(tenants))
+    # The in-memory stand-in has no URL, and nothing of it survives the process
+    cluster = getattr(client._connection, "url", None)
+    use_fingerprint = fingerprint_path is not None and isinstance(cluster, str)
+
+    if not reset and use_fingerprint and _fingerprint_covers(fingerprint_path, cluster, digest, tenants):
+        msg.info(f"Schema and {len(tenants)} tenants unchanged since last verified, skipping the checks")
+        return {"created": [], "tenants_added": {}, "skipped": True}
+
+    existing = {_class["class"]: _class for _class in client.schema.get().get("classes", [])}
+    created = []
+    tenants_added = {}
+    for class_schema in classes:
+        class_name = class_schema["class"]
+        if class_name in existing:
+            if "vectorIndexType" in class_schema and index_changes(existing[class_name], class_schema)[0]:
+                msg.warn(f"Vector index of {class_name} differs from VERBA_VECTOR_INDEX, see verba migrate-index")
+            if schema_changes(existing[class_name], class_schema):
+                msg.warn(f"Schema of {class_name} is outdated, see verba rebuild-schema")
+            # New properties are the one schema change Weaviate applies in place
+            have = {property["name"] for property in existing[class_name].get("properties", [])}
+            for property in class_schema["properties"]:
+                if property["name"] not in have:
+                    client.schema.property.create(class_name, property)
+                    msg.good(f"Property {property['name']} added to {class_name}")
+            present = {tenant.name for tenant in client.schema.get_class_tenants(class_name)}
+        else:
+            client.schema.create_class(class_schema)
+            msg.good(f"{class_name} schema created")
+            created.append(class_name)
+            present = set()
+
+        if reset:
+            removed = [tenant for tenant in tenants if tenant in present]
+            if removed:
+                client.schema.remove_class_tenants(class_name=class_name, tenants=removed)
+                msg.good(f"tenants {removed} class {class_name} removed")
+            present.difference_update(removed)
+
+        missing = [tenant for tenant in tenants if tenant not in present]
+        for i in range(0, len(missing), TENANT_BATCH_SIZE):
+            client.schema.add_class_tenants(
+                class_name=class_name,
+                tenants=[Tenant(name=tenant) for tenant in missing[i : i + TENANT_BATCH_SIZE]],
+            )
+        if missing:
+            msg.good(f"{class_name} schema added to {len(missing)} tenants")
+            tenants_added[class_name] = len(missing)
+
+    if use_fingerprint:
+        _remember_fingerprint(fingerprint_path, cluster, digest, tenants)
+    return {"created": created, "tenants_added": tenants_added, "skipped": False}
+
+
+def _load_fingerprints(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _fingerprint_covers(path: str, cluster: str, digest: str, tenants: list[str]) -> bool:
+    entry = _load_fingerprints(path).get(cluster)
+    if not entry or entry.get("schema") != digest:
+        return False
+    verified = entry.get("tenants", {})
+    now = time.time()
+    return all(now - verified.get(tenant, 0) < SCHEMA_FINGERPRINT_TTL for tenant in tenants)
+
+
+def _remember_fingerprint(path: str, cluster: str, digest: str, tenants: list[str]) -> None:
+    fingerprints = _load_fingerprints(path)
+    entry = fingerprints.get(cluster)
+    if not entry or entry.get("schema") != digest:
+        entry = {"schema": digest, "tenants": {}}
+    now = time.time()
+    entry["tenants"].update({tenant: now for tenant in tenants})
+    fingerprints[cluster] = entry
+
+    # Several processes boot at once, each replaces the file whole so none reads a partial one
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(fingerprints, file)
+        os.replace(temporary, path)
+    except OSError as e:
+        msg.warn(f"Could not write the schema fingerprint {path}: {e}")
+
+
 def init_documents(
-    client: Client, vectorizer: str = None, force: bool = False, check: bool = False, reset: bool = False
+    client: Client, vectorizer: str = None, force: bool = False, check: bool = False, reset: bool = False, tenant: str = TENANT
 ) -> tuple[dict, dict]:
     """Initializes the Document and Chunk class
     @parameter client : Client - Weaviate client
@@ -131,9 +565,29 @@ def init_documents(
     @parameter force : bool - Delete existing schema without user input
     @parameter check : bool - Only create if not exist
     @parameter reset : bool - Reset tenant
+    @parameter tenant : str - Tenant to create
     @returns tuple[dict, dict] - Tuple of modified schemas
     """
+    document_schema, chunk_schema = document_schemas(vectorizer)
+    document_name = document_schema["classes"][0]["class"]
+    chunk_name = chunk_schema["classes"][0]["class"]
+
+    create_if_not_exists(client,document_name,document_schema,tenant,reset=reset)
+    create_if_not_exists(client,chunk_name,chunk_schema,tenant,reset=reset)
+
+    # If Weaviate Embedded runs
+    if client._connection.embedded_db:
+        msg.info("Stopping Weaviate Embedded")
+        client._connection.embedded_db.stop()
+
+    return document_schema, chunk_schema
+
 
+def document_schemas(vectorizer: str = None) -> tuple[dict, dict]:
+    """Schemas of the Document and Chunk classes of a vectorizer
+    @parameter vectorizer : str - Name of the vectorizer
+    @returns tuple[dict, dict] - Document and Chunk schemas
+    """
     SCHEMA_CHUNK = {
         "classes": [
             {
@@ -145,29 +599,58 @@ def init_documents(
                         "name": "text",
                         "dataType": ["text"],
                         "description": "Content of the document",
+                        "indexFilterable": False,
+                        "indexSearchable": True,
                     },
                     {
+                        # Part of the keyword search of hybrid queries. Word tokenized, so Equal filters on a name
+                        # match its words: "guide.md" also matches "md guide". Filter on doc_uuid to match one document
                         "name": "doc_name",
                         "dataType": ["text"],
                         "description": "Document name",
+                        "indexFilterable": True,
+                        "indexSearchable": True,
                     },
                     {
                         # Skip
                         "name": "doc_type",
                         "dataType": ["text"],
                         "description": "Document type",
+                        "tokenization": "field",
+                        "indexFilterable": True,
+                        "indexSearchable": False,
                     },
                     {
                         # Skip
                         "name": "doc_uuid",
-                        "dataType": ["text"],
+                        "dataType": ["uuid"],
                         "description": "Document UUID",
+                        "indexFilterable": True,
+                        "indexSearchable": False,
                     },
                     {
-                        # Skip
+                        # Skip, filtered by ranges to fetch the neighbors of a chunk
                         "name": "chunk_id",
-                        "dataType": ["number"],
+                        "dataType": ["int"],
                         "description": "Document chunk from the whole document",
+                        "indexFilterable": True,
+                        "indexSearchable": False,
+                    },
+                    {
+                        # Skip
+                        "name": "span_start",
+                        "dataType": ["int"],
+                        "description": "Characters of the text that repeat the previous chunk",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
+                    },
+                    {
+                        # Skip
+                        "name": "gap",
+                        "dataType": ["text"],
+                        "description": "Text between the previous chunk and this one",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                 ],
             }
@@ -182,34 +665,47 @@ def init_documents(
                 "description": "Documentation",
                 "properties": [
                     {
+                        # Searched through its chunks, never on the whole document
                         "name": "text",
                         "dataType": ["text"],
                         "description": "Content of the document",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                     {
                         "name": "doc_name",
                         "dataType": ["text"],
                         "description": "Document name",
+                        "indexFilterable": True,
+                        "indexSearchable": True,
                     },
                     {
                         "name": "doc_type",
                         "dataType": ["text"],
                         "description": "Document type",
+                        "tokenization": "field",
+                        "indexFilterable": True,
+                        "indexSearchable": False,
                     },
                     {
                         "name": "doc_link",
                         "dataType": ["text"],
                         "description": "Link to document",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                     {
                         "name": "timestamp",
                         "dataType": ["text"],
                         "description": "Timestamp of document",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                     {
                         "name": "chunk_count",
-                        "dataType": ["number"],
+                        "dataType": ["int"],
                         "description": "Number of chunks",
+                        "indexFilterable": False,
                     },
                 ],
             }
@@ -220,21 +716,13 @@ def init_documents(
     chunk_schema = verify_vectorizer(
         SCHEMA_CHUNK,
         vectorizer,
-        ["doc_type", "doc_uuid", "chunk_id"],
+        ["doc_type", "doc_uuid", "chunk_id", "span_start", "gap"],
     )
 
     # Add Suffix
-    document_schema, document_name = add_suffix(SCHEMA_DOCUMENT, vectorizer)
-    chunk_schema, chunk_name = add_suffix(chunk_schema, vectorizer)
-
-    create_if_not_exists(client,document_name,document_schema,TENANT,reset=reset)
-    create_if_not_exists(client,chunk_name,chunk_schema,TENANT,reset=reset)
-
-    # If Weaviate Embedded runs
-    if client._connection.embedded_db:
-        msg.info("Stopping Weaviate Embedded")
-        client._connection.embedded_db.stop()
-
+    document_schema, _ = add_suffix(SCHEMA_DOCUMENT, vectorizer)
+    chunk_schema, _ = add_suffix(chunk_schema, vectorizer)
+    chunk_schema["classes"][0].update(vector_index_config())
     return document_schema, chunk_schema
 
 
@@ -248,7 +736,24 @@ def init_cache(
     @parameter check : bool - Only create if not exist
     @returns dict - Modified schema
     """
+    schema = cache_schema(vectorizer)
+    cache_name = schema["classes"][0]["class"]
+
+    create_if_not_exists(client,cache_name,schema,TENANT,reset=reset)
+
+    # If Weaviate Embedded runs
+    if client._connection.embedded_db:
+        msg.info("Stopping Weaviate Embedded")
+        client._connection.embedded_db.stop()
+
+    return schema
+
 
+def cache_schema(vectorizer: str = None) -> dict:
+    """Schema of the Cache class of a vectorizer
+    @parameter vectorizer : str - Name of the vectorizer
+    @returns dict - Cache schema
+    """
     SCHEMA_CACHE = {
         "classes": [
             {
@@ -257,21 +762,28 @@ def init_cache(
                 "description": "Cache of Documentations and their queries",
                 "properties": [
                     {
+                        # Looked up by vector, compared in Python
                         "name": "query",
                         "dataType": ["text"],
                         "description": "Query",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                     {
                         # Skip
                         "name": "system",
                         "dataType": ["text"],
                         "description": "System message",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                     {
-                        # Skip
+                        # Skip, serialized JSON
                         "name": "results",
                         "dataType": ["text"],
                         "description": "List of results",
+                        "indexFilterable": False,
+                        "indexSearchable": False,
                     },
                 ],
             }
@@ -279,23 +791,15 @@ def init_cache(
     }
 
     # Verify Vectorizer
-    cache_schema = verify_vectorizer(
+    schema = verify_vectorizer(
         SCHEMA_CACHE,
         vectorizer,
         ["system", "results"],
     )
 
     # Add Suffix
-    cache_schema, cache_name = add_suffix(cache_schema, vectorizer)
-
-    create_if_not_exists(client,cache_name,cache_schema,TENANT,reset=reset)
-
-    # If Weaviate Embedded runs
-    if client._connection.embedded_db:
-        msg.info("Stopping Weaviate Embedded")
-        client._connection.embedded_db.stop()
-
-    return cache_schema
+    schema, _ = add_suffix(schema, vectorizer)
+    return schema
 
 
 def init_suggestion(
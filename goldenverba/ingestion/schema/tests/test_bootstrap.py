@@ -0,0 +1,70 @@
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.schema import schema_generation
+
+VECTORIZERS = {"text2vec-openai"}
+CLASSES = ["Document_text2vec_openai", "Chunk_text2vec_openai", "Cache_text2vec_openai"]
+
+
+def make_client(url=None):
+    client = FakeWeaviateClient(latency_ms=0)
+    client._connection.url = url
+    return client
+
+
+def test_bootstrap_creates_classes_and_tenants_in_bulk(tmp_path):
+    client = make_client()
+    tenants = [f"tenant_{i}" for i in range(250)]
+
+    result = schema_generation.bootstrap_schemas(
+        client, VECTORIZERS, tenants, fingerprint_path=str(tmp_path / "fingerprint.json")
+    )
+
+    assert sorted(result["created"]) == sorted(CLASSES)
+    assert result["tenants_added"] == {class_name: 250 for class_name in CLASSES}
+    # One schema fetch, one creation per class and 3 bulk tenant requests of at most 100 per class
+    assert client.calls()["schema"] == 1 + 3 + 3 * 3
+    for class_name in CLASSES:
+        assert len(client.schema.get_class_tenants(class_name)) == 250
+
+
+def test_bootstrap_only_adds_missing_tenants(tmp_path):
+    client = make_client()
+    schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a", "b"], fingerprint_path=None)
+
+    result = schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a", "b", "c"], fingerprint_path=None)
+
+    assert result["created"] == []
+    assert result["tenants_added"] == {class_name: 1 for class_name in CLASSES}
+    names = [tenant.name for tenant in client.schema.get_class_tenants("Chunk_text2vec_openai")]
+    assert names == ["a", "b", "c"]
+
+
+def test_fingerprint_skips_unchanged_cluster(tmp_path):
+    path = str(tmp_path / "fingerprint.json")
+    client = make_client("http://weaviate:8080")
+    schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a", "b"], fingerprint_path=path)
+    calls = client.calls()["schema"]
+
+    result = schema_generation.bootstrap_schemas(client, VECTORIZERS, ["b", "a"], fingerprint_path=path)
+    assert result["skipped"]
+    assert client.calls()["schema"] == calls
+
+    # A new tenant, or another cluster, is checked again
+    assert not schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a", "c"], fingerprint_path=path)["skipped"]
+    other = make_client("http://other:8080")
+    result = schema_generation.bootstrap_schemas(other, VECTORIZERS, ["a"], fingerprint_path=path)
+    assert not result["skipped"]
+    assert sorted(result["created"]) == sorted(CLASSES)
+
+
+def test_reset_empties_the_tenants(tmp_path):
+    client = make_client()
+    schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a"], fingerprint_path=None)
+    client.batch.add_data_object({"doc_name": "x"}, "Document_text2vec_openai", tenant="a")
+    client.batch.flush()
+
+    schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a"], reset=True, fingerprint_path=None)
+
+    documents = client.query.get("Document_text2vec_openai", ["doc_name"]).with_tenant("a").do()
+    assert documents["data"]["Get"]["Document_text2vec_openai"] == []
+    assert [tenant.name for tenant in client.schema.get_class_tenants("Document_text2vec_openai")] == ["a"]
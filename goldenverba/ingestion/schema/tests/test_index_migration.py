@@ -0,0 +1,51 @@
+import pytest
+
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.schema import schema_generation
+
+VECTORIZERS = {"text2vec-openai"}
+CHUNK = "Chunk_text2vec_openai"
+
+
+def test_vector_index_config_merges_overrides():
+    assert schema_generation.vector_index_config("hnsw", {}) == {"vectorIndexType": "hnsw"}
+    config = schema_generation.vector_index_config("hnsw-pq", {"ef": 128, "pq": {"segments": 96}})
+    assert config == {
+        "vectorIndexType": "hnsw",
+        "vectorIndexConfig": {"ef": 128, "pq": {"enabled": True, "trainingLimit": 100000, "segments": 96}},
+    }
+    with pytest.raises(ValueError):
+        schema_generation.vector_index_config("ivf", {})
+
+
+def test_chunk_class_gets_the_configured_index(monkeypatch):
+    monkeypatch.setattr(schema_generation, "VECTOR_INDEX", "flat")
+    monkeypatch.setattr(schema_generation, "VECTOR_INDEX_CONFIG", '{"vectorCacheMaxObjects": 1000}')
+
+    document, chunk = schema_generation.document_schemas("text2vec-openai")
+
+    assert chunk["classes"][0]["vectorIndexType"] == "flat"
+    assert chunk["classes"][0]["vectorIndexConfig"] == {"vectorCacheMaxObjects": 1000}
+    assert "vectorIndexType" not in document["classes"][0]
+
+
+def test_migration_updates_in_place_and_reports_rebuilds(monkeypatch):
+    client = FakeWeaviateClient(latency_ms=0)
+    schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a"], fingerprint_path=None)
+
+    monkeypatch.setattr(schema_generation, "VECTOR_INDEX", "hnsw-pq")
+    monkeypatch.setattr(schema_generation, "VECTOR_INDEX_CONFIG", '{"ef": 256, "maxConnections": 32}')
+    plan = schema_generation.migrate_vector_index(client, VECTORIZERS)
+    assert plan == [
+        {
+            "class": CHUNK,
+            "updates": {"pq": {"enabled": True, "trainingLimit": 100000}, "ef": 256},
+            "rebuild": ["maxConnections"],
+            "applied": False,
+        }
+    ]
+    assert "vectorIndexConfig" not in client.schema.get(CHUNK)
+
+    schema_generation.migrate_vector_index(client, VECTORIZERS, apply=True)
+    assert client.schema.get(CHUNK)["vectorIndexConfig"] == {"pq": {"enabled": True, "trainingLimit": 100000}, "ef": 256}
+    assert schema_generation.migrate_vector_index(client, VECTORIZERS)[0]["updates"] == {}
@@ -0,0 +1,102 @@
+import os
+import uuid
+
+import pytest
+
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.schema import schema_generation
+
+VECTORIZERS = {"text2vec-openai"}
+CHUNK = "Chunk_text2vec_openai"
+
+
+def make_legacy_client():
+    """Classes as created before the properties had explicit types and indexes"""
+    client = FakeWeaviateClient(latency_ms=0)
+    for class_schema in schema_generation.required_classes(VECTORIZERS):
+        class_schema["properties"] = [p for p in class_schema["properties"] if p["name"] not in ("span_start", "gap")]
+        for property in class_schema["properties"]:
+            for key in ("tokenization", "indexFilterable", "indexSearchable"):
+                property.pop(key, None)
+            if property["dataType"] in (["int"], ["uuid"]):
+                property["dataType"] = ["number"] if property["name"] != "doc_uuid" else ["text"]
+        client.schema.create_class(class_schema)
+    schema_generation.bootstrap_schemas(client, VECTORIZERS, ["a", "b"], fingerprint_path=None)
+
+    with client.batch as batch:
+        for tenant in ("a", "b"):
+            for i in range(3):
+                batch.add_data_object(
+                    {"text": f"{tenant} {i}", "doc_name": "guide.md", "doc_uuid": str(uuid.UUID(int=1)), "chunk_id": float(i)},
+                    CHUNK,
+                    uuid=str(uuid.UUID(int=i + 1)),
+                    vector=[float(i), 1.0],
+                    tenant=tenant,
+                )
+    return client
+
+
+def test_rebuild_recreates_changed_classes_with_their_objects(tmp_path):
+    client = make_legacy_client()
+    # Added in place by the bootstrap
+    assert client.schema.get(CHUNK)["properties"][-1]["name"] == "gap"
+
+    plan = schema_generation.rebuild_schemas(client, VECTORIZERS, str(tmp_path))
+    chunk = next(entry for entry in plan if entry["class"] == CHUNK)
+    assert chunk["changes"] == ["text", "doc_name", "doc_type", "doc_uuid", "chunk_id"]
+    assert not chunk["rebuilt"]
+    assert client.schema.get(CHUNK)["properties"][-3]["dataType"] == ["number"]
+
+    plan = schema_generation.rebuild_schemas(client, VECTORIZERS, str(tmp_path), apply=True)
+    chunk = next(entry for entry in plan if entry["class"] == CHUNK)
+    assert chunk["tenants"] == 2 and chunk["objects"] == 6
+    assert client.schema.get(CHUNK)["properties"][-3]["dataType"] == ["int"]
+    assert os.listdir(tmp_path) == []
+
+    results = (
+        client.query.get(CHUNK, ["text", "chunk_id"])
+        .with_tenant("b")
+        .with_where({"path": ["chunk_id"], "operator": "GreaterThanEqual", "valueInt": 1})
+        .with_additional(["id", "vector"])
+        .do()["data"]["Get"][CHUNK]
+    )
+    assert sorted((result["text"], result["chunk_id"]) for result in results) == [("b 1", 1), ("b 2", 2)]
+    assert all(isinstance(result["chunk_id"], int) for result in results)
+    assert {result["_additional"]["id"] for result in results} == {str(uuid.UUID(int=2)), str(uuid.UUID(int=3))}
+    assert schema_generation.rebuild_schemas(client, VECTORIZERS, str(tmp_path)) == []
+
+
+def test_interrupted_rebuild_resumes_from_the_spool(tmp_path, monkeypatch):
+    client = make_legacy_client()
+    chunk_schema = next(c for c in schema_generation.required_classes(VECTORIZERS) if c["class"] == CHUNK)
+
+    # Fail right after the export, once the class is deleted
+    def create_class(schema):
+        raise Exception("Weaviate went away")
+
+    monkeypatch.setattr(client.schema, "create_class", create_class)
+    with pytest.raises(Exception):
+        schema_generation.rebuild_class(client, chunk_schema, str(tmp_path / CHUNK))
+    assert not client.schema.exists(CHUNK)
+    monkeypatch.undo()
+
+    plan = schema_generation.rebuild_schemas(client, VECTORIZERS, str(tmp_path), apply=True)
+    assert next(entry for entry in plan if entry["class"] == CHUNK)["objects"] == 6
+
+
+def test_rebuild_resumes_after_a_failed_import(tmp_path, monkeypatch):
+    client = make_legacy_client()
+    chunk_schema = next(c for c in schema_generation.required_classes(VECTORIZERS) if c["class"] == CHUNK)
+
+    # Fail once the class and its tenants exist again
+    def add_data_object(*args, **kwargs):
+        raise Exception("Weaviate went away")
+
+    monkeypatch.setattr(client.batch, "add_data_object", add_data_object)
+    with pytest.raises(Exception):
+        schema_generation.rebuild_class(client, chunk_schema, str(tmp_path / CHUNK))
+    assert [tenant.name for tenant in client.schema.get_class_tenants(CHUNK)] == ["a", "b"]
+    monkeypatch.undo()
+
+    assert schema_generation.rebuild_class(client, chunk_schema, str(tmp_path / CHUNK)) == {"tenants": 2, "objects": 6}
+    assert [tenant.name for tenant in client.schema.get_class_tenants(CHUNK)] == ["a", "b"]
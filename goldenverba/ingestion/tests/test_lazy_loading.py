@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "transformers", "spacy"]
+
+
+def imported_heavy_modules(code: str) -> list[str]:
+    script = (
+        "import sys\n"
+        + code
+        + f"\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    return [module for module in output.split(",") if module]
+
+
+def test_managers_do_not_load_heavy_libraries():
+    code = (
+        "from goldenverba.ingestion.reader.manager import ReaderManager\n"
+        "from goldenverba.ingestion.chunking.manager import ChunkerManager\n"
+        "from goldenverba.ingestion.embedding.manager import EmbeddingManager\n"
+        "ReaderManager(); ChunkerManager(); EmbeddingManager().set_embedder('ADAEmbedder')\n"
+    )
+    assert imported_heavy_modules(code) == []
+
+
+def test_selecting_a_chunker_loads_its_resources():
+    code = (
+        "from goldenverba.ingestion.chunking.manager import ChunkerManager\n"
+        "manager = ChunkerManager(); manager.set_chunker('SentenceChunker')\n"
+        "assert manager.selected_chunker.nlp is not None\n"
+    )
+    assert "spacy" in imported_heavy_modules(code)
@@ -0,0 +1,94 @@
+import base64
+import threading
+
+import pytest
+
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.pipeline import BatchPool, PipelineSpec
+
+
+class WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def test_spec_is_immutable_and_validated():
+    spec = PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=100, overlap=50)
+    with pytest.raises(AttributeError):
+        spec.units = 10
+    with pytest.raises(ValueError):
+        PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=10, overlap=10)
+
+
+def test_concurrent_leases_get_their_own_batch():
+    client = FakeWeaviateClient(latency_ms=0)
+    pool = BatchPool(client, client.new_batch, size=1)
+
+    with pool.lease() as first, pool.lease() as second:
+        assert first.batch is not second.batch
+        assert first.batch is not client.batch
+        # Everything else is the shared client
+        assert first.schema is client.schema
+    with pool.lease() as third:
+        assert third.batch in (first.batch, second.batch)
+
+
+def test_concurrent_imports_keep_their_own_settings(monkeypatch):
+    monkeypatch.setenv("VERBA_WEAVIATE_STANDIN", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("goldenverba.ingestion.chunking.manager.get_encoding", lambda: WordEncoding())
+    from goldenverba.verba_manager import VerbaManager
+
+    manager = VerbaManager()
+    text = " ".join(f"word{i}" for i in range(60))
+    specs = {
+        "small.txt": PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=10, overlap=0),
+        "large.txt": PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=30, overlap=0),
+    }
+    results = {}
+    start = threading.Barrier(len(specs))
+
+    def run(name, spec):
+        start.wait()
+        encoded = base64.b64encode(text.encode("utf-8")).decode("ascii")
+        results[name] = manager.ingest(spec, [encoded], [], [""], [name])
+
+    threads = [threading.Thread(target=run, args=item) for item in specs.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results["small.txt"][0].chunks) == 6
+    assert len(results["large.txt"][0].chunks) == 2
+    # The selected components of the manager were not touched
+    assert manager.chunker_manager.selected_chunker.default_units == 100
+
+
+def test_failed_batch_reports_the_documents_already_imported(monkeypatch):
+    monkeypatch.setenv("VERBA_WEAVIATE_STANDIN", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("goldenverba.ingestion.chunking.manager.get_encoding", lambda: WordEncoding())
+    from goldenverba.ingestion.pipeline import IngestIncomplete
+    from goldenverba.verba_manager import VerbaManager
+
+    manager = VerbaManager()
+    text = " ".join(f"word{i}" for i in range(20))
+    # Room for one document at a time, so each document is its own batch
+    monkeypatch.setattr("goldenverba.verba_manager.headroom_bytes", lambda: len(text) * 40)
+    calls = []
+
+    def embed(documents, client, embedder=None):
+        calls.append(documents)
+        if len(calls) > 1:
+            raise RuntimeError("Weaviate went away")
+        return True
+
+    monkeypatch.setattr(manager.embedder_manager, "embed", embed)
+    spec = PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=10, overlap=0)
+    encoded = base64.b64encode(text.encode("utf-8")).decode("ascii")
+
+    with pytest.raises(IngestIncomplete) as failure:
+        manager.ingest(spec, [encoded, encoded], [], [""], ["first.txt", "second.txt"])
+    assert [document.name for document in failure.value.imported_documents] == ["first.txt"]
+    assert "Weaviate went away" in str(failure.value)
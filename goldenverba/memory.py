@@ -0,0 +1,204 @@
+import contextlib
+import os
+import threading
+
+from contextvars import ContextVar
+from typing import Optional
+
+from goldenverba.metrics import (
+    INGEST_MEMORY_LIMITED,
+    INGEST_PEAK_MEMORY,
+    PROCESS_RSS_BYTES,
+    REGISTRY,
+)
+
+MB = 1024 * 1024
+
+# 0 disables the soft limit
+SOFT_LIMIT_MB = int(os.getenv("VERBA_INGEST_MEMORY_SOFT_LIMIT_MB", 0))
+# Bytes of process memory an ingested byte of text costs until it is imported: chunks with overlap, tokens, vectors
+MEMORY_FACTOR = float(os.getenv("VERBA_INGEST_MEMORY_FACTOR", 30))
+SAMPLE_INTERVAL = int(os.getenv("VERBA_MEMORY_SAMPLE_MS", 50)) / 1000
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+class MemoryLimitExceeded(Exception):
+    """An upload that cannot be imported under the memory soft limit, even one document at a time"""
+
+
+def rss_bytes() -> int:
+    """Resident set size of the process, from /proc on Linux, peak RSS from getrusage elsewhere"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import resource
+
+        # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class MemoryTracker:
+    """
+    Samples the RSS of the process from a background thread while an ingestion job runs and keeps the peak
+    of the whole job and of each stage. The active tracker lives in a context variable, like the query trace
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start_rss = rss_bytes()
+        self.peak_rss = self.start_rss
+        self.stage: Optional[str] = None
+        self.stages: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._token = None
+
+    def sample(self) -> int:
+        rss = rss_bytes()
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            if self.stage is not None:
+                self.stages[self.stage] = max(self.stages.get(self.stage, 0), rss)
+        return rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    @contextlib.contextmanager
+    def track_stage(self, stage: str):
+        previous = self.stage
+        self.stage = stage
+        self.sample()
+        try:
+            yield self
+        finally:
+            self.sample()
+            self.stage = previous
+
+    def __enter__(self) -> "MemoryTracker":
+        self._token = _current_tracker.set(self)
+        self._thread = threading.Thread(
+            target=self._run, name="verba-memory-sampler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        _current_tracker.reset(self._token)
+
+        INGEST_PEAK_MEMORY.observe(self.peak_rss / MB, stage="job")
+        for stage, peak in self.stages.items():
+            INGEST_PEAK_MEMORY.observe(peak / MB, stage=stage)
+
+    def to_dict(self) -> dict:
+        return {
+            "start_mb": round(self.start_rss / MB, 1),
+            "peak_mb": round(self.peak_rss / MB, 1),
+            "stages_peak_mb": {
+                stage: round(peak / MB, 1) for stage, peak in self.stages.items()
+            },
+        }
+
+
+_current_tracker: ContextVar[Optional[MemoryTracker]] = ContextVar(
+    "verba_memory_tracker", default=None
+)
+
+
+def current_tracker() -> Optional[MemoryTracker]:
+    return _current_tracker.get()
+
+
+@contextlib.contextmanager
+def memory_stage(stage: str):
+    """Attribute the memory used inside the block to a stage of the active tracker, no-op without one"""
+    tracker = _current_tracker.get()
+    if tracker is None:
+        yield None
+        return
+    with tracker.track_stage(stage):
+        yield tracker
+
+
+def headroom_bytes(soft_limit_mb: int = None) -> Optional[int]:
+    """Bytes left under the soft limit, None when no limit is configured"""
+    soft_limit_mb = SOFT_LIMIT_MB if soft_limit_mb is None else soft_limit_mb
+    if soft_limit_mb <= 0:
+        return None
+    return max(soft_limit_mb * MB - rss_bytes(), 0)
+
+
+def check_upload(sizes: list[int], headroom: Optional[int], factor: float = MEMORY_FACTOR) -> None:
+    """Reject an upload before reading it when one of its files alone would not fit under the soft limit
+    @parameter sizes : list[int] - Size in bytes of every uploaded file
+    @parameter headroom : Optional[int] - Bytes left under the soft limit, None to skip the check
+    @parameter factor : float - Estimated process memory per byte of text
+    """
+    if headroom is None or not sizes:
+        return
+    largest = max(sizes)
+    if largest * factor > headroom:
+        INGEST_MEMORY_LIMITED.inc(action="rejected")
+        raise MemoryLimitExceeded(
+            f"A {largest / MB:.1f} MB file needs about {largest * factor / MB:.0f} MB to import, only {headroom / MB:.0f} MB are left under the ingestion memory limit"
+        )
+
+
+def upload_sizes(bytes: list[str], contents: list[str], paths: list[str]) -> list[int]:
+    """Size in bytes of every file of an upload, before anything is decoded or read
+    @parameter bytes : list[str] - Base64 encoded files, 4 characters for 3 bytes
+    @parameter contents : list[str] - Texts
+    @parameter paths : list[str] - Paths to files or directories, every file under a directory counts on its own
+    @returns list[int] - Size of every file
+    """
+    sizes = [len(byte) * 3 // 4 for byte in bytes]
+    sizes += [len(content.encode("utf-8")) for content in contents]
+    for path in paths:
+        if os.path.isfile(path):
+            sizes.append(os.path.getsize(path))
+        elif os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                sizes += [os.path.getsize(os.path.join(directory, file)) for file in files]
+    return sizes
+
+
+def plan_batches(sizes: list[int], headroom: Optional[int], factor: float = MEMORY_FACTOR) -> list[list[int]]:
+    """Group documents so that every group is estimated to fit under the soft limit, in their original order
+    @parameter sizes : list[int] - Text length of every document
+    @parameter headroom : Optional[int] - Bytes left under the soft limit, None imports everything at once
+    @parameter factor : float - Estimated process memory per byte of text
+    @returns list[list[int]] - Indices of the documents of each group
+    """
+    if not sizes:
+        return []
+    if headroom is None or sum(sizes) * factor <= headroom:
+        return [list(range(len(sizes)))]
+
+    check_upload(sizes, headroom, factor)
+    INGEST_MEMORY_LIMITED.inc(action="batched")
+    batches, current, current_size = [], [], 0
+    for index, size in enumerate(sizes):
+        if current and (current_size + size) * factor > headroom:
+            batches.append(current)
+            current, current_size = [], 0
+        current.append(index)
+        current_size += size
+    batches.append(current)
+    return batches
+
+
+REGISTRY.add_collector(lambda: PROCESS_RSS_BYTES.set(rss_bytes()))
@@ -0,0 +1,362 @@
+import os
+import threading
+import time
+
+from bisect import bisect_left
+from typing import Callable
+
+from starlette.routing import Match
+
+from goldenverba.tracing import record_stage
+
+TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
+
+# Seconds, covers everything from a cache lookup to a slow gpt-4 completion
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metric:
+    """
+    Base class of the in-process metrics, exported in the Prometheus text format by /metrics.
+    Every metric carries a tenant label that defaults to the tenant of the process.
+    Recording is a dict update under a lock, nothing is formatted until somebody scrapes
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ("tenant",) + tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if "tenant" not in labels:
+            labels["tenant"] = TENANT
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}"
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError("samples must be implemented by a subclass.")
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines += self.samples()
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in values]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per bucket counts (last one is +Inf), then the running sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, **labels) -> "Timer":
+        """Context manager that observes the seconds spent inside it"""
+        return Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = self._format_labels(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state[-1]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        elapsed = time.perf_counter() - self.start
+        self.histogram.observe(elapsed, **self.labels)
+        if "stage" in self.labels:
+            # Also feeds the latency breakdown of the request being served, if any
+            record_stage(self.labels["stage"], elapsed)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges right before every scrape"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = Registry()
+
+QUERY_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "verba_query_stage_seconds",
+        "Seconds spent in each stage of the query path",
+        ("stage",),
+    )
+)
+INGEST_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "verba_ingest_stage_seconds",
+        "Seconds spent in each stage of the ingestion path",
+        ("stage",),
+    )
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "verba_cache_requests_total",
+        "Cache lookups by cache and result (hit or miss)",
+        ("cache", "result"),
+    )
+)
+WEAVIATE_ERRORS = REGISTRY.register(
+    Counter(
+        "verba_weaviate_errors_total",
+        "Errors returned by Weaviate by status",
+        ("status",),
+    )
+)
+OPENAI_ERRORS = REGISTRY.register(
+    Counter(
+        "verba_openai_errors_total",
+        "Errors returned by OpenAI by status",
+        ("status",),
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge(
+        "verba_http_requests_in_flight",
+        "API requests currently being processed",
+        ("path",),
+    )
+)
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "verba_http_request_seconds",
+        "Duration of API requests by route and status code",
+        ("path", "status"),
+    )
+)
+INGEST_PEAK_MEMORY = REGISTRY.register(
+    Histogram(
+        "verba_ingest_peak_memory_megabytes",
+        "Peak resident memory of ingestion jobs, for the whole job and per stage",
+        ("stage",),
+        buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+    )
+)
+INGEST_MEMORY_LIMITED = REGISTRY.register(
+    Counter(
+        "verba_ingest_memory_limited_total",
+        "Uploads rejected or imported in smaller batches because of the ingestion memory soft limit",
+        ("action",),
+    )
+)
+PROCESS_RSS_BYTES = REGISTRY.register(
+    Gauge(
+        "verba_process_resident_memory_bytes",
+        "Resident memory of the Verba process",
+    )
+)
+ADMISSION_QUEUED = REGISTRY.register(
+    Gauge(
+        "verba_admission_queued_requests",
+        "Requests waiting for an admission slot by kind",
+        ("kind",),
+    )
+)
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter(
+        "verba_admission_rejected_total",
+        "Requests rejected with a 429 by kind and reason (queue_full or timeout)",
+        ("kind", "reason"),
+    )
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "verba_admission_wait_seconds",
+        "Seconds requests waited for an admission slot by kind",
+        ("kind",),
+    )
+)
+OPENAI_LIMITER_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "verba_openai_limiter_wait_seconds",
+        "Seconds OpenAI calls waited for capacity in the shared rate limiter by priority class",
+        ("priority",),
+    )
+)
+OPENAI_LIMITER_TIMEOUTS = REGISTRY.register(
+    Counter(
+        "verba_openai_limiter_timeouts_total",
+        "OpenAI calls abandoned because no capacity became available in time, by priority class",
+        ("priority",),
+    )
+)
+QUERY_COALESCED = REGISTRY.register(
+    Counter(
+        "verba_query_coalesced_total",
+        "Queries answered by waiting on an identical query in flight instead of running their own search and completion",
+    )
+)
+QUERY_LOG_DROPPED = REGISTRY.register(
+    Counter(
+        "verba_query_log_dropped_total",
+        "Query log records dropped because the writer queue was full",
+    )
+)
+
+
+def record_cache(cache: str, hits: int, misses: int) -> None:
+    if hits:
+        CACHE_REQUESTS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_REQUESTS.inc(misses, cache=cache, result="miss")
+
+
+def record_openai_error(error: Exception) -> None:
+    """Count an OpenAI error, by HTTP status if the error carries one"""
+    status = getattr(error, "http_status", None) or type(error).__name__
+    OPENAI_ERRORS.inc(status=status)
+
+
+def record_weaviate_error(error) -> None:
+    """Count a Weaviate error, accepts an exception or a status string"""
+    if isinstance(error, str):
+        status = error
+    else:
+        status = getattr(error, "status_code", None) or type(error).__name__
+    WEAVIATE_ERRORS.inc(status=status)
+
+
+def route_label(scope) -> str:
+    """Path template of the route a request matches, other for unknown paths, so that ids in paths and
+    scanners probing random URLs do not add series"""
+    for route in getattr(scope.get("app"), "routes", []):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return "other"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware that tracks in-flight API requests and their duration, by route template
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        root_path = scope.get("root_path", "").rstrip("/")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+
+        if scope["type"] != "http" or not path.startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        path = route_label(scope)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(path=path)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(path=path)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, path=path, status=status["code"]
+            )
@@ -0,0 +1,221 @@
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+
+from pathlib import Path
+from typing import Optional
+
+from wasabi import msg
+
+from goldenverba.metrics import QUERY_LOG_DROPPED
+from goldenverba.tracing import QueryTrace
+
+TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
+
+QUERY_LOG_ENABLED = os.getenv("VERBA_QUERY_LOG", "true").lower() == "true"
+QUERY_LOG_PATH = os.getenv("VERBA_QUERY_LOG_PATH", "./.verba/logs/queries.jsonl")
+QUERY_LOG_MAX_MB = int(os.getenv("VERBA_QUERY_LOG_MAX_MB", 100))
+QUERY_LOG_BACKUPS = int(os.getenv("VERBA_QUERY_LOG_BACKUPS", 5))
+
+_STOP = object()
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a question: unicode NFKC, lower case, single spaces, no trailing punctuation
+    @parameter query : str - Question as typed by the user
+    @returns str - Normalized question, identical for questions that differ only in case or spacing
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    return _whitespace.sub(" ", query).strip().rstrip("?!.;: ")
+
+
+class QueryLogWriter:
+    """
+    Appends JSON lines to a rotating log file from a background thread.
+    Requests only put their record on a bounded queue, when the disk falls behind records are dropped and counted
+    rather than slowing down the requests. The thread writes whatever is queued in one go, at most every flush_interval
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = QUERY_LOG_MAX_MB * 1024 * 1024,
+        backups: int = QUERY_LOG_BACKUPS,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="verba-query-log", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, record: dict) -> bool:
+        """Queue a record, never blocks
+        @returns bool - False if the record was dropped
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            QUERY_LOG_DROPPED.inc()
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued record is on disk"""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while first is not _STOP and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(record)
+                if record is _STOP:
+                    break
+
+            records = [record for record in batch if record is not _STOP]
+            try:
+                if records:
+                    self._write_batch(records)
+            except Exception as e:
+                msg.warn(f"Could not write {len(records)} query log records: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return
+
+    def _write_batch(self, records: list[dict]) -> None:
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records
+        ).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._rotate(len(lines))
+        with open(self.path, "ab") as file:
+            file.write(lines)
+
+    def _rotate(self, incoming: int) -> None:
+        if not self.path.exists() or self.path.stat().st_size + incoming <= self.max_bytes:
+            return
+        if self.backups <= 0:
+            self.path.unlink()
+            return
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+
+
+_writer: Optional[QueryLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_query_log() -> Optional[QueryLogWriter]:
+    """Writer of the process, created on first use, None when VERBA_QUERY_LOG=false"""
+    global _writer
+    if not QUERY_LOG_ENABLED:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = QueryLogWriter(QUERY_LOG_PATH)
+                atexit.register(_writer.close)
+                msg.info(f"Logging queries to {QUERY_LOG_PATH}")
+    return _writer
+
+
+def close_query_log() -> None:
+    """Write out the queued records, for processes that exit without running atexit"""
+    if _writer is not None:
+        _writer.close()
+
+
+def log_request(record: dict) -> None:
+    writer = get_query_log()
+    if writer is not None:
+        writer.write(record)
+
+
+def query_record(
+    query: str,
+    results: list[dict],
+    trace: QueryTrace,
+    status: str,
+    tenant: str = TENANT,
+    kind: str = "query",
+) -> dict:
+    """Log record of one /api/query or /api/retrieve request"""
+    return {
+        "ts": time.time(),
+        "kind": kind,
+        "tenant": tenant,
+        "query": query,
+        "normalized_query": normalize_query(query),
+        "chunks": [
+            {
+                "doc_uuid": result.get("doc_uuid"),
+                "chunk_id": result.get("chunk_id"),
+                "score": (result.get("_additional") or {}).get("score"),
+            }
+            for result in results or []
+        ],
+        "status": status,
+        **trace.to_dict(),
+    }
+
+
+def ingest_record(
+    settings: dict,
+    file_sizes: list[int],
+    documents: int,
+    chunks: int,
+    seconds: float,
+    status: str,
+    memory: Optional[dict] = None,
+    tenant: str = TENANT,
+) -> dict:
+    """Log record of one /api/load_data request, file contents are not logged, only their sizes"""
+    return {
+        "ts": time.time(),
+        "kind": "ingest",
+        "tenant": tenant,
+        **settings,
+        "file_sizes": file_sizes,
+        "documents": documents,
+        "chunks": chunks,
+        "total_ms": round(seconds * 1000, 2),
+        "status": status,
+        "memory": memory,
+    }
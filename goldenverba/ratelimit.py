@@ -0,0 +1,252 @@
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, the limiter only coordinates the threads of one process
+    fcntl = None
+
+from wasabi import msg
+
+from goldenverba.metrics import OPENAI_LIMITER_TIMEOUTS, OPENAI_LIMITER_WAIT_SECONDS
+
+TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
+
+# Limits of the OpenAI deployment shared by every Verba process of the host, 0 disables the limiter
+OPENAI_RPM = int(os.getenv("VERBA_OPENAI_RPM", 0))
+OPENAI_TPM = int(os.getenv("VERBA_OPENAI_TPM", 0))
+STATE_PATH = os.getenv(
+    "VERBA_OPENAI_LIMITER_STATE",
+    os.path.join(tempfile.gettempdir(), "verba-openai-limiter.json"),
+)
+# Share of the capacity bulk calls leave untouched, so that a chat request finds headroom at once
+INTERACTIVE_RESERVE = float(os.getenv("VERBA_OPENAI_INTERACTIVE_RESERVE", 0.2))
+TENANT_WEIGHT = float(os.getenv("VERBA_OPENAI_TENANT_WEIGHT", 1.0))
+# Completion tokens budgeted for a chat call before its actual usage is known
+COMPLETION_ESTIMATE = int(os.getenv("VERBA_OPENAI_COMPLETION_ESTIMATE", 500))
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+TIMEOUTS = {INTERACTIVE: 30.0, BULK: 600.0}
+
+# A waiter that has not polled for this long is considered gone
+_WAITER_TTL = 2.0
+# Usage of the last minute or so decides which tenant goes first
+_USAGE_HALF_LIFE = 60.0
+_POLL_INTERVAL = 0.25
+
+
+class RateLimitTimeout(Exception):
+    """No OpenAI capacity became available in time"""
+
+
+@contextlib.contextmanager
+def locked_json_file(path: str):
+    """JSON object of a file shared by the processes of the host, read and written back under an exclusive flock.
+    Keep the block short, every process of the host waits for it. Needs fcntl
+    """
+    descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        with os.fdopen(os.dup(descriptor), "r+", encoding="utf-8") as file:
+            content = file.read()
+            try:
+                state = json.loads(content) if content else {}
+            except ValueError:
+                state = {}
+            yield state
+            file.seek(0)
+            file.truncate()
+            json.dump(state, file)
+    finally:
+        os.close(descriptor)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about 4 characters per token for English"""
+    return max(1, len(text) // 4)
+
+
+class SharedRateLimiter:
+    """
+    Token buckets for requests and tokens per minute, kept in a small JSON file that every Verba process
+    of the host reads and updates under an exclusive flock.
+
+    Callers declare a priority class: bulk calls (embeddings of uploads) only run while no interactive
+    call (chat, query vectorization) is waiting and never take the last INTERACTIVE_RESERVE of the buckets.
+    Within a class, waiting tenants are served in order of their recent usage divided by their weight,
+    so that one tenant importing a large corpus does not starve the others
+    """
+
+    def __init__(
+        self,
+        rpm: int = OPENAI_RPM,
+        tpm: int = OPENAI_TPM,
+        path: str = STATE_PATH,
+        tenant: str = TENANT,
+        weight: float = TENANT_WEIGHT,
+        reserve: float = INTERACTIVE_RESERVE,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.path = path
+        self.tenant = tenant
+        self.weight = max(weight, 1e-3)
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._memory_state = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Shared state, read and written back under the process lock and the file lock"""
+        with self._lock:
+            if fcntl is None:
+                if self._memory_state is None:
+                    self._memory_state = {}
+                yield self._memory_state
+                return
+            with locked_json_file(self.path) as state:
+                yield state
+
+    def _refill(self, state: dict, now: float) -> None:
+        elapsed = max(now - state.get("updated", now), 0.0)
+        state["updated"] = now
+        state["requests"] = min(state.get("requests", self.rpm) + elapsed * self.rpm / 60, self.rpm)
+        state["tokens"] = min(state.get("tokens", self.tpm) + elapsed * self.tpm / 60, self.tpm)
+
+        decay = 0.5 ** (elapsed / _USAGE_HALF_LIFE)
+        usage = state.setdefault("usage", {})
+        for tenant in list(usage):
+            usage[tenant] *= decay
+            if usage[tenant] < 1e-3:
+                del usage[tenant]
+
+        waiters = state.setdefault("waiters", {INTERACTIVE: {}, BULK: {}})
+        for priority in waiters:
+            waiters[priority] = {
+                tenant: seen for tenant, seen in waiters[priority].items() if now - seen < _WAITER_TTL
+            }
+
+    def _fits(self, state: dict, requests: int, tokens: int, priority: str) -> bool:
+        keep = self.reserve if priority == BULK else 0.0
+        # A call larger than the whole bucket still runs once the bucket is full, and leaves it in debt
+        requests = min(requests, self.rpm * (1 - keep))
+        fits_requests = self.rpm <= 0 or state["requests"] - requests >= self.rpm * keep
+        tokens = min(tokens, self.tpm * (1 - keep))
+        fits_tokens = self.tpm <= 0 or state["tokens"] - tokens >= self.tpm * keep
+        return fits_requests and fits_tokens
+
+    def _my_turn(self, state: dict, priority: str) -> bool:
+        if priority == BULK and state["waiters"][INTERACTIVE]:
+            return False
+        usage = state["usage"]
+        weights = state.setdefault("weights", {})
+        mine = usage.get(self.tenant, 0.0) / self.weight
+        return all(
+            usage.get(tenant, 0.0) / weights.get(tenant, 1.0) >= mine
+            for tenant in state["waiters"][priority]
+            if tenant != self.tenant
+        )
+
+    def _try_acquire(self, requests: int, tokens: int, priority: str) -> tuple[bool, float]:
+        now = time.time()
+        with self._state() as state:
+            self._refill(state, now)
+            state.setdefault("weights", {})[self.tenant] = self.weight
+            if self._my_turn(state, priority) and self._fits(state, requests, tokens, priority):
+                state["requests"] -= requests
+                state["tokens"] -= tokens
+                state["usage"][self.tenant] = state["usage"].get(self.tenant, 0.0) + tokens + requests
+                state["waiters"][priority].pop(self.tenant, None)
+                return True, 0.0
+            state["waiters"][priority][self.tenant] = now
+
+            # Time until the buckets hold enough, assuming nobody else takes from them
+            keep = self.reserve if priority == BULK else 0.0
+            waits = [0.0]
+            if self.rpm > 0:
+                missing = min(requests, self.rpm * (1 - keep)) + self.rpm * keep - state["requests"]
+                waits.append(missing * 60 / self.rpm)
+            if self.tpm > 0:
+                missing = min(tokens, self.tpm * (1 - keep)) + self.tpm * keep - state["tokens"]
+                waits.append(missing * 60 / self.tpm)
+            return False, max(waits)
+
+    def _leave(self, priority: str) -> None:
+        with self._state() as state:
+            state.setdefault("waiters", {INTERACTIVE: {}, BULK: {}})[priority].pop(self.tenant, None)
+
+    def acquire(
+        self, requests: int = 1, tokens: int = 0, priority: str = INTERACTIVE, timeout: Optional[float] = None
+    ) -> float:
+        """Wait until the call fits in the shared limits and take its share of the buckets
+        @parameter requests : int - OpenAI requests the call makes
+        @parameter tokens : int - Estimated tokens of the call, prompt and completion
+        @parameter priority : str - interactive or bulk
+        @parameter timeout : Optional[float] - Seconds to wait at most, default per priority class
+        @returns float - Seconds waited
+        @raises RateLimitTimeout - No capacity in time
+        """
+        if not self.enabled:
+            return 0.0
+        timeout = TIMEOUTS[priority] if timeout is None else timeout
+        start = time.perf_counter()
+        while True:
+            acquired, wait = self._try_acquire(requests, tokens, priority)
+            waited = time.perf_counter() - start
+            if acquired:
+                OPENAI_LIMITER_WAIT_SECONDS.observe(waited, priority=priority)
+                if waited > 1:
+                    msg.info(f"Waited {waited:.1f} s for OpenAI capacity ({priority})")
+                return waited
+            if waited + min(wait, _POLL_INTERVAL) > timeout:
+                self._leave(priority)
+                OPENAI_LIMITER_TIMEOUTS.inc(priority=priority)
+                raise RateLimitTimeout(
+                    f"No OpenAI capacity for a {priority} call of {tokens} tokens within {timeout:.0f} s"
+                )
+            # Poll often enough to keep the waiter registration fresh, with jitter against lockstep polling
+            time.sleep(min(max(wait, 0.01), _POLL_INTERVAL) * random.uniform(0.8, 1.2))
+
+    def settle(self, estimated: int, usage: Optional[dict]) -> None:
+        """Correct the token bucket once OpenAI reported the actual usage of a call
+        @parameter estimated : int - Tokens taken by acquire
+        @parameter usage : Optional[dict] - usage block of the OpenAI response
+        """
+        if not self.enabled or self.tpm <= 0 or not usage or "total_tokens" not in usage:
+            return
+        actual = int(usage["total_tokens"])
+        if actual == estimated:
+            return
+        with self._state() as state:
+            self._refill(state, time.time())
+            state["tokens"] = min(state["tokens"] + estimated - actual, self.tpm)
+            state["usage"][self.tenant] = max(
+                state["usage"].get(self.tenant, 0.0) + actual - estimated, 0.0
+            )
+
+
+_limiter: Optional[SharedRateLimiter] = None
+
+
+def get_openai_limiter() -> SharedRateLimiter:
+    """Limiter of the process, a no-op unless VERBA_OPENAI_RPM or VERBA_OPENAI_TPM is set"""
+    global _limiter
+    if _limiter is None:
+        _limiter = SharedRateLimiter()
+        if _limiter.enabled:
+            msg.info(
+                f"OpenAI calls limited to {OPENAI_RPM or 'unlimited'} RPM and {OPENAI_TPM or 'unlimited'} TPM across processes ({STATE_PATH})"
+            )
+    return _limiter
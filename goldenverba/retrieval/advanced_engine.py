@@ -1,4 +1,26 @@
 from goldenverba.retrieval.simple_engine import SimpleVerbaQueryEngine
+from goldenverba.metrics import (
+    QUERY_STAGE_SECONDS,
+    record_cache,
+    record_openai_error,
+    record_weaviate_error,
+)
+from goldenverba.ingestion.schema.schema_generation import filter_value_key
+from goldenverba.query_log import normalize_query
+from goldenverba.ratelimit import (
+    COMPLETION_ESTIMATE,
+    INTERACTIVE,
+    estimate_tokens,
+    get_openai_limiter,
+)
+from goldenverba.retrieval.singleflight import SingleFlight
+from goldenverba.tracing import (
+    count_weaviate_call,
+    mark_cache_hit,
+    mark_coalesced,
+    record_stage,
+    record_token_usage,
+)
 
 import os
 from wasabi import msg
@@ -6,51 +28,160 @@ import openai
 
 TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
 
+# Defaults of the retrieval, tune them per tenant with `verba bench retrieval`
+RETRIEVAL_LIMIT = int(os.getenv("VERBA_RETRIEVAL_LIMIT", 8))
+CONTEXT_WINDOW = int(os.getenv("VERBA_CONTEXT_WINDOW", 1))
+
+#TODO right now it's unclear how the class name will
+#be chosen by the Verba team in the definitive 0.3
+#version with the new modular design
+#as a quick dirty fix we hardcode it to the value that
+#we need.
+CHUNK_CLASS_NAME = "Chunk_text2vec_openai"
+
 class AdvancedVerbaQueryEngine(SimpleVerbaQueryEngine):
+    # Identical questions asked while one is being answered wait for that answer
+    in_flight = SingleFlight()
+
     def query(self, query_string: str, model: str) -> tuple:
         """Execute a query to a receive specific chunks from Weaviate
         @parameter query_string : str - Search query
         @returns tuple - (system message, iterable list of results)
         """
+        key = (TENANT, normalize_query(query_string), model)
+        answer, shared = self.in_flight.do(
+            key, lambda: self.answer(query_string, model)
+        )
+        if shared:
+            mark_coalesced()
+            msg.info(f"Shared the answer of an identical query in flight: {query_string}")
+        return answer
 
+    def answer(self, query_string: str, model: str) -> tuple:
+        """Semantic cache lookup, retrieval and completion of one query, see query
+        @parameter query_string : str - Search query
+        @parameter model : str - Chat model or Azure deployment
+        @returns tuple - (system message, iterable list of results)
+        """
         msg.info(f"Using model: {model}")
 
         # check semantic cache
-        results, system_msg = self.retrieve_semantic_cache(query_string)
+        with QUERY_STAGE_SECONDS.time(stage="semantic_cache"):
+            results, system_msg = self.retrieve_semantic_cache(query_string)
 
         if results:
+            record_cache("semantic", hits=1, misses=0)
+            mark_cache_hit()
             return (system_msg, results)
+        record_cache("semantic", hits=0, misses=1)
 
-#TODO right now it's unclear how the class name will
-#be chosen by the Verba team in the definitive 0.3
-#version with the new modular design
-#as a quick dirty fix we hardcode it to the value that
-#we need.
-        chunk_class_name = "Chunk_text2vec_openai"
-
-        query_results = (
-            SimpleVerbaQueryEngine.client.query.get(
-                class_name=chunk_class_name,
-                properties=["text", "doc_name", "chunk_id", "doc_uuid", "doc_type"],
-            )
-            .with_tenant(TENANT)
-            .with_hybrid(query=query_string)
-            .with_additional(properties=["score"])
-            .with_limit(8)
-            .do()
-        )
+        results, context = self.retrieve(query_string)
 
-        results = query_results["data"]["Get"].get(chunk_class_name)
+        try:
+            system_msg = self.generate(query_string, context, model)
+            self.add_semantic_cache(query_string, results, system_msg)
+        except Exception as e:
+            if isinstance(e, openai.error.OpenAIError):
+                record_openai_error(e)
+            system_msg = f"Something went wrong! Please check your API Key. Exception : {str(e)}"
+            msg.fail(system_msg)
 
-        if results is None:
-            raise Exception(query_results)
+        return (system_msg, results)
 
-        context = self.combine_context(results=results)
+    def retrieve(
+        self,
+        query_string: str,
+        limit: int = RETRIEVAL_LIMIT,
+        window: int = CONTEXT_WINDOW,
+        tenant: str = TENANT,
+        alpha: float = None,
+        doc_type: str = None,
+        token_budget: int = None,
+    ) -> tuple:
+        """Hybrid search of the chunks and assembly of the context
+        @parameter query_string : str - Search query
+        @parameter limit : int - Number of chunks retrieved
+        @parameter window : int - Neighbor chunks added on each side of a retrieved chunk
+        @parameter tenant : str - Weaviate tenant
+        @parameter alpha : float - Weight of the vector search against BM25, Weaviate's default if None
+        @parameter doc_type : str - Only search chunks of this document type
+        @parameter token_budget : int - Maximum tokens of the context, unlimited if None
+        @returns tuple - (retrieved chunks, context)
+        """
+        results = self.search_chunks(query_string, limit, tenant, alpha, doc_type)
+        context = self.combine_context(
+            results=results, window=window, tenant=tenant, token_budget=token_budget
+        )
 
         msg.info(
             f"Combined context of all chunks and their weighted windows ({len(context)} characters)"
         )
+        return results, context
 
+    def search_chunks(
+        self,
+        query_string: str,
+        limit: int = RETRIEVAL_LIMIT,
+        tenant: str = TENANT,
+        alpha: float = None,
+        doc_type: str = None,
+    ) -> list[dict]:
+        """Hybrid search of the chunks, best first, each with its score in _additional
+        @parameter query_string : str - Search query
+        @parameter limit : int - Number of chunks retrieved
+        @parameter tenant : str - Weaviate tenant
+        @parameter alpha : float - Weight of the vector search against BM25, Weaviate's default if None
+        @parameter doc_type : str - Only search chunks of this document type
+        @returns list[dict] - Retrieved chunks
+        """
+        hybrid = {"query": query_string}
+        if alpha is not None:
+            hybrid["alpha"] = alpha
+
+        # Weaviate embeds the query with OpenAI (text2vec-openai)
+        get_openai_limiter().acquire(tokens=estimate_tokens(query_string), priority=INTERACTIVE)
+
+        with QUERY_STAGE_SECONDS.time(stage="hybrid_search"):
+            count_weaviate_call()
+            query = (
+                SimpleVerbaQueryEngine.client.query.get(
+                    class_name=CHUNK_CLASS_NAME,
+                    properties=["text", "doc_name", "chunk_id", "doc_uuid", "doc_type"],
+                )
+                .with_tenant(tenant)
+                .with_hybrid(**hybrid)
+                .with_additional(properties=["score"])
+                .with_limit(limit)
+            )
+            if doc_type:
+                query = query.with_where(
+                    {"path": ["doc_type"], "operator": "Equal", "valueText": doc_type}
+                )
+            query_results = query.do()
+
+        results = (query_results.get("data") or {}).get("Get", {}).get(CHUNK_CLASS_NAME)
+
+        if results is None:
+            record_weaviate_error("graphql")
+            raise Exception(query_results)
+        return results
+
+    def build_messages(self, query_string: str, context: str) -> list[dict]:
+        return [
+            {
+                "role": "system",
+                "content": f"You are a Retrieval Augmented Generation chatbot. Try to answer this user query {query_string} with only the provided context. If the provided documentation does not provide enough information, say so. Answer in the same language as the language used in the question.",
+            },
+            {"role": "user", "content": context},
+        ]
+
+    def generate(self, query_string: str, context: str, model: str) -> str:
+        """Answer the query from the context with the chat completion API
+        @parameter query_string : str - Search query
+        @parameter context : str - Context assembled by retrieve
+        @parameter model : str - Chat model or Azure deployment
+        @returns str - Answer of the model
+        """
         openai.api_key = os.environ.get("OPENAI_API_KEY", "")
         if "OPENAI_API_TYPE" in os.environ:
             openai.api_type = os.getenv("OPENAI_API_TYPE")
@@ -59,99 +190,150 @@ class AdvancedVerbaQueryEngine(SimpleVerbaQueryEngine):
         if "OPENAI_API_VERSION" in os.environ:
             openai.api_version = os.getenv("OPENAI_API_VERSION")
 
-        try:
-            msg.info(f"Starting API call to answer {query_string}")
-            chat_completion_arguments= {
-                "model":model,
-                "messages":[
-                    {
-                        "role": "system",
-                        "content": f"You are a Retrieval Augmented Generation chatbot. Try to answer this user query {query_string} with only the provided context. If the provided documentation does not provide enough information, say so. Answer in the same language as the language used in the question.",
-                    },
-                    {"role": "user", "content": context},
-                ]
-            }
-            if openai.api_type=="azure":
-                chat_completion_arguments["deployment_id"]=model
-            print(chat_completion_arguments)
+        msg.info(f"Starting API call to answer {query_string}")
+        chat_completion_arguments= {
+            "model":model,
+            "messages":self.build_messages(query_string, context)
+        }
+        if openai.api_type=="azure":
+            chat_completion_arguments["deployment_id"]=model
+        print(chat_completion_arguments)
+
+        limiter = get_openai_limiter()
+        estimated_tokens = COMPLETION_ESTIMATE + sum(
+            estimate_tokens(message["content"])
+            for message in chat_completion_arguments["messages"]
+        )
+        waited = limiter.acquire(tokens=estimated_tokens, priority=INTERACTIVE)
+        if waited:
+            record_stage("openai_limiter", waited)
+        with QUERY_STAGE_SECONDS.time(stage="llm_completion"):
             completion = openai.ChatCompletion.create(
                 **chat_completion_arguments
             )
-            print(completion)
-            system_msg = str(completion["choices"][0]["message"]["content"])
-            self.add_semantic_cache(query_string, results, system_msg)
-        except Exception as e:
-            system_msg = f"Something went wrong! Please check your API Key. Exception : {str(e)}"
-            msg.fail(system_msg)
+        print(completion)
+        limiter.settle(estimated_tokens, completion.get("usage"))
+        record_token_usage(completion.get("usage"))
+        return str(completion["choices"][0]["message"]["content"])
 
-        return (system_msg, results)
-
-    def combine_context(self, results: list) -> str:
+    def combine_context(
+        self,
+        results: list,
+        window: int = CONTEXT_WINDOW,
+        tenant: str = TENANT,
+        token_budget: int = None,
+    ) -> str:
         doc_name_map = {}
 
-        context = ""
-
         for result in results:
             if result["doc_name"] not in doc_name_map:
                 doc_name_map[result["doc_name"]] = {}
 
-            doc_name_map[result["doc_name"]][result["chunk_id"]] = result
+            doc_name_map[result["doc_name"]][int(result["chunk_id"])] = result
+
+        with QUERY_STAGE_SECONDS.time(stage="window_expansion"):
+            self.expand_window(doc_name_map, window, tenant)
+
+        with QUERY_STAGE_SECONDS.time(stage="context_packing"):
+            return self.pack_context(doc_name_map, token_budget)
 
+    def expand_window(
+        self, doc_name_map: dict, window: int = CONTEXT_WINDOW, tenant: str = TENANT
+    ) -> None:
+        """Add the neighbors of every retrieved chunk to the doc_name_map, with one Weaviate query per document
+        @parameter doc_name_map : dict - Retrieved chunks by document name and chunk id
+        @parameter window : int - Neighbor chunks added on each side
+        @parameter tenant : str - Weaviate tenant
+        """
         for doc in doc_name_map:
             chunk_map = doc_name_map[doc]
-            window = 1
-            added_chunks = {}
-            for chunk in chunk_map:
-                chunk_id = int(chunk)
-                all_chunk_range = list(range(chunk_id - window, chunk_id + window + 1))
-                for _range in all_chunk_range:
-                    if (
-                        _range >= 0
-                        and _range not in chunk_map
-                        and _range not in added_chunks
-                    ):
-                        chunk_retrieval_results = (
-                            SimpleVerbaQueryEngine.client.query.get(
-                                class_name="Chunk",
-                                properties=[
-                                    "text",
-                                    "doc_name",
-                                    "chunk_id",
-                                    "doc_uuid",
-                                    "doc_type",
-                                ],
-                            )
-                            .with_tenant(TENANT)                            
-                            .with_where(
-                                {
-                                    "operator": "And",
-                                    "operands": [
-                                        {
-                                            "path": ["chunk_id"],
-                                            "operator": "Equal",
-                                            "valueNumber": _range,
-                                        },
-                                        {
-                                            "path": ["doc_name"],
-                                            "operator": "Equal",
-                                            "valueText": str(doc),
-                                        },
-                                    ],
-                                }
-                            )
-                            .with_limit(1)
-                            .do()
-                        )
-
-                        if "data" in chunk_retrieval_results:
-                            if chunk_retrieval_results["data"]["Get"]["Chunk"]:
-                                added_chunks[str(_range)] = chunk_retrieval_results[
-                                    "data"
-                                ]["Get"]["Chunk"][0]
-
-            for chunk in added_chunks:
-                if chunk not in doc_name_map[doc]:
-                    doc_name_map[doc][chunk] = added_chunks[chunk]
+            missing = sorted(
+                {
+                    neighbor
+                    for chunk_id in chunk_map
+                    for neighbor in range(chunk_id - window, chunk_id + window + 1)
+                    if neighbor >= 0 and neighbor not in chunk_map
+                }
+            )
+            if not missing:
+                continue
+
+            # Neighbors are mostly consecutive, one range per run of ids instead of one operand per id
+            value_key = filter_value_key(SimpleVerbaQueryEngine.client, CHUNK_CLASS_NAME, "chunk_id")
+            runs = []
+            for chunk_id in missing:
+                if runs and chunk_id == runs[-1][1] + 1:
+                    runs[-1][1] = chunk_id
+                else:
+                    runs.append([chunk_id, chunk_id])
+            chunk_filters = [
+                {"path": ["chunk_id"], "operator": "Equal", value_key: first}
+                if first == last
+                else {
+                    "operator": "And",
+                    "operands": [
+                        {"path": ["chunk_id"], "operator": "GreaterThanEqual", value_key: first},
+                        {"path": ["chunk_id"], "operator": "LessThanEqual", value_key: last},
+                    ],
+                }
+                for first, last in runs
+            ]
+
+            count_weaviate_call()
+            chunk_retrieval_results = (
+                SimpleVerbaQueryEngine.client.query.get(
+                    class_name=CHUNK_CLASS_NAME,
+                    properties=[
+                        "text",
+                        "doc_name",
+                        "chunk_id",
+                        "doc_uuid",
+                        "doc_type",
+                    ],
+                )
+                .with_tenant(tenant)
+                .with_where(
+                    {
+                        "operator": "And",
+                        "operands": [
+                            {
+                                "path": ["doc_name"],
+                                "operator": "Equal",
+                                "valueText": str(doc),
+                            },
+                            chunk_filters[0]
+                            if len(chunk_filters) == 1
+                            else {"operator": "Or", "operands": chunk_filters},
+                        ],
+                    }
+                )
+                .with_limit(len(missing))
+                .do()
+            )
+
+            if "errors" in chunk_retrieval_results:
+                record_weaviate_error("graphql")
+
+            neighbors = (
+                (chunk_retrieval_results.get("data") or {})
+                .get("Get", {})
+                .get(CHUNK_CLASS_NAME)
+            ) or []
+            for neighbor in neighbors:
+                chunk_map.setdefault(int(neighbor["chunk_id"]), neighbor)
+
+    def pack_context(self, doc_name_map: dict, token_budget: int = None) -> str:
+        """Concatenate the chunks of every document in chunk order, documents in the order of their best chunk
+        @parameter doc_name_map : dict - Chunks by document name and chunk id
+        @parameter token_budget : int - Stop before the context exceeds this many tokens, unlimited if None
+        @returns str - Context for the completion
+        """
+        context = ""
+        if token_budget is not None:
+            from goldenverba.ingestion.chunking.manager import get_encoding
+
+            encoding = get_encoding()
+            tokens = 0
 
         for doc in doc_name_map:
             sorted_dict = {
@@ -160,6 +342,12 @@ class AdvancedVerbaQueryEngine(SimpleVerbaQueryEngine):
             }
             msg.info(f"{doc}: {len(sorted_dict)} chunks")
             for chunk in sorted_dict:
-                context += sorted_dict[chunk]["text"]
+                text = sorted_dict[chunk]["text"]
+                if token_budget is not None:
+                    tokens += len(encoding.encode(text, disallowed_special=()))
+                    if tokens > token_budget:
+                        msg.info(f"Context truncated to the token budget of {token_budget}")
+                        return context
+                context += text
 
         return context
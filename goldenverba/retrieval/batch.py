@@ -0,0 +1,135 @@
+import asyncio
+import json
+import math
+import os
+import re
+
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import AsyncContextManager, AsyncIterator, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from goldenverba.query_log import normalize_query
+
+QUERY_BATCH_CONCURRENCY = int(os.getenv("VERBA_QUERY_BATCH_CONCURRENCY", 8))
+QUERY_BATCH_MAX_QUESTIONS = int(os.getenv("VERBA_QUERY_BATCH_MAX_QUESTIONS", 2000))
+# Word level similarity above which two questions are answered once, 1 only merges identical normalized questions
+QUERY_BATCH_DEDUP_THRESHOLD = float(os.getenv("VERBA_QUERY_BATCH_DEDUP_THRESHOLD", 0.9))
+
+_word = re.compile(r"\w+")
+
+
+def _prefix(words: list[str], frequency: Counter, threshold: float) -> list[tuple[str, int]]:
+    """Rarest words of a question, a question at least threshold similar to it shares one of them
+    A ratio of threshold needs about len(words) * threshold / (2 - threshold) words in common whatever the
+    other length, so both sides keep all but that many words of the batch-wide order, rarest first, and overlap
+    """
+    # Repeated words count once per occurrence, as in the matching blocks
+    seen = Counter()
+    tokens = []
+    for word in words:
+        tokens.append((word, seen[word]))
+        seen[word] += 1
+    if not tokens:
+        return [("", 0)]
+    common = math.ceil(len(tokens) * threshold / (2 - threshold) - 1e-9)
+    tokens.sort(key=lambda token: (frequency[token[0]], token))
+    return tokens[: max(len(tokens) - common + 1, 1)]
+
+
+def group_questions(questions: list[str], threshold: float = QUERY_BATCH_DEDUP_THRESHOLD) -> list[list[int]]:
+    """Group identical and near-identical questions so that each group is answered once
+    Near-identical is judged on the word sequence, so "enable SSO" and "disable SSO" stay apart
+    while a dropped article or a typo in a long question does not. Only the groups sharing one of a
+    question's rarest words are compared with it
+    @parameter questions : list[str] - Questions of the batch
+    @parameter threshold : float - Minimum similarity ratio of the word sequences
+    @returns list[list[int]] - Indices of the questions of each group, the first one is the one answered
+    """
+    groups: list[list[int]] = []
+    by_key: dict[str, list[int]] = {}
+    representatives: list[tuple[list[str], list[int]]] = []
+    # Representatives by the words of their prefix
+    by_word: dict[tuple[str, int], list[int]] = {}
+
+    keys = [normalize_query(question) for question in questions]
+    frequency = Counter(word for key in set(keys) for word in set(_word.findall(key)))
+
+    for index, key in enumerate(keys):
+        if key in by_key:
+            by_key[key].append(index)
+            continue
+
+        words = _word.findall(key)
+        group = None
+        prefix = []
+        if threshold < 1:
+            prefix = _prefix(words, frequency, threshold) if threshold > 0 else [None]
+            candidates = sorted({position for token in prefix for position in by_word.get(token, [])})
+            matcher = SequenceMatcher(b=words, autojunk=False)
+            for position in candidates:
+                other_words, other_group = representatives[position]
+                matcher.set_seq1(other_words)
+                if (
+                    matcher.real_quick_ratio() >= threshold
+                    and matcher.quick_ratio() >= threshold
+                    and matcher.ratio() >= threshold
+                ):
+                    group = other_group
+                    break
+        if group is None:
+            group = []
+            groups.append(group)
+            for token in prefix:
+                by_word.setdefault(token, []).append(len(representatives))
+            representatives.append((words, group))
+        group.append(index)
+        by_key[key] = group
+    return groups
+
+
+async def answer_batch(
+    questions: list[str],
+    answer: Callable[[str], dict],
+    concurrency: int = QUERY_BATCH_CONCURRENCY,
+    threshold: float = QUERY_BATCH_DEDUP_THRESHOLD,
+    admit: Callable[[], AsyncContextManager] = None,
+) -> AsyncIterator[str]:
+    """Answer the groups of a batch in the thread pool, at most concurrency at a time, and yield one
+    JSON line per question as soon as its group is answered
+    @parameter questions : list[str] - Questions of the batch
+    @parameter answer : Callable[[str], dict] - Blocking function answering one question
+    @parameter concurrency : int - Questions answered at the same time
+    @parameter threshold : float - Deduplication threshold of group_questions
+    @parameter admit : Callable[[], AsyncContextManager] - Admission slot held while a question is answered, if any
+    """
+    # Grouping thousands of questions takes a while, keep it off the event loop
+    groups = await run_in_threadpool(group_questions, questions, threshold)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(group: list[int]) -> tuple[list[int], dict]:
+        async with semaphore:
+            try:
+                if admit is None:
+                    result = await run_in_threadpool(answer, questions[group[0]])
+                else:
+                    async with admit():
+                        result = await run_in_threadpool(answer, questions[group[0]])
+            except Exception as e:
+                result = {"system": f"Something went wrong! {str(e)}", "documents": [], "error": True}
+        return group, result
+
+    tasks = [asyncio.ensure_future(run(group)) for group in groups]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            group, result = await finished
+            for index in group:
+                line = {"index": index, "question": questions[index], **result}
+                if index != group[0]:
+                    line["deduplicated_from"] = group[0]
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # The client went away, do not spend completions on answers nobody reads
+        for task in tasks:
+            task.cancel()
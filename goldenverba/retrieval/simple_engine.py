@@ -1,4 +1,6 @@
 from goldenverba.retrieval.interface import VerbaQueryEngine
+from goldenverba.ratelimit import INTERACTIVE, estimate_tokens, get_openai_limiter
+from goldenverba.tracing import count_weaviate_call
 
 from typing import Optional
 import json
@@ -118,6 +120,7 @@ class SimpleVerbaQueryEngine(VerbaQueryEngine):
         #we need.
         cache_class_name = "Cache_text2vec_openai"
 
+        count_weaviate_call()
         query_results = (
             VerbaQueryEngine.client.query.get(
                 class_name=cache_class_name,
@@ -163,7 +166,12 @@ class SimpleVerbaQueryEngine(VerbaQueryEngine):
         #as a quick dirty fix we hardcode it to the value that
         #we need.
         cache_class_name = "Cache_text2vec_openai"
-        
+
+        # Weaviate embeds the cache entry with OpenAI
+        get_openai_limiter().acquire(
+            tokens=estimate_tokens(str(query) + system), priority=INTERACTIVE
+        )
+        count_weaviate_call()
         with VerbaQueryEngine.client.batch as batch:
             batch.batch_size = 1
             properties = {
@@ -0,0 +1,48 @@
+import threading
+
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+from goldenverba.metrics import QUERY_COALESCED
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function, callers arriving
+    while it runs wait for it and get the same result or exception. Nothing is cached once the call returns
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, function: Callable[[], object]) -> tuple[object, bool]:
+        """Run function once for all concurrent callers of key
+        @parameter key : Hashable - Identity of the call
+        @parameter function : Callable - Computation shared by the callers
+        @returns tuple[object, bool] - (result, True if the result was computed by another caller)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            QUERY_COALESCED.inc()
+            return future.result(), True
+
+        try:
+            result = function()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
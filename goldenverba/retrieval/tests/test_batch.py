@@ -0,0 +1,94 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+from goldenverba.retrieval.batch import answer_batch, group_questions
+
+
+def test_identical_and_near_identical_questions_are_grouped():
+    questions = [
+        "How are refunds settled?",
+        "how are  refunds settled",
+        "How do I enable SSO for my merchant account",
+        "How do I disable SSO for my merchant account",
+        "How are refunds settled for the merchants of the Benelux region on weekends",
+        "How are the refunds settled for the merchants of the Benelux region on weekends?",
+    ]
+    assert group_questions(questions, threshold=0.9) == [[0, 1], [2], [3], [4, 5]]
+    assert group_questions(questions, threshold=1) == [[0, 1], [2], [3], [4], [5]]
+
+
+def test_batch_answers_each_group_once_with_bounded_concurrency():
+    calls, running, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def answer(question):
+        with lock:
+            calls.append(question)
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return {"system": question.upper(), "documents": []}
+
+    async def collect():
+        questions = [f"question {i}" for i in range(6)] + ["Question 0?"]
+        return [json.loads(line) async for line in answer_batch(questions, answer, concurrency=2)]
+
+    lines = asyncio.run(collect())
+    assert len(calls) == 6 and peak[0] == 2
+    assert sorted(line["index"] for line in lines) == list(range(7))
+    duplicate = next(line for line in lines if line["index"] == 6)
+    assert duplicate["deduplicated_from"] == 0 and duplicate["system"] == "QUESTION 0"
+
+
+def brute_force_groups(questions, threshold):
+    """group_questions comparing every question with every group"""
+    from difflib import SequenceMatcher
+
+    from goldenverba.query_log import normalize_query
+
+    groups, by_key, representatives = [], {}, []
+    for index, question in enumerate(questions):
+        key = normalize_query(question)
+        if key not in by_key:
+            words = key.split()
+            by_key[key] = next(
+                (
+                    group
+                    for other_words, group in representatives
+                    if SequenceMatcher(a=other_words, b=words, autojunk=False).ratio() >= threshold
+                ),
+                None,
+            )
+            if by_key[key] is None:
+                by_key[key] = []
+                groups.append(by_key[key])
+                representatives.append((words, by_key[key]))
+        by_key[key].append(index)
+    return groups
+
+
+def test_candidate_prefilter_finds_the_same_groups():
+    rng = random.Random(3)
+    vocabulary = ["how", "do", "i", "the", "refund", "sso", "merchant", "settle", "account", "payout", "a", "fee"]
+    questions = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 12))) for _ in range(200)]
+    # Near copies with a word dropped or replaced
+    for question in list(questions[:100]):
+        words = question.split()
+        words[rng.randrange(len(words))] = rng.choice(vocabulary + [""])
+        questions.append(" ".join(words))
+
+    for threshold in (0.5, 0.8, 0.9):
+        assert group_questions(questions, threshold) == brute_force_groups(questions, threshold)
+
+
+def test_grouping_many_distinct_questions_is_fast():
+    questions = [f"How do I configure setting {i} of merchant {i * 7} in region {i % 13}" for i in range(2000)]
+    start = time.perf_counter()
+    groups = group_questions(questions, 0.9)
+    assert time.perf_counter() - start < 2
+    assert len(groups) == 2000
@@ -0,0 +1,47 @@
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.schema import schema_generation
+from goldenverba.retrieval.advanced_engine import AdvancedVerbaQueryEngine
+
+
+def make_engine():
+    client = FakeWeaviateClient(latency_ms=0)
+    schema_generation.init_documents(client, "text2vec-openai")
+    documents = {
+        "guide.md": ("Guide", [f"Guide part {i}. " for i in range(6)]),
+        "refunds.md": ("FAQ", ["Refunds reuse the transaction reference. ", "Refunds take two days. "]),
+    }
+    with client.batch as batch:
+        for doc_name, (doc_type, texts) in documents.items():
+            for i, text in enumerate(texts):
+                batch.add_data_object(
+                    {"text": text, "doc_name": doc_name, "doc_type": doc_type, "doc_uuid": doc_name, "chunk_id": i},
+                    "Chunk_text2vec_openai",
+                    tenant=schema_generation.TENANT,
+                )
+    return AdvancedVerbaQueryEngine(client), client
+
+
+def test_window_expansion_takes_one_query_per_document():
+    engine, client = make_engine()
+    before = client.calls().get("query", 0)
+
+    results, context = engine.retrieve("guide part 3", limit=1, window=2)
+
+    assert [result["chunk_id"] for result in results] == [3]
+    assert client.calls()["query"] - before == 2
+    assert context == "".join(f"Guide part {i}. " for i in range(1, 6))
+
+
+def test_doc_type_filter_and_token_budget(monkeypatch):
+    engine, _ = make_engine()
+
+    results = engine.search_chunks("refunds transaction reference", limit=5, doc_type="FAQ")
+    assert {result["doc_name"] for result in results} == {"refunds.md"}
+
+    class WordEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    monkeypatch.setattr("goldenverba.ingestion.chunking.manager.get_encoding", lambda: WordEncoding())
+    _, context = engine.retrieve("guide part 3", limit=1, window=2, token_budget=7)
+    assert context == "Guide part 1. Guide part 2. "
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from goldenverba.metrics import QUERY_COALESCED
+from goldenverba.retrieval.singleflight import SingleFlight
+
+
+def run_concurrently(flight, key, function, callers=5):
+    outcomes = []
+    barrier = threading.Barrier(callers)
+
+    def call():
+        barrier.wait()
+        try:
+            outcomes.append(flight.do(key, function))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    saved_before = QUERY_COALESCED.value()
+
+    def answer():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    outcomes = run_concurrently(flight, ("tenant", "how are refunds settled", "gpt-4"), answer)
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+    assert {result for result, _ in outcomes} == {"answer"}
+    assert QUERY_COALESCED.value() - saved_before == 4
+    assert flight.in_flight() == 0
+
+    # Nothing is cached once the call returned
+    assert flight.do(("tenant", "how are refunds settled", "gpt-4"), lambda: "again") == ("again", False)
+
+
+def test_followers_get_the_exception_of_the_leader():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("rate limited")
+
+    outcomes = run_concurrently(flight, "key", fail, callers=3)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    with pytest.raises(KeyError):
+        flight.do("other", lambda: {}["missing"])
+    assert flight.in_flight() == 0
@@ -0,0 +1,232 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import math
+import os
+import tempfile
+import threading
+import time
+
+from collections import Counter
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from goldenverba.metrics import ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+from goldenverba.ratelimit import fcntl, locked_json_file
+
+# Lower runs first: chat users are waiting on their answer, batches and uploads are not
+PRIORITIES = {"query": 0, "batch": 1, "ingest": 2}
+
+# Limits count the requests of every Verba process of the host, see SharedSlots
+GLOBAL_LIMIT = int(os.getenv("VERBA_ADMISSION_GLOBAL_LIMIT", 16))
+KIND_LIMITS = {
+    "query": int(os.getenv("VERBA_ADMISSION_QUERY_LIMIT", GLOBAL_LIMIT)),
+    "batch": int(os.getenv("VERBA_ADMISSION_BATCH_LIMIT", 4)),
+    "ingest": int(os.getenv("VERBA_ADMISSION_INGEST_LIMIT", 2)),
+}
+QUEUE_SIZE = int(os.getenv("VERBA_ADMISSION_QUEUE_SIZE", 32))
+MAX_WAIT_SECONDS = float(os.getenv("VERBA_ADMISSION_MAX_WAIT_S", 30))
+STATE_PATH = os.getenv(
+    "VERBA_ADMISSION_STATE",
+    os.path.join(tempfile.gettempdir(), "verba-admission.json"),
+)
+# Seconds between checks for slots freed by other processes while requests wait
+_POLL_INTERVAL = 0.05
+
+
+class Rejected(Exception):
+    """The wait queue is full or the request waited too long, retry after retry_after seconds"""
+
+    def __init__(self, kind: str, reason: str, retry_after: int):
+        super().__init__(f"Verba is busy ({kind} {reason}), retry in {retry_after} seconds")
+        self.kind = kind
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedSlots:
+    """
+    Requests in progress in every Verba process of the host, kept in a small JSON file that the processes
+    update under an exclusive flock, like the OpenAI limiter state. Slots of processes that died are dropped
+    when the file is read. Without fcntl (Windows) the slots only cover the process
+    """
+
+    def __init__(self, path: str, global_limit: int, kind_limits: dict):
+        self.path = path
+        self.global_limit = global_limit
+        self.kind_limits = kind_limits
+        self._lock = threading.Lock()
+        self._memory_state = {}
+        self._sequence = itertools.count()
+
+    @contextlib.contextmanager
+    def _slots(self):
+        with self._lock:
+            if fcntl is None:
+                yield self._memory_state.setdefault("slots", {})
+                return
+            with locked_json_file(self.path) as state:
+                slots = state.setdefault("slots", {})
+                for slot in [slot for slot, (pid, _) in slots.items() if not _alive(pid)]:
+                    del slots[slot]
+                yield slots
+
+    def take(self, kinds: list[str]) -> list[Optional[str]]:
+        """Take a slot for each request that fits, in order
+        @parameter kinds : list[str] - Kind of each request
+        @returns list[Optional[str]] - Slot of each request, None if it does not fit
+        """
+        taken = []
+        with self._slots() as slots:
+            active = Counter(kind for _, kind in slots.values())
+            for kind in kinds:
+                if len(slots) < self.global_limit and active[kind] < self.kind_limits.get(kind, self.global_limit):
+                    slot = f"{os.getpid()}:{next(self._sequence)}"
+                    slots[slot] = (os.getpid(), kind)
+                    active[kind] += 1
+                    taken.append(slot)
+                else:
+                    taken.append(None)
+        return taken
+
+    def release(self, slot: str) -> None:
+        with self._slots() as slots:
+            slots.pop(slot, None)
+
+
+class AdmissionController:
+    """
+    Limits the requests processed at the same time on the host, globally and per kind of request.
+    The counts are shared by every Verba process of the host through SharedSlots, so the limits hold
+    across the workers of `verba start --workers` instead of multiplying with them.
+    Requests over the limits wait in a bounded queue of the process and are let in by priority then arrival,
+    so queued queries overtake queued uploads. A full queue is rejected at once instead of piling up
+    requests that will time out anyway. Lives on the event loop, it is not thread-safe
+    """
+
+    def __init__(
+        self,
+        global_limit: int = GLOBAL_LIMIT,
+        kind_limits: dict = None,
+        queue_size: int = QUEUE_SIZE,
+        max_wait: float = MAX_WAIT_SECONDS,
+        path: str = STATE_PATH,
+    ):
+        self.global_limit = global_limit
+        self.kind_limits = dict(KIND_LIMITS if kind_limits is None else kind_limits)
+        self.slots = SharedSlots(path, global_limit, self.kind_limits)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        # Requests of this process
+        self.active = 0
+        self.queued = Counter()
+        # Moving average of the processing seconds of each kind, to estimate Retry-After
+        self.durations = {kind: 1.0 for kind in PRIORITIES}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._poller = None
+
+    def _release(self, slot: str) -> None:
+        self.active -= 1
+        self.slots.release(slot)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Let in the waiters that fit, best priority first. A waiter that does not fit (its kind is at its
+        limit) does not block the ones behind it"""
+        entries = [entry for entry in sorted(self._waiters) if not entry[3].done()]
+        self._waiters = []
+        if not entries:
+            return
+        for entry, slot in zip(entries, self.slots.take([kind for _, _, kind, _ in entries])):
+            if slot is None:
+                heapq.heappush(self._waiters, entry)
+            else:
+                self.active += 1
+                entry[3].set_result(slot)
+
+    async def _poll(self) -> None:
+        """Slots freed by other processes wake nobody here, check for them while requests wait"""
+        try:
+            while self._waiters:
+                await asyncio.sleep(_POLL_INTERVAL)
+                self._wake()
+        finally:
+            self._poller = None
+
+    def retry_after(self, kind: str) -> int:
+        limit = max(min(self.kind_limits.get(kind, self.global_limit), self.global_limit), 1)
+        return max(1, math.ceil(self.durations[kind] * (self.queued[kind] + 1) / limit))
+
+    def _reject(self, kind: str, reason: str) -> Rejected:
+        ADMISSION_REJECTED.inc(kind=kind, reason=reason)
+        return Rejected(kind, reason, self.retry_after(kind))
+
+    @contextlib.asynccontextmanager
+    async def admit(self, kind: str, wait: Optional[float] = -1):
+        """Hold a slot while the block runs
+        @parameter kind : str - query, batch or ingest
+        @parameter wait : Optional[float] - Seconds to wait in the queue, -1 for the default, None to wait
+                          without limit and without counting against the queue size (questions of a batch)
+        @raises Rejected - The queue is full or the wait timed out
+        """
+        priority = PRIORITIES[kind]
+        max_wait = self.max_wait if wait == -1 else wait
+        start = time.perf_counter()
+
+        # Waiters are let in as soon as they fit, so a request that fits now has nobody of this process it
+        # should queue behind
+        slot = None if self._waiters else self.slots.take([kind])[0]
+        if slot is not None:
+            self.active += 1
+        else:
+            if max_wait is not None and self.queued[kind] >= self.queue_size:
+                raise self._reject(kind, "queue_full")
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), kind, future))
+            self.queued[kind] += 1
+            ADMISSION_QUEUED.set(self.queued[kind], kind=kind)
+            if self._poller is None:
+                self._poller = asyncio.ensure_future(self._poll())
+            try:
+                slot = await asyncio.wait_for(future, timeout=max_wait)
+            except asyncio.TimeoutError:
+                raise self._reject(kind, "timeout")
+            except asyncio.CancelledError:
+                # The client went away right after being let in, give the slot back
+                if future.done() and not future.cancelled():
+                    self._release(future.result())
+                raise
+            finally:
+                self.queued[kind] -= 1
+                ADMISSION_QUEUED.set(self.queued[kind], kind=kind)
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, kind=kind)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[kind] = 0.8 * self.durations[kind] + 0.2 * (time.perf_counter() - start)
+            self._release(slot)
+
+
+def busy_response(error: Rejected, content: dict) -> JSONResponse:
+    """429 telling the client when to come back"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content=content,
+        headers={"Retry-After": str(error.retry_after)},
+    )
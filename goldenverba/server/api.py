@@ -1,26 +1,54 @@
 import os
 import base64
-import shelve
+import sys
+import threading
+import time
 
 from wasabi import msg  # type: ignore[import]
 
 import openai
-from fastapi import FastAPI, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 
 from pathlib import Path
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
-from goldenverba.retrieval.advanced_engine import AdvancedVerbaQueryEngine
+from goldenverba.retrieval.advanced_engine import (
+    AdvancedVerbaQueryEngine,
+    RETRIEVAL_LIMIT,
+)
 from goldenverba import verba_manager
+from goldenverba.metrics import REGISTRY, MetricsMiddleware
+from goldenverba.retrieval.batch import (
+    QUERY_BATCH_CONCURRENCY,
+    QUERY_BATCH_MAX_QUESTIONS,
+    answer_batch,
+)
+from goldenverba.ratelimit import INTERACTIVE, RateLimitTimeout, get_openai_limiter
+from goldenverba.tracing import QueryTrace, start_trace
+from goldenverba.memory import MemoryLimitExceeded, MemoryTracker
+from goldenverba.query_log import ingest_record, log_request, query_record
+from goldenverba.server.admission import AdmissionController, Rejected, busy_response
+from goldenverba.server.profiling import (
+    attach_profile,
+    check_admin,
+    list_profiles,
+    maybe_profile,
+    profile_path,
+    profile_summary,
+)
+from goldenverba.server.serving import is_draining, is_ready, warm_up_in_background
+from goldenverba.server.state import StateStore, legacy_api_key
 
 from goldenverba.ingestion.reader.interface import Reader
 from goldenverba.ingestion.chunking.interface import Chunker
 from goldenverba.ingestion.embedding.interface import Embedder
+from goldenverba.ingestion.pipeline import IngestIncomplete, PipelineSpec
 
 
 from dotenv import load_dotenv
@@ -32,91 +60,172 @@ readers = None
 chunckers = None
 verba_engine = None
 
-option_cache = {}
-
-def check_manager_initialized():
+# Everything a request changes lives in the state store, shared by all the workers and replicas of the tenant.
+# The globals above only hold what every process derives the same way from its environment
+state = StateStore()
+# Components selected when the tenant has no last used options yet
+default_options = {}
+# Stored key this process last applied, to follow keys set or unset through another replica
+synced_key = None
+# Held while the manager is replaced, requests keep using the previous one until the new one is complete
+manager_lock = threading.RLock()
+
+async def check_manager_initialized():
+    # A key changed through another replica reinitializes the manager, a blocking Weaviate connection
+    await run_in_threadpool(sync_api_key)
     if manager == None:
         raise HTTPException(503,"Verba not initialized. Please upload a key using /api/set_openai_key")
 
 def store_api_key(key):
-    weaviate_tenant = os.getenv('WEAVIATE_TENANT',default='default_tenant')
-    with shelve.open(f"shelve/key_cache_{weaviate_tenant}") as db:
-        db["api_key"] = key
+    global synced_key
+    state.set("api_key", key)
+    synced_key = key
 
 def remove_api_key():
     global manager
-    manager = None
+    global synced_key
+    with manager_lock:
+        manager = None
 
     os.environ.pop("OPENAI_API_KEY", None)
 
     weaviate_tenant = os.getenv("WEAVIATE_TENANT", default="default_tenant")
-    with shelve.open(f"shelve/key_cache_{weaviate_tenant}") as db:
-        if "api_key" in db:
-            del db["api_key"]
-        else:
-            msg.info(f"{weaviate_tenant} is not in the shelve database.")
+    if not state.delete("api_key"):
+        msg.info(f"{weaviate_tenant} has no stored OpenAI key.")
+    synced_key = None
+
+
+def stored_api_key():
+    """OpenAI key of the tenant in the state store, moved there from the local shelve of older versions"""
+    key = state.get("api_key")
+    if key is None:
+        key = legacy_api_key()
+        if key:
+            state.set("api_key", key)
+            msg.info("Moved the OpenAI key from the local shelve to the state store")
+    return key
 
 
 def check_api_key():
+    global synced_key
     if "OPENAI_API_KEY" in os.environ:
         return True
-    weaviate_tenant = os.getenv('WEAVIATE_TENANT',default='default_tenant')
-    with shelve.open(f"shelve/key_cache_{weaviate_tenant}") as db:
-        key = db.get("api_key",None)
+    key = stored_api_key()
     if key:
         os.environ["OPENAI_API_KEY"] = key
+        synced_key = key
         return True
     return False
 
 
+def sync_api_key():
+    """Apply a key set or unset through another replica, seen within the state cache TTL.
+    Blocking, call it from the thread pool in async handlers"""
+    global manager
+    global synced_key
+    if state.get("api_key") == synced_key:
+        return
+    with manager_lock:
+        # Another request may have applied it while this one waited for the lock
+        key = state.get("api_key")
+        if key == synced_key:
+            return
+        synced_key = key
+        if key:
+            msg.info("OpenAI key changed through another replica, reinitializing")
+            os.environ["OPENAI_API_KEY"] = key
+            init_manager()
+        elif manager is not None:
+            msg.info("OpenAI key unset through another replica")
+            manager = None
+            os.environ.pop("OPENAI_API_KEY", None)
+
+
+def last_options() -> dict:
+    """Import options the tenant used last, stored ones that this process does not have fall back to the defaults"""
+    options = dict(default_options)
+    stored = state.get("last_options", {})
+    for key, components in (
+        ("last_reader", readers),
+        ("last_chunker", chunker),
+        ("last_embedder", embedders),
+    ):
+        if stored.get(key) in (components or {}):
+            options[key] = stored[key]
+    if "last_document_type" in stored:
+        options["last_document_type"] = stored["last_document_type"]
+    return options
+
+
+def selected_embedder() -> str:
+    """Embedder of the tenant, the one its documents are listed, searched and deleted with"""
+    return last_options()["last_embedder"]
+
+
 def init_manager():
     global manager
     global readers
     global chunker
     global embedders
     global verba_engine
-    global option_cache
+    global default_options
+
+    with manager_lock:
+        if not check_api_key():
+            return
+
+        # Built aside and swapped in at the end, concurrent requests never see a half initialized manager
+        new_manager = verba_manager.VerbaManager()
+        options = {}
+
+        new_readers = new_manager.reader_get_readers()
+        for reader in new_readers:
+            available, message = new_manager.check_verba_component(new_readers[reader])
+            if available:
+                new_manager.reader_set_reader(reader)
+                options["last_reader"] = reader
+                options["last_document_type"] = "Documentation"
+                break
+
+        new_chunkers = new_manager.chunker_get_chunker()
+        for chunk in new_chunkers:
+            available, message = new_manager.check_verba_component(new_chunkers[chunk])
+            if available:
+                new_manager.chunker_set_chunker(chunk)
+                options["last_chunker"] = chunk
+                break
+
+        new_embedders = new_manager.embedder_get_embedder()
+        embedder_available = False
+        for embedder in new_embedders:
+            available, message = new_manager.check_verba_component(new_embedders[embedder])
+            if available:
+                new_manager.embedder_set_embedder(embedder)
+                options["last_embedder"] = embedder
+                embedder_available = True
+                break
+        if not embedder_available:
+            raise HTTPException(400,"No embedder available. If you use OpenAI, please check you have uploaded your key using /api/set_openai_key")
+
+        # Delete later
+        new_engine = AdvancedVerbaQueryEngine(new_manager.client)
+
+        readers, chunker, embedders = new_readers, new_chunkers, new_embedders
+        default_options = options
+        verba_engine = new_engine
+        manager = new_manager
 
-    if not check_api_key():
-        return
 
-    manager = verba_manager.VerbaManager()
-
-    readers = manager.reader_get_readers()
-    for reader in readers:
-        available, message = manager.check_verba_component(readers[reader])
-        if available:
-            manager.reader_set_reader(reader)
-            option_cache["last_reader"] = reader
-            option_cache["last_document_type"] = "Documentation"
-            break
-
-    chunker = manager.chunker_get_chunker()
-    for chunk in chunker:
-        available, message = manager.check_verba_component(chunker[chunk])
-        if available:
-            manager.chunker_set_chunker(chunk)
-            option_cache["last_chunker"] = chunk
-            break
-
-
-    embedders = manager.embedder_get_embedder()
-    embedder_available = False
-    for embedder in embedders:
-        available, message = manager.check_verba_component(embedders[embedder])
-        if available:
-            manager.embedder_set_embedder(embedder)
-            option_cache["last_embedder"] = embedder
-            embedder_available = True
-            break
-    if not embedder_available:
-        raise HTTPException(400,"No embedder available. If you use OpenAI, please check you have uploaded your key using /api/set_openai_key")
-    
-    # Delete later
-    verba_engine = AdvancedVerbaQueryEngine(manager.client)
+init_manager()
 
 
-init_manager()
+def reconnect():
+    """New Weaviate connection in a worker forked after init_manager, the loaded components are kept"""
+    global verba_engine
+    if manager is None:
+        return
+    manager.reconnect()
+    verba_engine = AdvancedVerbaQueryEngine(manager.client)
 
 
 def create_reader_payload(key: str, reader: Reader) -> dict:
@@ -131,15 +240,22 @@ def create_reader_payload(key: str, reader: Reader) -> dict:
     }
 
 
+def chunk_settings_key(chunker: str) -> str:
+    # One key per chunker, replicas saving different chunkers do not overwrite each other
+    return f"chunk_settings:{chunker}"
+
+
 def create_chunker_payload(key: str, chunker: Chunker) -> dict:
     available, message = manager.check_verba_component(chunker)
+    # Units and overlap the tenant last imported with, the chunker defaults otherwise
+    settings = state.get(chunk_settings_key(key), {})
 
     return {
         "name": key,
         "description": chunker.description,
         "input_form": chunker.input_form,
-        "units": chunker.default_units,
-        "overlap": chunker.default_overlap,
+        "units": settings.get("units", chunker.default_units),
+        "overlap": settings.get("overlap", chunker.default_overlap),
         "available": available,
         "message": message,
     }
@@ -180,6 +296,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Track in-flight requests and latency of the /api routes
+app.add_middleware(MetricsMiddleware)
+
+
+# Workers of `verba start --workers` are warmed up before they accept, this covers the single-process server
+@app.on_event("startup")
+async def start_warm_up():
+    if not is_ready():
+        warm_up_in_background(sys.modules[__name__])
+
+# Concurrency limits of the query and ingestion endpoints, see goldenverba/server/admission.py
+admission = AdmissionController()
+
 BASE_DIR = Path(__file__).resolve().parent
 
 # Serve the assets (JS, CSS, images, etc.)
@@ -195,6 +324,21 @@ app.mount("/static", StaticFiles(directory=BASE_DIR / "frontend/out"), name="app
 
 class QueryPayload(BaseModel):
     query: str
+    include_timings: Optional[bool] = False
+
+class QueryBatchPayload(BaseModel):
+    questions: list[str]
+    concurrency: Optional[int] = None
+    include_timings: Optional[bool] = False
+
+class RetrievePayload(BaseModel):
+    query: str
+    k: int = Field(RETRIEVAL_LIMIT, ge=1, le=100)
+    alpha: Optional[float] = Field(None, ge=0.0, le=1.0)
+    doc_type: Optional[str] = None
+    # Neighbor chunks added on each side, 0 returns the chunks without context
+    window: int = Field(0, ge=0, le=10)
+    token_budget: Optional[int] = Field(None, ge=1)
 
 class APIKeyPayload(BaseModel):
     key: str
@@ -206,6 +350,9 @@ class SearchQueryPayload(BaseModel):
 
 class GetDocumentPayload(BaseModel):
     document_id: str
+    # Chunk range of the text of documents stored without it, the whole document by default
+    chunk_start: int = 0
+    chunk_limit: Optional[int] = None
 
 
 class LoadPayload(BaseModel):
@@ -238,7 +385,7 @@ async def serve_frontend():
 # Define health check endpoint
 @app.get("/api/health")
 async def root():
-    check_manager_initialized()
+    await check_manager_initialized()
     try:
         if verba_engine.get_client().is_ready():
             return JSONResponse(
@@ -263,6 +410,17 @@ async def root():
         )
 
 
+# Readiness for the load balancer: 503 until the process is warmed up and while it drains
+@app.get("/api/ready")
+async def ready():
+    if is_ready():
+        return JSONResponse(content={"ready": True})
+    return JSONResponse(
+        content={"ready": False, "draining": is_draining()},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
 # Define health check endpoint
 @app.get("/api/get_google_tag")
 async def get_google_tag():
@@ -281,9 +439,11 @@ async def get_google_tag():
 # Get Readers, Chunkers, and Embedders
 @app.get("/api/get_components")
 async def get_components():
+    await check_manager_initialized()
     msg.info("Retrieving components")
 
     data = {"readers": [], "chunker": [], "embedder": []}
+    options = last_options()
 
     for key in readers:
         current_reader = readers[key]
@@ -302,15 +462,15 @@ async def get_components():
 
     data["default_values"] = {
         "last_reader": create_reader_payload(
-            option_cache["last_reader"], readers[option_cache["last_reader"]]
+            options["last_reader"], readers[options["last_reader"]]
         ),
         "last_chunker": create_chunker_payload(
-            option_cache["last_chunker"], chunker[option_cache["last_chunker"]]
+            options["last_chunker"], chunker[options["last_chunker"]]
         ),
         "last_embedder": create_embedder_payload(
-            option_cache["last_embedder"], embedders[option_cache["last_embedder"]]
+            options["last_embedder"], embedders[options["last_embedder"]]
         ),
-        "last_document_type": option_cache["last_document_type"],
+        "last_document_type": options["last_document_type"],
     }
 
     return JSONResponse(content=data)
@@ -318,14 +478,15 @@ async def get_components():
 
 @app.post("/api/get_component")
 async def get_component(payload: GetComponentPayload):
+    await check_manager_initialized()
     msg.info(f"Retrieving {payload.component} components")
 
     data = {"components": []}
 
     if payload.component == "embedders":
+        embedder = selected_embedder()
         data["selected_component"] = create_embedder_payload(
-            manager.embedder_manager.selected_embedder.name,
-            manager.embedder_manager.selected_embedder,
+            embedder, embedders[embedder]
         )
 
         for key in embedders:
@@ -338,11 +499,16 @@ async def get_component(payload: GetComponentPayload):
 
 @app.post("/api/set_component")
 async def set_component(payload: SetComponentPayload):
+    await check_manager_initialized()
     msg.info(f"Setting {payload.component} to {payload.selected_component}")
 
     if payload.component == "embedders":
-        manager.embedder_manager.set_embedder(payload.selected_component)
-        option_cache["last_embedder"] = payload.selected_component
+        if payload.selected_component not in embedders:
+            msg.warn(f"Embedder {payload.selected_component} not found")
+        else:
+            options = state.get("last_options", {})
+            options["last_embedder"] = payload.selected_component
+            state.set("last_options", options)
 
     return JSONResponse(content={})
 
@@ -350,6 +516,7 @@ async def set_component(payload: SetComponentPayload):
 # Get Status meta data
 @app.get("/api/get_status")
 async def get_status():
+    await check_manager_initialized()
     msg.info("Retrieving status")
 
     data = {
@@ -365,6 +532,7 @@ async def get_status():
 # Reset Verba
 @app.get("/api/reset")
 async def reset_verba():
+    await check_manager_initialized()
     msg.info("Resetting verba")
 
     manager.reset()
@@ -372,41 +540,88 @@ async def reset_verba():
     return JSONResponse(status_code=200, content={})
 
 
+# Prometheus scrape endpoint, per-stage latencies, cache hit ratios and error counts of this tenant
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # Receive query and return chunks and query answer
 @app.post("/api/load_data")
-async def load_data(payload: LoadPayload):
-    check_manager_initialized()
-    manager.reader_set_reader(payload.reader)
-    manager.chunker_set_chunker(payload.chunker)
-    manager.embedder_set_embedder(payload.embedder)
+async def load_data(payload: LoadPayload, request: Request):
+    await check_manager_initialized()
 
-    global option_cache
+    # Off the event loop so that a large upload does not stall the queries
+    def profiled_import():
+        with maybe_profile(request) as profile:
+            return import_payload(payload), profile
 
-    option_cache["last_reader"] = payload.reader
-    option_cache["last_document_type"] = payload.document_type
-    option_cache["last_chunker"] = payload.chunker
-    option_cache["last_embedder"] = payload.embedder
+    try:
+        async with admission.admit("ingest"):
+            response, profile = await run_in_threadpool(profiled_import)
+    except Rejected as e:
+        msg.warn(str(e))
+        return busy_response(e, {"status": "429", "status_msg": str(e)})
+    return attach_profile(response, profile)
+
+
+def remember_options(payload: LoadPayload) -> None:
+    """Remember valid options for the next upload of the tenant, through any replica"""
+    state.set_many(
+        {
+            "last_options": {
+                "last_reader": payload.reader,
+                "last_document_type": payload.document_type,
+                "last_chunker": payload.chunker,
+                "last_embedder": payload.embedder,
+            },
+            chunk_settings_key(payload.chunker): {"units": payload.chunkUnits, "overlap": payload.chunkOverlap},
+        }
+    )
 
-    # Set new default values based on user input
-    current_chunker = manager.chunker_get_chunker()[payload.chunker]
-    current_chunker.default_units = payload.chunkUnits
-    current_chunker.default_overlap = payload.chunkOverlap
+
+def import_payload(payload: LoadPayload) -> JSONResponse:
+    # The import runs with a PipelineSpec of its own, so concurrent imports do not interfere
+    try:
+        spec = PipelineSpec(
+            reader=payload.reader,
+            chunker=payload.chunker,
+            embedder=payload.embedder,
+            units=payload.chunkUnits,
+            overlap=payload.chunkOverlap,
+            document_type=payload.document_type,
+        )
+    except ValueError as e:
+        msg.fail(f"Loading data failed {str(e)}")
+        return JSONResponse(
+            content={
+                "status": "400",
+                "status_msg": str(e),
+            }
+        )
+
+    remember_options(payload)
 
     msg.info(
         f"Received Data to Import: READER({payload.reader}, Documents {len(payload.fileBytes)}, Type {payload.document_type}) CHUNKER ({payload.chunker}, UNITS {payload.chunkUnits}, OVERLAP {payload.chunkOverlap}), EMBEDDER ({payload.embedder})"
     )
 
     if payload.fileBytes or payload.filePath:
+        start = time.perf_counter()
+        memory = None
+        document_count, chunks_count, import_status = 0, 0, "200"
         try:
-            documents = manager.import_data(
-                payload.fileBytes,
-                [],
-                [payload.filePath],
-                payload.fileNames,
-                payload.document_type,
-                payload.chunkUnits,
-                payload.chunkOverlap,
-            )
+            with MemoryTracker() as memory:
+                documents = manager.ingest(
+                    spec,
+                    payload.fileBytes,
+                    [],
+                    [payload.filePath],
+                    payload.fileNames,
+                )
+            msg.info(f"Import peak memory {memory.to_dict()['peak_mb']} MB")
 
             if documents == None:
                 return JSONResponse(
@@ -423,16 +638,60 @@ async def load_data(payload: LoadPayload):
                 content={
                     "status": 200,
                     "status_msg": f"Succesfully imported {document_count} documents and {chunks_count} chunks",
+                    "memory": memory.to_dict(),
+                }
+            )
+        except IngestIncomplete as e:
+            msg.fail(f"Loading data failed {str(e)}")
+            import_status = "400"
+            document_count = len(e.imported_documents)
+            chunks_count = sum([len(document.chunks) for document in e.imported_documents])
+            return JSONResponse(
+                content={
+                    "status": "400",
+                    "status_msg": str(e),
+                    "imported_documents": [document.name for document in e.imported_documents],
                 }
             )
+        except MemoryLimitExceeded as e:
+            msg.warn(f"Rejected upload: {str(e)}")
+            import_status = "413"
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={
+                    "status": "413",
+                    "status_msg": str(e),
+                },
+            )
         except Exception as e:
             msg.fail(f"Loading data failed {str(e)}")
+            import_status = "400"
             return JSONResponse(
                 content={
                     "status": "400",
                     "status_msg": str(e),
                 }
             )
+        finally:
+            log_request(
+                ingest_record(
+                    settings={
+                        "reader": payload.reader,
+                        "chunker": payload.chunker,
+                        "embedder": payload.embedder,
+                        "document_type": payload.document_type,
+                        "units": payload.chunkUnits,
+                        "overlap": payload.chunkOverlap,
+                        "file_path": payload.filePath,
+                    },
+                    file_sizes=[len(byte) * 3 // 4 for byte in payload.fileBytes],
+                    documents=document_count,
+                    chunks=chunks_count,
+                    seconds=time.perf_counter() - start,
+                    status=import_status,
+                    memory=memory.to_dict() if memory is not None else None,
+                )
+            )
     return JSONResponse(
         content={
             "status": "200",
@@ -443,34 +702,167 @@ async def load_data(payload: LoadPayload):
 
 # Receive query and return chunks and query answer
 @app.post("/api/query")
-async def query(payload: QueryPayload):
-    check_manager_initialized()
+async def query(payload: QueryPayload, request: Request):
+    await check_manager_initialized()
+
+    # Off the event loop so that concurrent identical questions can share one answer
+    def profiled_answer():
+        with maybe_profile(request) as profile:
+            return answer_question(payload.query) + (profile,)
+
     try:
-        system_msg, results = verba_engine.query(
-            payload.query, os.environ["VERBA_MODEL"]
-        )
-        msg.good(f"Succesfully processed query: {payload.query}")
+        async with admission.admit("query"):
+            content, trace, profile = await run_in_threadpool(profiled_answer)
+    except Rejected as e:
+        msg.warn(str(e))
+        return busy_response(e, {"system": str(e), "documents": []})
+
+    if payload.include_timings:
+        content["timings"] = trace.to_dict()
+    response = JSONResponse(
+        content=content, headers={"Server-Timing": trace.server_timing()}
+    )
+    return attach_profile(response, profile)
 
-        return JSONResponse(
-            content={
-                "system": system_msg,
-                "documents": results,
-            }
-        )
+
+def answer_question(question: str) -> tuple[dict, QueryTrace]:
+    """Answer one question with the engine and log it
+    @parameter question : str - Question of the user
+    @returns tuple[dict, QueryTrace] - (system message and documents, latency breakdown)
+    """
+    trace = start_trace()
+    try:
+        system_msg, results = verba_engine.query(question, os.environ["VERBA_MODEL"])
+        msg.good(f"Succesfully processed query: {question}")
+
+        content = {
+            "system": system_msg,
+            "documents": results,
+        }
+        query_status = "ok"
     except Exception as e:
         msg.fail(f"Query failed")
         print(e)
-        return JSONResponse(
-            content={
-                "system": f"Something went wrong! {str(e)}",
-                "documents": [],
-            }
+        content = {
+            "system": f"Something went wrong! {str(e)}",
+            "documents": [],
+        }
+        query_status = "error"
+
+    log_request(query_record(question, content["documents"], trace, query_status))
+    return content, trace
+
+
+# Answer a list of questions, streamed back as one JSON line per question in completion order
+@app.post("/api/query_batch")
+async def query_batch(payload: QueryBatchPayload):
+    await check_manager_initialized()
+    if not payload.questions or len(payload.questions) > QUERY_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            f"A batch takes between 1 and {QUERY_BATCH_MAX_QUESTIONS} questions",
         )
+    concurrency = min(payload.concurrency or QUERY_BATCH_CONCURRENCY, QUERY_BATCH_CONCURRENCY)
+
+    def answer(question: str) -> dict:
+        content, trace = answer_question(question)
+        if payload.include_timings:
+            content["timings"] = trace.to_dict()
+        return content
+
+    msg.info(f"Received a batch of {len(payload.questions)} questions, concurrency {concurrency}")
+    return StreamingResponse(
+        answer_batch(
+            payload.questions,
+            answer,
+            max(concurrency, 1),
+            admit=lambda: admission.admit("batch", wait=None),
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+# Ranked chunks of a query without the semantic cache nor the completion
+@app.post("/api/retrieve")
+async def retrieve(payload: RetrievePayload):
+    await check_manager_initialized()
+    try:
+        async with admission.admit("query"):
+            return await run_in_threadpool(retrieve_chunks, payload)
+    except Rejected as e:
+        msg.warn(str(e))
+        return busy_response(e, {"detail": str(e)})
+
+
+def retrieve_chunks(payload: RetrievePayload) -> JSONResponse:
+    trace = start_trace()
+    try:
+        if payload.window or payload.token_budget:
+            results, context = verba_engine.retrieve(
+                payload.query,
+                limit=payload.k,
+                window=payload.window,
+                alpha=payload.alpha,
+                doc_type=payload.doc_type,
+                token_budget=payload.token_budget,
+            )
+        else:
+            results = verba_engine.search_chunks(
+                payload.query,
+                limit=payload.k,
+                alpha=payload.alpha,
+                doc_type=payload.doc_type,
+            )
+            context = None
+    except Exception as e:
+        msg.fail(f"Retrieval failed {str(e)}")
+        log_request(query_record(payload.query, [], trace, "error", kind="retrieve"))
+        raise HTTPException(status.HTTP_502_BAD_GATEWAY, f"Retrieval failed: {str(e)}")
+
+    log_request(query_record(payload.query, results, trace, "ok", kind="retrieve"))
+    content = {
+        "chunks": [
+            {
+                "doc_name": result["doc_name"],
+                "doc_type": result["doc_type"],
+                "doc_uuid": result["doc_uuid"],
+                "chunk_id": result["chunk_id"],
+                "text": result["text"],
+                "score": (result.get("_additional") or {}).get("score"),
+            }
+            for result in results
+        ],
+        "context": context,
+        "timings": trace.to_dict(),
+    }
+    return JSONResponse(
+        content=content, headers={"Server-Timing": trace.server_timing()}
+    )
+
+
+# Profiles of requests sent with the X-Verba-Profile header, admin only
+@app.get("/api/profiles")
+async def get_profiles(request: Request):
+    check_admin(request)
+    return JSONResponse(content={"profiles": list_profiles()})
+
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "pstats"):
+    check_admin(request)
+    if format == "text":
+        return PlainTextResponse(profile_summary(profile_id))
+    return FileResponse(
+        profile_path(profile_id),
+        media_type="application/octet-stream",
+        filename=f"{profile_id}.prof",
+    )
 
 
 # Retrieve auto complete suggestions based on user input
 @app.post("/api/suggestions")
 async def suggestions(payload: QueryPayload):
+    await check_manager_initialized()
     try:
         suggestions = verba_engine.get_suggestions(payload.query)
 
@@ -490,10 +882,16 @@ async def suggestions(payload: QueryPayload):
 # Retrieve specific document based on UUID
 @app.post("/api/get_document")
 async def get_document(payload: GetDocumentPayload):
+    await check_manager_initialized()
     msg.info(f"Document ID received: {payload.document_id}")
 
     try:
-        document = manager.retrieve_document(payload.document_id)
+        document = manager.retrieve_document(
+            payload.document_id,
+            selected_embedder(),
+            chunk_start=payload.chunk_start,
+            chunk_limit=payload.chunk_limit,
+        )
         msg.good(f"Succesfully retrieved document: {payload.document_id}")
         return JSONResponse(
             content={
@@ -512,10 +910,12 @@ async def get_document(payload: GetDocumentPayload):
 ## Retrieve all documents imported to Weaviate
 @app.post("/api/get_all_documents")
 async def get_all_documents(payload: SearchQueryPayload):
+    await check_manager_initialized()
     msg.info(f"Get all documents request received")
+    embedder = selected_embedder()
 
     try:
-        documents = manager.retrieve_all_documents(payload.doc_type)
+        documents = manager.retrieve_all_documents(payload.doc_type, embedder)
         msg.good(f"Succesfully retrieved document: {len(documents)} documents")
 
         doc_types = set([document["doc_type"] for document in documents])
@@ -524,7 +924,7 @@ async def get_all_documents(payload: SearchQueryPayload):
             content={
                 "documents": documents,
                 "doc_types": list(doc_types),
-                "current_embedder": manager.embedder_manager.selected_embedder.name,
+                "current_embedder": embedder,
             }
         )
     except Exception as e:
@@ -533,7 +933,7 @@ async def get_all_documents(payload: SearchQueryPayload):
             content={
                 "documents": [],
                 "doc_types": [],
-                "current_embedder": manager.embedder_manager.selected_embedder.name,
+                "current_embedder": embedder,
             }
         )
 
@@ -541,12 +941,14 @@ async def get_all_documents(payload: SearchQueryPayload):
 ## Search for documentation
 @app.post("/api/search_documents")
 async def search_documents(payload: SearchQueryPayload):
+    await check_manager_initialized()
+    embedder = selected_embedder()
     try:
-        documents = manager.search_documents(payload.query, payload.doc_type)
+        documents = manager.search_documents(payload.query, payload.doc_type, embedder)
         return JSONResponse(
             content={
                 "documents": documents,
-                "current_embedder": manager.embedder_manager.selected_embedder.name,
+                "current_embedder": embedder,
             }
         )
     except Exception as e:
@@ -554,7 +956,7 @@ async def search_documents(payload: SearchQueryPayload):
         return JSONResponse(
             content={
                 "documents": [],
-                "current_embedder": manager.embedder_manager.selected_embedder.name,
+                "current_embedder": embedder,
             }
         )
 
@@ -562,9 +964,10 @@ async def search_documents(payload: SearchQueryPayload):
 # Retrieve specific document based on UUID
 @app.post("/api/delete_document")
 async def delete_document(payload: GetDocumentPayload):
+    await check_manager_initialized()
     msg.info(f"Document ID received: {payload.document_id}")
 
-    manager.delete_document_by_id(payload.document_id)
+    manager.delete_document_by_id(payload.document_id, selected_embedder())
     return JSONResponse(content={})
 
 
@@ -574,7 +977,7 @@ async def set_openai_key(payload: APIKeyPayload):
     try:
         os.environ["OPENAI_API_KEY"] = payload.key      
         store_api_key(payload.key)
-        init_manager()
+        await run_in_threadpool(init_manager)
         return JSONResponse(
             content={
                 "status": "200",
@@ -593,7 +996,7 @@ async def set_openai_key(payload: APIKeyPayload):
 async def unset_openai_key():
     try:
         remove_api_key()
-        init_manager()
+        await run_in_threadpool(init_manager)
         return JSONResponse(
             content={
                 "status": "200",
@@ -612,6 +1015,7 @@ async def unset_openai_key():
 
 @app.get("/api/get_openai_key_preview")
 async def get_openai_key_preview():
+    await run_in_threadpool(sync_api_key)
     len_preview = 3
     if not "OPENAI_API_KEY" in os.environ:
         return JSONResponse(
@@ -637,6 +1041,7 @@ async def get_openai_key_preview():
 
 @app.get("/api/test_openai_api_key")
 async def test_openai_api_key():
+    await run_in_threadpool(sync_api_key)
     if not "OPENAI_API_KEY" in os.environ:
         return JSONResponse(
             content={
@@ -670,8 +1075,13 @@ async def test_openai_api_key():
             if openai.api_type == "azure":
                 chat_completion_arguments["deployment_id"] = os.environ["VERBA_MODEL"]
 
-            _ = openai.ChatCompletion.create(**chat_completion_arguments)
-        except (openai.error.AuthenticationError, openai.error.APIError) as e:
+            # The limiter waits with time.sleep, keep it and the call off the event loop
+            def call_openai():
+                get_openai_limiter().acquire(tokens=50, priority=INTERACTIVE)
+                return openai.ChatCompletion.create(**chat_completion_arguments)
+
+            _ = await run_in_threadpool(call_openai)
+        except (openai.error.AuthenticationError, openai.error.APIError, RateLimitTimeout) as e:
             msg.warn(f"Something went wrong when testing your API key : {e}")
             return JSONResponse(
                 content={
@@ -3,6 +3,16 @@ import uvicorn
 import os
 
 from goldenverba.verba_manager import VerbaManager
+from goldenverba.ingestion.reader.manager import ReaderManager
+from goldenverba.ingestion.chunking.manager import ChunkerManager
+from goldenverba.ingestion.embedding.manager import EmbeddingManager
+from goldenverba.ingestion.reader.corpus import write_corpus
+from goldenverba.server.serving import (
+    GRACEFUL_TIMEOUT_SECONDS,
+    KEEP_ALIVE_SECONDS,
+    WORKERS,
+    serve,
+)
 
 from wasabi import msg
 from dotenv import load_dotenv
@@ -22,11 +32,34 @@ def cli():
     default=8000,
     help="FastAPI Port",
 )
-def start(port):
+@click.option(
+    "--host",
+    default="0.0.0.0",
+    help="Interface to listen on",
+)
+@click.option(
+    "--workers",
+    default=WORKERS,
+    help="Worker processes, 0 runs a single process with auto-reload for development (VERBA_WORKERS)",
+)
+@click.option(
+    "--keep-alive",
+    default=KEEP_ALIVE_SECONDS,
+    help="Seconds an idle keep-alive connection stays open (VERBA_KEEP_ALIVE_S)",
+)
+@click.option(
+    "--graceful-timeout",
+    default=GRACEFUL_TIMEOUT_SECONDS,
+    help="Seconds in-flight requests get to finish on SIGTERM (VERBA_GRACEFUL_TIMEOUT_S)",
+)
+def start(port, host, workers, keep_alive, graceful_timeout):
     """
     Run the FastAPI application.
     """
-    uvicorn.run("goldenverba.server.api:app", host="0.0.0.0", port=port, reload=True)
+    if workers <= 0:
+        uvicorn.run("goldenverba.server.api:app", host=host, port=port, reload=True)
+        return
+    serve(host, port, workers, keep_alive=keep_alive, graceful_timeout=graceful_timeout)
 
 
 @cli.command()
@@ -84,6 +117,176 @@ def load(reader, type, chunker, units, overlap, embedder, path):
     )
 
 
+@cli.command()
+@click.option(
+    "--reader",
+    default="SimpleReader",
+    help="Reader",
+)
+@click.option(
+    "--type",
+    default="Documentation",
+    help="Document Type",
+)
+@click.option(
+    "--chunker",
+    default="WordChunker",
+    help="Chunker",
+)
+@click.option(
+    "--units",
+    default=100,
+    help="Units per chunk",
+)
+@click.option(
+    "--overlap",
+    default=50,
+    help="Overlap of units per chunk",
+)
+@click.option(
+    "--path",
+    help="Path to data",
+)
+@click.option(
+    "--output",
+    help="Path of the .verba corpus file to write",
+)
+@click.option(
+    "--embedder",
+    default=None,
+    help="Embedder computing the chunk vectors on this machine, without it the corpus is only chunked",
+)
+def prepare(reader, type, chunker, units, overlap, path, output, embedder):
+    """
+    Read, chunk and optionally embed data into a .verba corpus file, without Weaviate
+    """
+    reader_manager = ReaderManager()
+    reader_manager.set_reader(reader)
+    chunker_manager = ChunkerManager()
+    chunker_manager.set_chunker(chunker)
+
+    documents = reader_manager.load(
+        paths=[path], fileNames=[path], document_type=type
+    )
+    documents = chunker_manager.chunk(documents, units, overlap)
+
+    # Without vectors, load-corpus embeds the chunks with the embedder it imports with
+    vectorizer = ""
+    if embedder is not None:
+        selected = EmbeddingManager().get_embedder(embedder)
+        selected.vectorize_documents(documents)
+        vectorizer = selected.vectorizer
+
+    write_corpus(documents, output, vectorizer)
+    msg.good(
+        f"Wrote {len(documents)} documents and {sum(len(d.chunks) for d in documents)} chunks to {output}"
+        + (f", embedded with {embedder}" if vectorizer else "")
+    )
+
+
+@cli.command()
+@click.option(
+    "--embedder",
+    default="ADAEmbedder",
+    help="Embedder",
+)
+@click.option(
+    "--path",
+    help="Path to the .verba corpus file",
+)
+def load_corpus(embedder, path):
+    """
+    Import a prepared .verba corpus file into Weaviate
+    """
+    manager = VerbaManager()
+    manager.embedder_set_embedder(embedder)
+    manager.import_corpus(path)
+
+
+@cli.command()
+@click.option(
+    "--tenants",
+    multiple=True,
+    required=True,
+    help="Tenants to create, repeat the option or separate them with commas",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Check Weaviate even if the schema fingerprint says nothing changed",
+)
+def bootstrap(tenants, force):
+    """
+    Create the schemas and tenants of many tenants in bulk
+    """
+    tenants = [tenant.strip() for option in tenants for tenant in option.split(",") if tenant.strip()]
+    manager = VerbaManager()
+    result = manager.bootstrap_schemas(tenants, force=force)
+    if result is None:
+        raise SystemExit(1)
+    if result["skipped"]:
+        msg.good(f"{len(tenants)} tenants already bootstrapped")
+    else:
+        msg.good(
+            f"Bootstrapped {len(tenants)} tenants, created {len(result['created'])} classes and "
+            f"{sum(result['tenants_added'].values())} class tenants"
+        )
+
+
+@cli.command()
+@click.option(
+    "--apply",
+    is_flag=True,
+    help="Update the classes, otherwise only report what would change",
+)
+def migrate_index(apply):
+    """
+    Bring the vector index of existing Chunk classes to VERBA_VECTOR_INDEX and VERBA_VECTOR_INDEX_CONFIG
+    """
+    import goldenverba.ingestion.schema.schema_generation as schema_manager
+
+    manager = VerbaManager()
+    plan = schema_manager.migrate_vector_index(
+        manager.client, schema_manager.VECTORIZERS | schema_manager.EMBEDDINGS, apply=apply
+    )
+    if not plan:
+        msg.good("Vector indexes already match the configuration")
+    for change in plan:
+        if change["updates"] and not apply:
+            msg.info(f"{change['class']}: would update {change['updates']}, run again with --apply")
+
+
+@cli.command()
+@click.option(
+    "--apply",
+    is_flag=True,
+    help="Rebuild the classes, otherwise only report which ones would be rebuilt",
+)
+@click.option(
+    "--spool",
+    default=None,
+    help="Directory the objects are kept in during the rebuild (VERBA_REBUILD_SPOOL_PATH)",
+)
+def rebuild_schema(apply, spool):
+    """
+    Recreate the classes whose property types, indexes or vector index differ from the current schema, with all
+    their tenants and objects. Stop the Verba servers of the cluster first, the classes are missing meanwhile
+    """
+    import goldenverba.ingestion.schema.schema_generation as schema_manager
+
+    manager = VerbaManager()
+    plan = schema_manager.rebuild_schemas(
+        manager.client,
+        schema_manager.VECTORIZERS | schema_manager.EMBEDDINGS,
+        spool or schema_manager.REBUILD_SPOOL_PATH,
+        apply=apply,
+    )
+    if not plan:
+        msg.good("Every class matches the current schema")
+    elif not apply:
+        msg.info("Run again with --apply to rebuild them")
+
+
 @cli.command()
 def reset():
     """
@@ -94,5 +297,489 @@ def reset():
     msg.warn("Verba Resetted")
 
 
+@cli.command()
+@click.option(
+    "--output",
+    help="Directory that receives the quantized model and its tokenizer",
+)
+def export_onnx(output):
+    """
+    Export all-MiniLM-L6-v2 to an int8-quantized ONNX model for the MiniLMONNXEmbedder
+    """
+    from goldenverba.ingestion.embedding.MiniLMONNXEmbedder import export_minilm_onnx
+
+    path = export_minilm_onnx(output)
+    msg.good(f"Exported {path}, set VERBA_MINILM_ONNX_PATH={output} to use it")
+
+
+@cli.group()
+def bench():
+    """
+    Benchmarks for Verba
+    """
+    pass
+
+
+@bench.command()
+@click.option(
+    "--port",
+    default=8999,
+    help="Port of the benchmarked server",
+)
+@click.option(
+    "--budget",
+    default=15.0,
+    help="Maximum seconds until the server is ready",
+)
+@click.option(
+    "--timeout",
+    default=120.0,
+    help="Seconds before giving up",
+)
+def startup(port, budget, timeout):
+    """
+    Measure the time from `verba start` until the server is ready
+    """
+    from goldenverba.benchmark.startup import measure_startup
+
+    elapsed = measure_startup(port=port, timeout=timeout)
+    if elapsed > budget:
+        msg.fail(f"Startup took {elapsed:.2f}s, budget is {budget:.2f}s")
+        raise SystemExit(1)
+    msg.good(f"Startup took {elapsed:.2f}s (budget {budget:.2f}s)")
+
+
+@bench.command()
+@click.option(
+    "--embedder",
+    "embedders",
+    multiple=True,
+    default=["MiniLMEmbedder", "MiniLMONNXEmbedder"],
+    help="Embedders to compare",
+)
+@click.option(
+    "--chunks",
+    default=1000,
+    help="Number of synthetic chunks",
+)
+@click.option(
+    "--words",
+    default=100,
+    help="Words per chunk",
+)
+def embedders(embedders, chunks, words):
+    """
+    Compare chunks/s and peak RSS of local embedders
+    """
+    from goldenverba.benchmark.embedders import compare_embedders
+
+    compare_embedders(list(embedders), chunks, words)
+
+
+@bench.command()
+@click.option(
+    "--size",
+    type=click.Choice(["tiny", "small", "medium", "large", "xlarge"]),
+    default="tiny",
+    help="Preset of the synthetic corpus, from a few documents to several GB",
+)
+@click.option(
+    "--documents",
+    default=None,
+    type=int,
+    help="Number of documents, overrides the preset",
+)
+@click.option(
+    "--words",
+    default=None,
+    type=int,
+    help="Average words per document, overrides the preset",
+)
+@click.option(
+    "--batch-documents",
+    default=100,
+    help="Documents processed per batch, like one upload",
+)
+@click.option(
+    "--embed-chunks",
+    default=2000,
+    help="Chunks embedded with MiniLM, it is much slower than the other stages",
+)
+@click.option(
+    "--stage",
+    "stages",
+    multiple=True,
+    help="Only run these stages (default: all)",
+)
+@click.option(
+    "--allocations/--no-allocations",
+    default=True,
+    help="Trace allocations with tracemalloc, slows every stage down",
+)
+@click.option(
+    "--output",
+    default=None,
+    help="JSON results file, defaults to .verba/benchmarks/ingest-<size>-<commit>.json",
+)
+def ingest(size, documents, words, batch_documents, embed_chunks, stages, allocations, output):
+    """
+    Benchmark readers, chunkers, token checks, MiniLM and the Weaviate batch path on a synthetic corpus
+    """
+    from goldenverba.benchmark.ingest import run_ingest_benchmark
+
+    run_ingest_benchmark(
+        size,
+        documents=documents,
+        words=words,
+        output=output,
+        batch_documents=batch_documents,
+        embed_chunks=embed_chunks,
+        stages=list(stages) or None,
+        trace_allocations=allocations,
+    )
+
+
+@bench.command()
+@click.option(
+    "--corpus",
+    required=True,
+    help="File or directory of documents, read with the SimpleReader",
+)
+@click.option(
+    "--questions",
+    required=True,
+    help='Golden question set, JSONL lines like {"question": ..., "expected_docs": [...]}',
+)
+@click.option(
+    "--setting",
+    "settings",
+    multiple=True,
+    default=["150:50", "300:100"],
+    help="Chunking setting as units:overlap, one scratch tenant each",
+)
+@click.option(
+    "--k",
+    "ks",
+    multiple=True,
+    type=int,
+    default=[4, 8],
+    help="Number of retrieved chunks",
+)
+@click.option(
+    "--window",
+    "windows",
+    multiple=True,
+    type=int,
+    default=[0, 1],
+    help="Neighbor chunks added on each side of a retrieved chunk",
+)
+@click.option(
+    "--chunker",
+    default="WordChunker",
+    help="Chunker",
+)
+@click.option(
+    "--recall-target",
+    default=0.9,
+    help="Recall@k that the recommended configuration must reach",
+)
+@click.option(
+    "--keep-tenants",
+    is_flag=True,
+    default=False,
+    help="Keep the scratch tenants after the evaluation",
+)
+@click.option(
+    "--output",
+    default=None,
+    help="Write the results as JSON to this file",
+)
+def retrieval(corpus, questions, settings, ks, windows, chunker, recall_target, keep_tenants, output):
+    """
+    Compare recall@k, MRR, prompt tokens and retrieval latency of chunking, top-k and window settings
+    """
+    import json
+
+    from goldenverba.benchmark.retrieval_eval import (
+        RetrievalEvaluation,
+        cheapest_configuration,
+        load_questions,
+    )
+
+    manager = VerbaManager()
+    manager.chunker_set_chunker(chunker)
+    # The query engine searches the text2vec-openai classes
+    manager.embedder_set_embedder("ADAEmbedder")
+
+    evaluation = RetrievalEvaluation(
+        manager,
+        load_questions(questions),
+        [tuple(int(value) for value in setting.split(":")) for setting in settings],
+        list(ks),
+        list(windows),
+        keep_tenants=keep_tenants,
+    )
+    results = evaluation.run(corpus)
+
+    best = cheapest_configuration(results, recall_target)
+    if best is None:
+        msg.warn(f"No configuration reaches a recall of {recall_target}")
+    else:
+        msg.good(
+            f"Cheapest configuration with recall >= {recall_target}: units={best['units']} overlap={best['overlap']} "
+            f"(VERBA_RETRIEVAL_LIMIT={best['k']} VERBA_CONTEXT_WINDOW={best['window']}), {best['prompt_tokens']:.0f} prompt tokens"
+        )
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump({"results": results, "recommended": best}, file, indent=2)
+
+
+@bench.command()
+@click.option(
+    "--tenant",
+    required=True,
+    help="Tenant whose chunk vectors are sampled",
+)
+@click.option(
+    "--embedder",
+    default="ADAEmbedder",
+    help="Embedder whose Chunk class is sampled",
+)
+@click.option(
+    "--preset",
+    "presets",
+    multiple=True,
+    default=["hnsw", "hnsw-dynamic", "hnsw-pq", "hnsw-bq", "flat", "flat-bq"],
+    help="Vector index preset to compare, see VECTOR_INDEX_PRESETS",
+)
+@click.option(
+    "--objects",
+    default=20000,
+    help="Vectors sampled from the tenant, including the queries",
+)
+@click.option(
+    "--queries",
+    default=200,
+    help="Sampled vectors held out of the import and used as queries",
+)
+@click.option(
+    "--k",
+    default=10,
+    help="Neighbours per query",
+)
+@click.option(
+    "--keep-classes",
+    is_flag=True,
+    default=False,
+    help="Keep the scratch classes after the benchmark",
+)
+@click.option(
+    "--output",
+    default=None,
+    help="Write the results as JSON to this file",
+)
+def vector_index(tenant, embedder, presets, objects, queries, k, keep_classes, output):
+    """
+    Compare recall@k, latency and estimated memory of vector index presets on a tenant's own vectors
+    """
+    import json
+
+    from goldenverba.benchmark.vector_index import VectorIndexBenchmark, read_vectors
+    from goldenverba.ingestion.schema.schema_generation import strip_non_letters
+
+    manager = VerbaManager()
+    class_name = "Chunk_" + strip_non_letters(manager.embedder_manager.embedders[embedder].vectorizer)
+    vectors = read_vectors(manager.client, class_name, tenant, objects)
+    if len(vectors) <= queries:
+        msg.fail(f"Tenant {tenant} has {len(vectors)} vectors in {class_name}, more than {queries} are needed")
+        raise SystemExit(1)
+    msg.info(f"Read {len(vectors)} vectors of {vectors.shape[1]} dimensions from {class_name}")
+
+    benchmark = VectorIndexBenchmark(manager.client, list(presets), k=k, queries=queries, keep_classes=keep_classes)
+    results = benchmark.run(vectors)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump({"results": results}, file, indent=2)
+
+
+@bench.command()
+@click.argument("baseline")
+@click.argument("candidate")
+def compare(baseline, candidate):
+    """
+    Compare two ingestion benchmark results, e.g. of two commits
+    """
+    import json
+
+    from goldenverba.benchmark.ingest import compare_results
+
+    with open(baseline, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(candidate, encoding="utf-8") as file:
+        after = json.load(file)
+
+    msg.info(f"{before['commit']} -> {after['commit']}")
+    for row in compare_results(before, after):
+        msg.info(
+            f"{row['stage']:<16} x{row['speedup']:<6} traced {row['traced_mb_before']} MB -> {row['traced_mb_after']} MB"
+        )
+
+
+@bench.command()
+@click.option(
+    "--port",
+    default=8900,
+    help="Port of the mock server",
+)
+@click.option(
+    "--latency-ms",
+    default=300.0,
+    help="Time to first token of every call",
+)
+@click.option(
+    "--tokens-per-second",
+    default=50.0,
+    help="Generation speed of chat completions",
+)
+@click.option(
+    "--completion-tokens",
+    default=150,
+    help="Length of every chat completion",
+)
+@click.option(
+    "--error-rate",
+    default=0.0,
+    help="Share of calls answered with a 429",
+)
+def mock_openai(port, latency_ms, tokens_per_second, completion_tokens, error_rate):
+    """
+    Serve a mock of the OpenAI chat and embeddings API, point OPENAI_API_BASE to it
+    """
+    from goldenverba.benchmark.mock_openai import serve
+
+    msg.info(f"Mock OpenAI listening, set OPENAI_API_BASE=http://127.0.0.1:{port}/v1")
+    serve(
+        port,
+        latency_ms=latency_ms,
+        tokens_per_second=tokens_per_second,
+        completion_tokens=completion_tokens,
+        error_rate=error_rate,
+    )
+
+
+@bench.command(name="load")
+@click.option(
+    "--url",
+    default="http://localhost:8000/api",
+    help="URL of the Verba API",
+)
+@click.option(
+    "--endpoint",
+    type=click.Choice(["query", "load_data"]),
+    default="query",
+    help="Endpoint to drive",
+)
+@click.option(
+    "--concurrency",
+    default=8,
+    help="Requests in flight",
+)
+@click.option(
+    "--requests",
+    "requests_count",
+    default=100,
+    help="Total number of requests",
+)
+@click.option(
+    "--questions",
+    default=None,
+    help="File with one question per line, synthetic questions otherwise",
+)
+@click.option(
+    "--words",
+    default=2000,
+    help="Words per uploaded document (load_data)",
+)
+@click.option(
+    "--embedder",
+    default="ADAEmbedder",
+    help="Embedder of the uploaded documents (load_data)",
+)
+@click.option(
+    "--output",
+    default=None,
+    help="Write the results as JSON to this file",
+)
+def load_test(url, endpoint, concurrency, requests_count, questions, words, embedder, output):
+    """
+    Drive /api/query or /api/load_data at a fixed concurrency and report throughput and p50/p95/p99
+    """
+    import json
+
+    from goldenverba.benchmark.load import run_load, query_payloads, load_data_payloads
+
+    if endpoint == "query":
+        lines = None
+        if questions:
+            with open(questions, encoding="utf-8") as file:
+                lines = [line.strip() for line in file if line.strip()]
+        payload = query_payloads(lines)
+    else:
+        payload = load_data_payloads(words=words, embedder=embedder)
+
+    result = run_load(url, endpoint, payload, concurrency, requests_count)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+
+@cli.command()
+@click.argument("log")
+@click.option(
+    "--url",
+    default="http://localhost:8000/api",
+    help="URL of the Verba API",
+)
+@click.option(
+    "--speedup",
+    default=1.0,
+    help="Replay the traffic this many times faster than it was captured",
+)
+@click.option(
+    "--kinds",
+    type=click.Choice(["all", "query", "retrieve", "ingest"]),
+    default="all",
+    help="Requests to replay",
+)
+@click.option(
+    "--max-in-flight",
+    default=64,
+    help="Requests in flight at most",
+)
+@click.option(
+    "--output",
+    default=None,
+    help="Write the results as JSON to this file",
+)
+def replay(log, url, speedup, kinds, max_in_flight, output):
+    """
+    Re-issue the requests of a query log (.verba/logs/queries.jsonl) with their original timing
+    """
+    import json
+
+    from goldenverba.benchmark.replay import read_log, replay as run_replay
+
+    records = read_log(log, ("query", "retrieve", "ingest") if kinds == "all" else (kinds,))
+    if not records:
+        msg.warn(f"No {kinds} requests in {log}")
+        return
+
+    result = run_replay(records, url, speedup=speedup, max_in_flight=max_in_flight)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,130 @@
+import contextlib
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from wasabi import msg
+
+PROFILE_HEADER = "X-Verba-Profile"
+ADMIN_TOKEN_HEADER = "X-Verba-Admin-Token"
+PROFILE_ID_HEADER = "X-Verba-Profile-Id"
+
+PROFILE_DIR = Path(os.getenv("VERBA_PROFILE_DIR", "./.verba/profiles"))
+# cProfile can only trace one request at a time per interpreter on recent Python versions
+MAX_CONCURRENT_PROFILES = int(os.getenv("VERBA_PROFILE_MAX_CONCURRENT", 1))
+KEEP_PROFILES = int(os.getenv("VERBA_PROFILE_KEEP", 50))
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_PROFILES)
+_profile_id = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ProfileSession:
+    def __init__(self, path: str):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.profiler = cProfile.Profile()
+
+    @property
+    def file(self) -> Path:
+        return PROFILE_DIR / f"{self.id}.prof"
+
+
+def check_admin(request: Request) -> None:
+    """Only requests carrying VERBA_ADMIN_TOKEN may profile or download profiles"""
+    expected = os.getenv("VERBA_ADMIN_TOKEN", "")
+    given = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    if not expected or not hmac.compare_digest(given.encode(), expected.encode()):
+        raise HTTPException(403, "Profiling requires a valid admin token")
+
+
+def profile_requested(request: Request) -> bool:
+    return (
+        request.headers.get(PROFILE_HEADER, "") == "1"
+        or request.query_params.get("profile", "") == "1"
+    )
+
+
+@contextlib.contextmanager
+def maybe_profile(request: Request):
+    """Profile the enclosed block with cProfile when an admin asks for it, yields the session or None.
+    Unprofiled requests only pay for a header lookup. When all profiling slots are taken the block runs unprofiled.
+    Enter it in the thread that does the work, cProfile only sees the thread that enabled it.
+    """
+    if not profile_requested(request):
+        yield None
+        return
+
+    check_admin(request)
+    if not _slots.acquire(blocking=False):
+        msg.warn("Profiling slots exhausted, running the request without profiler")
+        yield None
+        return
+
+    session = ProfileSession(request.url.path)
+    try:
+        session.profiler.enable()
+        yield session
+    finally:
+        try:
+            session.profiler.disable()
+            # Failed requests are stored too, they are often the interesting ones
+            _store(session)
+        finally:
+            _slots.release()
+
+
+def _store(session: ProfileSession) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    session.profiler.dump_stats(session.file)
+    msg.info(f"Stored profile {session.id} of {session.path}")
+
+    profiles = sorted(PROFILE_DIR.glob("*.prof"), key=lambda path: path.stat().st_mtime)
+    for old in profiles[: max(len(profiles) - KEEP_PROFILES, 0)]:
+        old.unlink(missing_ok=True)
+
+
+def attach_profile(response, session: Optional[ProfileSession]):
+    if session is not None:
+        response.headers[PROFILE_ID_HEADER] = session.id
+    return response
+
+
+def profile_path(profile_id: str) -> Path:
+    if not _profile_id.match(profile_id):
+        raise HTTPException(404, "Profile not found")
+    path = PROFILE_DIR / f"{profile_id}.prof"
+    if not path.exists():
+        raise HTTPException(404, "Profile not found")
+    return path
+
+
+def list_profiles() -> list[dict]:
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = sorted(PROFILE_DIR.glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+    return [
+        {
+            "id": path.stem,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(path.stat().st_mtime)),
+            "bytes": path.stat().st_size,
+        }
+        for path in profiles
+    ]
+
+
+def profile_summary(profile_id: str, limit: int = 50) -> str:
+    """Top functions by cumulative time, readable without downloading the pstats file"""
+    output = io.StringIO()
+    stats = pstats.Stats(str(profile_path(profile_id)), stream=output)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,254 @@
+import ctypes
+import os
+import signal
+import socket
+import threading
+import time
+
+from multiprocessing.sharedctypes import RawValue
+from types import ModuleType
+
+import uvicorn
+
+from wasabi import msg
+
+from goldenverba.ingestion.reader.document import Document
+from goldenverba.ingestion.schema.schema_generation import VECTORIZERS, strip_non_letters
+
+WORKERS = int(os.getenv("VERBA_WORKERS", 0))
+# Above the idle timeout of nginx (60 s by default), so that nginx closes idle upstream connections and not us
+KEEP_ALIVE_SECONDS = int(os.getenv("VERBA_KEEP_ALIVE_S", 75))
+# Time in-flight requests get to finish after SIGTERM
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("VERBA_GRACEFUL_TIMEOUT_S", 30))
+# Time /api/ready reports draining before the workers stop accepting, for the load balancer to notice
+DRAIN_DELAY_SECONDS = float(os.getenv("VERBA_DRAIN_DELAY_S", 0))
+BACKLOG = int(os.getenv("VERBA_BACKLOG", 2048))
+WARM_UP_RETRY_SECONDS = 5
+
+_ready = threading.Event()
+_warm_up_lock = threading.Lock()
+# Set by the master process, seen by the forked workers
+_draining = RawValue(ctypes.c_bool, False)
+
+
+def is_ready() -> bool:
+    return _ready.is_set() and not _draining.value
+
+
+def is_draining() -> bool:
+    return bool(_draining.value)
+
+
+def preload(api: ModuleType) -> None:
+    """Load what the workers would each load otherwise, before they fork, so that its memory is shared copy-on-write.
+    Nothing here may start threads or open connections the workers would inherit
+    @parameter api : ModuleType - goldenverba.server.api, imported and initialized
+    """
+    from goldenverba.ingestion.chunking.manager import get_encoding
+
+    try:
+        get_encoding()
+    except Exception as e:
+        msg.warn(f"Could not preload the tiktoken encoder: {e}")
+
+    if api.manager is None:
+        return
+    for key, chunker in api.chunker.items():
+        if api.manager.check_verba_component(chunker)[0]:
+            chunker.ensure_loaded()
+    api.manager.embedder_manager.get_embedder(api.selected_embedder())
+
+
+def warm_up(api: ModuleType) -> dict:
+    """Take the first-request costs of this process before it receives traffic: Weaviate connection and schema,
+    tokenizer, chunkers and one embedding with a local model. Marks the process ready when Weaviate answered
+    @parameter api : ModuleType - goldenverba.server.api
+    @returns dict - Seconds per warm-up stage
+    """
+    stages = {}
+
+    def stage(name: str, function) -> None:
+        start = time.perf_counter()
+        try:
+            function()
+        finally:
+            stages[name] = round(time.perf_counter() - start, 3)
+
+    with _warm_up_lock:
+        if _ready.is_set():
+            return stages
+        manager = api.manager
+        if manager is None:
+            # Nothing to warm up before a key is set, the process can still take /api/set_openai_key
+            _ready.set()
+            return stages
+
+        def weaviate_ready() -> None:
+            if not manager.client.is_ready():
+                raise Exception("Weaviate is not ready")
+
+        def schema() -> None:
+            vectorizer = strip_non_letters(manager.embedder_manager.get_embedder(api.selected_embedder()).vectorizer)
+            for class_name in (f"Document_{vectorizer}", f"Chunk_{vectorizer}"):
+                if not manager.client.schema.exists(class_name):
+                    raise Exception(f"Class {class_name} is missing")
+
+        stage("weaviate", weaviate_ready)
+        stage("schema", schema)
+
+        def encoder() -> None:
+            from goldenverba.ingestion.chunking.manager import get_encoding
+
+            get_encoding().encode("Warm up", disallowed_special=())
+
+        def chunkers() -> None:
+            for key, chunker in api.chunker.items():
+                if manager.check_verba_component(chunker)[0]:
+                    chunker.chunk([Document(text="Warm up the pipeline. Then serve.", name="warm-up")], 3, 1)
+
+        def embedding() -> None:
+            embedder = manager.embedder_manager.get_embedder(api.selected_embedder())
+            # Weaviate-side vectorizers would cost an OpenAI call, only local models have kernels to warm up
+            if embedder.vectorizer not in VECTORIZERS:
+                embedder.vectorize_chunks(["Warm up"])
+
+        for name, function in (("encoder", encoder), ("chunkers", chunkers), ("embedding", embedding)):
+            try:
+                stage(name, function)
+            except Exception as e:
+                msg.warn(f"Warm-up of the {name} failed, the first request will pay for it: {e}")
+
+        _ready.set()
+        msg.good(f"Worker {os.getpid()} warmed up {stages}")
+        return stages
+
+
+def warm_up_in_background(api: ModuleType) -> None:
+    """Warm up until Weaviate answers, without holding up the caller"""
+
+    def run() -> None:
+        while not _ready.is_set():
+            try:
+                warm_up(api)
+            except Exception as e:
+                msg.warn(f"Warm-up failed, retrying in {WARM_UP_RETRY_SECONDS} s: {e}")
+                time.sleep(WARM_UP_RETRY_SECONDS)
+
+    threading.Thread(target=run, name="verba-warm-up", daemon=True).start()
+
+
+def run_worker(api: ModuleType, sock: socket.socket, keep_alive: int, graceful_timeout: int) -> None:
+    # The master's handlers must not run here, uvicorn installs its own graceful ones
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Connections opened before the fork are shared with the master and the other workers
+    api.reconnect()
+    try:
+        warm_up(api)
+    except Exception as e:
+        msg.warn(f"Warm-up failed, serving anyway and retrying in the background: {e}")
+        warm_up_in_background(api)
+
+    config = uvicorn.Config(
+        api.app,
+        timeout_keep_alive=keep_alive,
+        timeout_graceful_shutdown=graceful_timeout,
+        lifespan="on",
+    )
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        from goldenverba.query_log import close_query_log
+
+        close_query_log()
+
+
+def serve(
+    host: str,
+    port: int,
+    workers: int,
+    keep_alive: int = KEEP_ALIVE_SECONDS,
+    graceful_timeout: int = GRACEFUL_TIMEOUT_SECONDS,
+    drain_delay: float = DRAIN_DELAY_SECONDS,
+) -> None:
+    """Pre-fork server: load the API and its models once, fork the workers on a shared socket and restart the ones
+    that die. SIGTERM or SIGINT flips /api/ready to draining, waits drain_delay, then lets every worker finish its
+    in-flight requests for up to graceful_timeout seconds
+    @parameter host : str - Interface to listen on
+    @parameter port : int - Port to listen on
+    @parameter workers : int - Worker processes
+    @parameter keep_alive : int - Seconds an idle keep-alive connection stays open
+    @parameter graceful_timeout : int - Seconds in-flight requests get after SIGTERM
+    @parameter drain_delay : float - Seconds between SIGTERM and the workers stopping to accept
+    """
+    start = time.perf_counter()
+    from goldenverba.server import api
+
+    preload(api)
+    msg.info(f"Preloaded the API in {time.perf_counter() - start:.1f} s, starting {workers} workers")
+
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+
+    children: dict[int, float] = {}
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(api, sock, keep_alive, graceful_timeout)
+            except BaseException as e:
+                msg.fail(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                # Skip the atexit handlers of the master, such as stopping embedded Weaviate
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def reap() -> None:
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            started = children.pop(pid, None)
+            if started is not None and not stopping.is_set():
+                msg.warn(f"Worker {pid} exited with status {status}, starting a new one")
+                # A worker that dies at start would otherwise be forked again in a tight loop
+                if time.monotonic() - started < 5:
+                    time.sleep(1)
+                spawn()
+
+    for _ in range(workers):
+        spawn()
+    while not stopping.is_set():
+        reap()
+        stopping.wait(0.5)
+
+    _draining.value = True
+    if drain_delay > 0:
+        msg.info(f"Draining, /api/ready reports 503 for {drain_delay} s before the workers stop accepting")
+        time.sleep(drain_delay)
+    msg.info(f"Stopping {len(children)} workers, in-flight requests get {graceful_timeout} s")
+    for pid in list(children):
+        os.kill(pid, signal.SIGTERM)
+
+    deadline = time.monotonic() + graceful_timeout + 5
+    while children and time.monotonic() < deadline:
+        reap()
+        time.sleep(0.1)
+    for pid in list(children):
+        msg.warn(f"Worker {pid} did not stop in time, killing it")
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    sock.close()
+    msg.good("Stopped")
@@ -0,0 +1,166 @@
+import contextlib
+import glob
+import json
+import os
+import shelve
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, Optional
+
+TENANT = os.getenv('WEAVIATE_TENANT',default='default_tenant')
+
+# SQLite file of the state, shared by the workers of one host. Its locks are not reliable on NFS or SMB,
+# so replicas on several hosts set VERBA_STATE_URL instead
+STATE_PATH = os.getenv("VERBA_STATE_PATH", "./.verba/state.sqlite")
+# redis://host:6379/0, state shared by the replicas of every host
+STATE_URL = os.getenv("VERBA_STATE_URL", "")
+# Seconds a replica may serve a value another replica has since changed
+STATE_CACHE_TTL = float(os.getenv("VERBA_STATE_CACHE_TTL_S", 5))
+# Where versions before the state store kept the OpenAI key
+LEGACY_SHELVE_DIR = "shelve"
+
+
+class SQLiteStateBackend:
+    """
+    State rows in a local SQLite file, for the workers of one host
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS state (tenant TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "updated REAL NOT NULL, PRIMARY KEY (tenant, key))"
+            )
+
+    @contextlib.contextmanager
+    def _connection(self):
+        # One short-lived connection per call, safe across the threads of the pool and forked workers
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, tenant: str, key: str) -> Optional[str]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT value FROM state WHERE tenant = ? AND key = ?", (tenant, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_many(self, tenant: str, values: dict[str, str]) -> None:
+        now = time.time()
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT INTO state (tenant, key, value, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (tenant, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                [(tenant, key, raw, now) for key, raw in values.items()],
+            )
+
+    def delete(self, tenant: str, key: str) -> bool:
+        with self._connection() as connection:
+            return connection.execute(
+                "DELETE FROM state WHERE tenant = ? AND key = ?", (tenant, key)
+            ).rowcount > 0
+
+
+class RedisStateBackend:
+    """
+    State in one Redis hash per tenant, for replicas on several hosts. Needs the redis package
+    """
+
+    def __init__(self, url: str, client: Any = None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise Exception("VERBA_STATE_URL needs the redis package, install it with pip install redis")
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    @staticmethod
+    def _name(tenant: str) -> str:
+        return f"verba:state:{tenant}"
+
+    def get(self, tenant: str, key: str) -> Optional[str]:
+        raw = self.client.hget(self._name(tenant), key)
+        return raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+    def set_many(self, tenant: str, values: dict[str, str]) -> None:
+        # One HSET, the keys change together
+        self.client.hset(self._name(tenant), mapping=values)
+
+    def delete(self, tenant: str, key: str) -> bool:
+        return self.client.hdel(self._name(tenant), key) > 0
+
+
+class StateStore:
+    """
+    Mutable tenant settings (OpenAI key, last import options, selected embedder) shared by every worker
+    and replica serving the tenant, so that any of them can answer any request.
+    Values are JSON in a SQLite file for the workers of one host, or in Redis with VERBA_STATE_URL for replicas
+    on several hosts. Reads go through a per-process cache, a change made through one replica is seen by the
+    others within ttl seconds
+    """
+
+    def __init__(self, path: str = STATE_PATH, ttl: float = STATE_CACHE_TTL, url: str = STATE_URL, backend: Any = None):
+        self.ttl = ttl
+        self._cache: dict[tuple[str, str], tuple[float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        if backend is None:
+            backend = RedisStateBackend(url) if url else SQLiteStateBackend(path)
+        self.backend = backend
+
+    def _remember(self, tenant: str, key: str, raw: Optional[str]) -> None:
+        with self._lock:
+            self._cache[(tenant, key)] = (time.monotonic() + self.ttl, raw)
+
+    def get(self, key: str, default: Any = None, tenant: str = TENANT) -> Any:
+        """Value of a key, default if it is not set
+        @parameter key : str - Name of the setting
+        @parameter default : Any - Returned when the key is not set
+        @parameter tenant : str - Tenant the setting belongs to
+        @returns Any - A fresh copy of the value, safe to modify
+        """
+        with self._lock:
+            cached = self._cache.get((tenant, key))
+        if cached is not None and cached[0] > time.monotonic():
+            raw = cached[1]
+        else:
+            raw = self.backend.get(tenant, key)
+            self._remember(tenant, key, raw)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, tenant: str = TENANT) -> None:
+        self.set_many({key: value}, tenant)
+
+    def set_many(self, values: dict[str, Any], tenant: str = TENANT) -> None:
+        """Set several keys in one transaction"""
+        raws = {key: json.dumps(value) for key, value in values.items()}
+        self.backend.set_many(tenant, raws)
+        for key, raw in raws.items():
+            self._remember(tenant, key, raw)
+
+    def delete(self, key: str, tenant: str = TENANT) -> bool:
+        """@returns bool - Whether the key was set"""
+        deleted = self.backend.delete(tenant, key)
+        self._remember(tenant, key, None)
+        return deleted
+
+
+def legacy_api_key(tenant: str = TENANT, directory: str = LEGACY_SHELVE_DIR) -> Optional[str]:
+    """OpenAI key stored by versions that kept it in a local shelve, None if there is none"""
+    path = os.path.join(directory, f"key_cache_{tenant}")
+    if not glob.glob(f"{glob.escape(path)}*"):
+        return None
+    try:
+        with shelve.open(path, flag="r") as db:
+            return db.get("api_key", None)
+    except Exception:
+        return None
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+import pytest
+
+from goldenverba.server.admission import AdmissionController, Rejected
+
+
+def test_queued_queries_overtake_queued_uploads(tmp_path):
+    async def scenario():
+        controller = AdmissionController(
+            global_limit=1,
+            kind_limits={"query": 1, "ingest": 1},
+            queue_size=4,
+            max_wait=5,
+            path=str(tmp_path / "admission.json"),
+        )
+        order = []
+        release = asyncio.Event()
+
+        async def request(kind, name):
+            async with controller.admit(kind):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.ensure_future(request("ingest", "upload 1"))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.ensure_future(request("ingest", "upload 2")),
+            asyncio.ensure_future(request("query", "question")),
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(first, *waiting)
+        return order, controller.active
+
+    order, active = asyncio.run(scenario())
+    assert order == ["upload 1", "question", "upload 2"]
+    assert active == 0
+
+
+def test_full_queue_and_timeout_are_rejected_with_retry_after(tmp_path):
+    async def scenario():
+        controller = AdmissionController(
+            global_limit=4, kind_limits={"query": 1}, queue_size=1, max_wait=0.05, path=str(tmp_path / "admission.json")
+        )
+        holding = asyncio.Event()
+        blocker = asyncio.Event()
+
+        async def hold():
+            async with controller.admit("query"):
+                holding.set()
+                await blocker.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await holding.wait()
+        queued = asyncio.ensure_future(controller.admit("query").__aenter__())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Rejected) as full:
+            async with controller.admit("query"):
+                pass
+        with pytest.raises(Rejected) as timeout:
+            await queued
+        blocker.set()
+        await holder
+        return full.value, timeout.value, controller
+
+    full, timeout, controller = asyncio.run(scenario())
+    assert (full.reason, timeout.reason) == ("queue_full", "timeout")
+    assert full.retry_after >= 1
+    assert controller.active == 0 and controller.queued["query"] == 0
+
+
+def test_workers_of_the_host_share_the_limits(tmp_path):
+    async def scenario():
+        # Two controllers on one state file stand for two workers of `verba start --workers 2`
+        path = str(tmp_path / "admission.json")
+        workers = [
+            AdmissionController(global_limit=1, kind_limits={"query": 1}, max_wait=5, path=path) for _ in range(2)
+        ]
+        order = []
+        release = asyncio.Event()
+
+        async def request(worker, name):
+            async with workers[worker].admit("query"):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.ensure_future(request(0, "worker 0"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(request(1, "worker 1"))
+        await asyncio.sleep(0.1)
+        waiting = list(order)
+        release.set()
+        await asyncio.gather(first, second)
+        return waiting, order, [worker.active for worker in workers]
+
+    waiting, order, active = asyncio.run(scenario())
+    assert waiting == ["worker 0"]
+    assert order == ["worker 0", "worker 1"]
+    assert active == [0, 0]
+
+
+def test_slots_of_dead_processes_are_freed(tmp_path):
+    path = tmp_path / "admission.json"
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    path.write_text(json.dumps({"slots": {f"{dead.stdout.strip()}:0": [int(dead.stdout), "query"]}}))
+
+    async def scenario():
+        controller = AdmissionController(global_limit=1, kind_limits={"query": 1}, max_wait=0.05, path=str(path))
+        async with controller.admit("query"):
+            pass
+
+    asyncio.run(scenario())
+    assert json.loads(path.read_text())["slots"] == {}
@@ -0,0 +1,46 @@
+from goldenverba.server import api
+from goldenverba.server.state import StateStore
+
+
+def make_payload(chunker, units, overlap):
+    return api.LoadPayload(
+        reader="SimpleReader",
+        chunker=chunker,
+        embedder="ADAEmbedder",
+        fileBytes=["aGVsbG8="],
+        fileNames=["hello.txt"],
+        filePath="",
+        document_type="Documentation",
+        chunkUnits=units,
+        chunkOverlap=overlap,
+    )
+
+
+def test_invalid_chunk_settings_are_not_remembered(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "state", StateStore(str(tmp_path / "state.sqlite")))
+    payload = make_payload("WordChunker", 10, 10)
+
+    response = api.import_payload(payload)
+
+    assert b'"status":"400"' in response.body
+    assert api.state.get(api.chunk_settings_key("WordChunker")) is None
+    assert api.state.get("last_options") is None
+
+
+def test_replicas_keep_each_others_chunk_settings(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.sqlite")
+    first, second = StateStore(path, ttl=60), StateStore(path, ttl=60)
+    # Both replicas have read the settings before either saved
+    for store in (first, second):
+        for chunker in ("WordChunker", "SentenceChunker"):
+            store.get(api.chunk_settings_key(chunker))
+
+    monkeypatch.setattr(api, "state", first)
+    api.remember_options(make_payload("WordChunker", 80, 20))
+    monkeypatch.setattr(api, "state", second)
+    api.remember_options(make_payload("SentenceChunker", 4, 1))
+
+    reader = StateStore(path)
+    assert reader.get(api.chunk_settings_key("WordChunker")) == {"units": 80, "overlap": 20}
+    assert reader.get(api.chunk_settings_key("SentenceChunker")) == {"units": 4, "overlap": 1}
+    assert reader.get("last_options")["last_chunker"] == "SentenceChunker"
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+import time
+
+from goldenverba.server import api
+from goldenverba.server.state import StateStore
+
+
+def test_key_changes_reinitialize_once_off_the_event_loop(tmp_path, monkeypatch):
+    store = StateStore(str(tmp_path / "state.sqlite"), ttl=0)
+    monkeypatch.setattr(api, "state", store)
+    monkeypatch.setattr(api, "manager", object())
+    monkeypatch.setattr(api, "synced_key", "sk-old")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    store.set("api_key", "sk-new")
+
+    calls = []
+
+    def init_manager():
+        # A blocking Weaviate connection
+        calls.append(threading.current_thread().name)
+        time.sleep(0.3)
+
+    monkeypatch.setattr(api, "init_manager", init_manager)
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        await asyncio.gather(*[api.check_manager_initialized() for _ in range(5)])
+        ticker.cancel()
+        return ticks
+
+    ticks = asyncio.run(run())
+    assert len(calls) == 1 and calls[0] != threading.main_thread().name
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.2
+    assert api.synced_key == "sk-new"
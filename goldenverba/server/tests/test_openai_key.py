@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+from types import SimpleNamespace
+
+from goldenverba.server import api
+
+
+def test_key_test_waits_for_the_limiter_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("VERBA_MODEL", "gpt-3.5-turbo")
+    monkeypatch.setattr(api, "sync_api_key", lambda: None)
+    # A throttled limiter, as acquire waits with time.sleep
+    monkeypatch.setattr(api, "get_openai_limiter", lambda: SimpleNamespace(acquire=lambda **kwargs: time.sleep(0.3)))
+    monkeypatch.setattr(api.openai.ChatCompletion, "create", lambda **kwargs: {"choices": []})
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        response = await api.test_openai_api_key()
+        ticker.cancel()
+        return response, ticks
+
+    response, ticks = asyncio.run(run())
+    assert b'"status":"200"' in response.body
+    assert len(ticks) > 10
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.2
@@ -0,0 +1,58 @@
+import pytest
+
+from click.testing import CliRunner
+
+from goldenverba.ingestion.embedding.interface import Embedder
+from goldenverba.ingestion.reader.corpus import VerbaCorpus
+from goldenverba.server import cli
+
+
+class WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    monkeypatch.setattr("goldenverba.ingestion.chunking.manager.get_encoding", lambda: WordEncoding())
+
+
+class LengthEmbedder(Embedder):
+    def __init__(self):
+        super().__init__()
+        self.name = "LengthEmbedder"
+        self.vectorizer = "MiniLM"
+        self.cache_model = "length"
+
+    def vectorize_chunks(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def prepare(tmp_path, *options):
+    source = tmp_path / "notes.txt"
+    source.write_text("One two three four five six seven eight nine ten.", encoding="utf-8")
+    output = str(tmp_path / "notes.verba")
+    result = CliRunner().invoke(
+        cli.prepare,
+        ["--reader", "SimpleReader", "--path", str(source), "--output", output, "--units", "4", "--overlap", "1", *options],
+    )
+    assert result.exit_code == 0, result.output
+    return VerbaCorpus(output)
+
+
+def test_prepare_only_chunks_without_an_embedder(tmp_path):
+    corpus = prepare(tmp_path)
+    assert corpus.vectors is None and corpus.vectorizer == ""
+    assert corpus.document(0).chunks
+
+
+def test_prepare_embeds_with_the_given_embedder(tmp_path, monkeypatch):
+    monkeypatch.setenv("VERBA_EMBEDDING_CACHE_MAX_MB", "0")
+    monkeypatch.setattr(cli.EmbeddingManager, "get_embedder", lambda self, embedder=None: LengthEmbedder())
+
+    corpus = prepare(tmp_path, "--embedder", "MiniLMEmbedder")
+
+    assert corpus.vectorizer == "MiniLM"
+    chunks = corpus.document(0).chunks
+    assert corpus.vectors.shape == (len(chunks), 2)
+    assert [list(chunk.vector) for chunk in chunks] == [[float(len(chunk.text)), 1.0] for chunk in chunks]
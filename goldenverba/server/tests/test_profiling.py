@@ -0,0 +1,53 @@
+import pytest
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from goldenverba.server import profiling
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setenv("VERBA_ADMIN_TOKEN", "secret")
+
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work(request: Request):
+        with profiling.maybe_profile(request) as profile:
+            total = sum(range(1000))
+        return profiling.attach_profile(JSONResponse({"total": total}), profile)
+
+    @app.get("/summary/{profile_id}")
+    async def summary(profile_id: str):
+        return JSONResponse({"text": profiling.profile_summary(profile_id)})
+
+    return TestClient(app)
+
+
+def test_unprofiled_request_stores_nothing(client, tmp_path):
+    response = client.get("/work")
+    assert response.status_code == 200
+    assert profiling.PROFILE_ID_HEADER not in response.headers
+    assert profiling.list_profiles() == []
+
+
+def test_profile_requires_admin_token(client):
+    assert client.get("/work", headers={profiling.PROFILE_HEADER: "1"}).status_code == 403
+    response = client.get(
+        "/work?profile=1", headers={profiling.ADMIN_TOKEN_HEADER: "wrong"}
+    )
+    assert response.status_code == 403
+
+
+def test_profiled_request_stores_a_pstats_file(client):
+    response = client.get(
+        "/work",
+        headers={profiling.PROFILE_HEADER: "1", profiling.ADMIN_TOKEN_HEADER: "secret"},
+    )
+    profile_id = response.headers[profiling.PROFILE_ID_HEADER]
+    assert [profile["id"] for profile in profiling.list_profiles()] == [profile_id]
+    assert "cumulative" in client.get(f"/summary/{profile_id}").json()["text"]
+    assert client.get("/summary/../../etc").status_code == 404
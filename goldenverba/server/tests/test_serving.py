@@ -0,0 +1,47 @@
+import threading
+
+from types import SimpleNamespace
+
+import pytest
+
+from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+from goldenverba.ingestion.embedding.manager import EmbeddingManager
+from goldenverba.ingestion.schema import schema_generation
+from goldenverba.server import serving
+
+
+@pytest.fixture(autouse=True)
+def fresh_readiness(monkeypatch):
+    monkeypatch.setattr(serving, "_ready", threading.Event())
+
+
+def fake_api(client):
+    manager = SimpleNamespace(
+        client=client,
+        embedder_manager=EmbeddingManager(),
+        check_verba_component=lambda component: (False, "not installed"),
+    )
+    return SimpleNamespace(manager=manager, chunker={}, selected_embedder=lambda: "ADAEmbedder")
+
+
+def test_ready_only_once_weaviate_and_schema_answer():
+    client = FakeWeaviateClient(latency_ms=0)
+    api = fake_api(client)
+
+    with pytest.raises(Exception, match="missing"):
+        serving.warm_up(api)
+    assert not serving.is_ready()
+
+    schema_generation.init_documents(client, "text2vec-openai")
+    stages = serving.warm_up(api)
+    assert serving.is_ready()
+    assert {"weaviate", "schema", "encoder", "chunkers", "embedding"} <= set(stages)
+
+
+def test_draining_is_not_ready(monkeypatch):
+    serving.warm_up(SimpleNamespace(manager=None))
+    assert serving.is_ready()
+
+    monkeypatch.setattr(serving._draining, "value", True)
+    assert not serving.is_ready()
+    assert serving.is_draining()
@@ -0,0 +1,70 @@
+import shelve
+import time
+
+from goldenverba.server.state import RedisStateBackend, StateStore, legacy_api_key
+
+
+def test_replicas_see_each_others_changes_after_the_ttl(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first = StateStore(path, ttl=0.2)
+    second = StateStore(path, ttl=0.2)
+
+    assert second.get("last_options", {}) == {}
+    first.set("last_options", {"last_chunker": "SentenceChunker"})
+    assert first.get("last_options") == {"last_chunker": "SentenceChunker"}
+    # Served from the cache of the second replica until it expires
+    assert second.get("last_options", {}) == {}
+
+    time.sleep(0.25)
+    assert second.get("last_options") == {"last_chunker": "SentenceChunker"}
+
+    assert second.delete("last_options")
+    assert not second.delete("last_options")
+    time.sleep(0.25)
+    assert first.get("last_options") is None
+
+
+def test_values_are_per_tenant_and_copied(tmp_path):
+    store = StateStore(str(tmp_path / "state.sqlite"))
+    store.set_many({"chunk_settings": {"WordChunker": {"units": 100}}, "api_key": "sk-a"}, tenant="a")
+
+    settings = store.get("chunk_settings", tenant="a")
+    settings["WordChunker"]["units"] = 5
+    assert store.get("chunk_settings", tenant="a") == {"WordChunker": {"units": 100}}
+    assert store.get("api_key", tenant="b") is None
+
+
+def test_legacy_shelve_key(tmp_path):
+    assert legacy_api_key("tenant", str(tmp_path)) is None
+    with shelve.open(str(tmp_path / "key_cache_tenant")) as db:
+        db["api_key"] = "sk-legacy"
+    assert legacy_api_key("tenant", str(tmp_path)) == "sk-legacy"
+
+
+class HashClient:
+    """The Redis hash commands the state store uses"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hget(self, name, key):
+        value = self.hashes.get(name, {}).get(key)
+        return None if value is None else value.encode("utf-8")
+
+    def hset(self, name, mapping):
+        self.hashes.setdefault(name, {}).update(mapping)
+
+    def hdel(self, name, key):
+        return 1 if self.hashes.get(name, {}).pop(key, None) is not None else 0
+
+
+def test_replicas_on_several_hosts_share_a_redis_backend():
+    client = HashClient()
+    first = StateStore(ttl=0, backend=RedisStateBackend("redis://state:6379/0", client=client))
+    second = StateStore(ttl=0, backend=RedisStateBackend("redis://state:6379/0", client=client))
+
+    first.set_many({"api_key": "sk-a", "last_options": {"last_chunker": "WordChunker"}}, tenant="a")
+    assert second.get("last_options", tenant="a") == {"last_chunker": "WordChunker"}
+    assert second.get("api_key", tenant="b") is None
+    assert second.delete("api_key", tenant="a")
+    assert first.get("api_key", tenant="a") is None
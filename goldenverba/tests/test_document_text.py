@@ -0,0 +1,64 @@
+import base64
+
+from goldenverba.ingestion.pipeline import PipelineSpec
+
+
+class WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def test_metadata_only_documents_rebuild_their_text(monkeypatch):
+    monkeypatch.setenv("VERBA_WEAVIATE_STANDIN", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("goldenverba.ingestion.chunking.manager.get_encoding", lambda: WordEncoding())
+    monkeypatch.setattr("goldenverba.ingestion.embedding.interface.STORE_DOCUMENT_TEXT", False)
+    from goldenverba.verba_manager import VerbaManager
+
+    manager = VerbaManager()
+    text = "\n".join(f"Line {i} of the handbook." for i in range(40))
+    encoded = base64.b64encode(text.encode("utf-8")).decode("ascii")
+    spec = PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=20, overlap=10)
+    documents = manager.ingest(spec, [encoded], [], [""], ["handbook.txt"])
+    doc_id = documents[0].chunks[0].doc_uuid
+    total = len(documents[0].chunks)
+
+    stored = manager.client.data_object.get_by_id(doc_id, class_name="Document_text2vec_openai", tenant="default_tenant")
+    assert stored["properties"]["text"] == ""
+
+    document = manager.retrieve_document(doc_id)
+    assert document["properties"]["text"] == text
+    assert document["chunk_range"] == {"start": 0, "end": total, "total": total}
+
+    pages = [
+        manager.retrieve_document(doc_id, chunk_start=start, chunk_limit=7)
+        for start in range(0, total, 7)
+    ]
+    assert "".join(page["properties"]["text"] for page in pages) == text
+    assert pages[-1]["chunk_range"]["end"] == total
+
+
+def test_documents_the_chunks_do_not_rebuild_keep_their_text(monkeypatch):
+    monkeypatch.setenv("VERBA_WEAVIATE_STANDIN", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("goldenverba.ingestion.chunking.manager.get_encoding", lambda: WordEncoding())
+    monkeypatch.setattr("goldenverba.ingestion.embedding.interface.STORE_DOCUMENT_TEXT", False)
+    from goldenverba.verba_manager import VerbaManager
+
+    manager = VerbaManager()
+    paragraphs = "\n\n".join(f"Paragraph {i} of the notes." for i in range(10))
+    # The trailing space follows the last word and is in no chunk
+    texts = {"paragraphs.txt": paragraphs, "trailing.txt": paragraphs + " "}
+    spec = PipelineSpec("SimpleReader", "WordChunker", "ADAEmbedder", units=12, overlap=0)
+    encoded = [base64.b64encode(text.encode("utf-8")).decode("ascii") for text in texts.values()]
+    documents = manager.ingest(spec, encoded, [], ["", ""], list(texts))
+
+    stored = {
+        document.name: manager.client.data_object.get_by_id(
+            document.chunks[0].doc_uuid, class_name="Document_text2vec_openai", tenant="default_tenant"
+        )["properties"]["text"]
+        for document in documents
+    }
+    assert stored == {"paragraphs.txt": "", "trailing.txt": paragraphs + " "}
+    for document in documents:
+        assert manager.retrieve_document(document.chunks[0].doc_uuid)["properties"]["text"] == texts[document.name]
@@ -0,0 +1,53 @@
+import pytest
+
+from goldenverba.memory import (
+    MB,
+    MemoryLimitExceeded,
+    MemoryTracker,
+    check_upload,
+    memory_stage,
+    plan_batches,
+    rss_bytes,
+    upload_sizes,
+)
+
+
+def test_tracker_records_the_peak_of_each_stage():
+    assert rss_bytes() > 0
+    with MemoryTracker(interval=0.001) as tracker:
+        with memory_stage("chunk"):
+            buffer = bytearray(64 * MB)
+            buffer[::4096] = b"x" * len(buffer[::4096])
+        del buffer
+    report = tracker.to_dict()
+    assert report["peak_mb"] >= report["start_mb"] + 32
+    assert report["stages_peak_mb"]["chunk"] >= report["start_mb"] + 32
+
+    # Without an active tracker stages are a no-op
+    with memory_stage("embed") as inactive:
+        assert inactive is None
+
+
+def test_soft_limit_batches_or_rejects_uploads():
+    assert plan_batches([10, 20, 30], None) == [[0, 1, 2]]
+    assert plan_batches([10, 20, 30], headroom=600, factor=10) == [[0, 1, 2]]
+    assert plan_batches([10, 20, 30, 5], headroom=350, factor=10) == [[0, 1], [2, 3]]
+
+    check_upload([10, 20], headroom=None)
+    with pytest.raises(MemoryLimitExceeded):
+        check_upload([10, 40], headroom=350, factor=10)
+    with pytest.raises(MemoryLimitExceeded):
+        plan_batches([10, 40], headroom=350, factor=10)
+
+
+def test_upload_sizes_cover_texts_and_paths(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.txt").write_text("a" * 30)
+    (tmp_path / "docs" / "b.md").write_text("b" * 40)
+    (tmp_path / "c.txt").write_text("c" * 50)
+
+    sizes = upload_sizes(["QUJD"], ["été"], [str(tmp_path / "c.txt"), str(tmp_path / "docs"), ""])
+    assert sizes[:3] == [3, 5, 50]
+    assert sorted(sizes[3:]) == [30, 40]
+    with pytest.raises(MemoryLimitExceeded):
+        check_upload(upload_sizes([], [], [str(tmp_path / "c.txt")]), headroom=450, factor=10)
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from goldenverba.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    MetricsMiddleware,
+    HTTP_REQUEST_SECONDS,
+)
+
+
+def test_render_prometheus_text_format():
+    registry = Registry()
+    counter = registry.register(Counter("verba_test_total", "Test counter", ("cache",)))
+    histogram = registry.register(
+        Histogram("verba_test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1.0))
+    )
+
+    counter.inc(cache="semantic", tenant="t1")
+    counter.inc(2, cache="semantic", tenant="t1")
+    histogram.observe(0.05, stage="llm", tenant="t1")
+    histogram.observe(0.5, stage="llm", tenant="t1")
+    histogram.observe(5.0, stage="llm", tenant="t1")
+
+    text = registry.render()
+    assert "# TYPE verba_test_total counter" in text
+    assert 'verba_test_total{tenant="t1",cache="semantic"} 3.0' in text
+    assert 'verba_test_seconds_bucket{tenant="t1",stage="llm",le="0.1"} 1' in text
+    assert 'verba_test_seconds_bucket{tenant="t1",stage="llm",le="1.0"} 2' in text
+    assert 'verba_test_seconds_bucket{tenant="t1",stage="llm",le="+Inf"} 3' in text
+    assert 'verba_test_seconds_count{tenant="t1",stage="llm"} 3' in text
+
+
+def test_timer_overhead_is_negligible():
+    histogram = Histogram("verba_overhead_seconds", "Overhead", ("stage",))
+    iterations = 20000
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with histogram.time(stage="noop"):
+            pass
+    per_call = (time.perf_counter() - start) / iterations
+
+    assert histogram.count(stage="noop") == iterations
+    # Stages take milliseconds to seconds, a timer must stay in the microsecond range
+    assert per_call < 50e-6
+
+
+def test_middleware_tracks_api_requests_only():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope["path"])
+        await send({"type": "http.response.start", "status": 204})
+
+    async def send(message):
+        pass
+
+    routes = Starlette(
+        routes=[Route("/api/health", app), Route("/api/profiles/{profile_id}", app)]
+    )
+
+    def request(path):
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": path, "app": routes}, None, send))
+
+    middleware = MetricsMiddleware(app)
+    before = {
+        path: HTTP_REQUEST_SECONDS.count(path=path, status=204)
+        for path in ("/api/health", "/api/profiles/{profile_id}", "other")
+    }
+    request("/api/health")
+    request("/static/app.js")
+    request("/api/profiles/1a2b")
+    request("/api/profiles/3c4d")
+    request("/api/wp-login.php")
+
+    assert seen == ["/api/health", "/static/app.js", "/api/profiles/1a2b", "/api/profiles/3c4d", "/api/wp-login.php"]
+    assert HTTP_REQUEST_SECONDS.count(path="/api/health", status=204) == before["/api/health"] + 1
+    # One series per route template, unknown paths share one
+    assert HTTP_REQUEST_SECONDS.count(path="/api/profiles/{profile_id}", status=204) == before["/api/profiles/{profile_id}"] + 2
+    assert HTTP_REQUEST_SECONDS.count(path="/api/profiles/1a2b", status=204) == 0
+    assert HTTP_REQUEST_SECONDS.count(path="other", status=204) == before["other"] + 1
+    assert HTTP_REQUEST_SECONDS.count(path="/static/app.js", status=204) == 0
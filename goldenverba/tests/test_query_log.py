@@ -0,0 +1,27 @@
+import json
+
+from goldenverba.query_log import QueryLogWriter, normalize_query
+
+
+def test_normalize_query_ignores_case_spacing_and_punctuation():
+    assert normalize_query("  How are   REFUNDS settled? ") == "how are refunds settled"
+    assert normalize_query("How are refunds settled") == normalize_query("how are refunds\tsettled?!")
+
+
+def test_writer_appends_json_lines_and_rotates(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    writer = QueryLogWriter(str(path), max_bytes=200, backups=2, flush_interval=0.01)
+    for i in range(20):
+        assert writer.write({"kind": "query", "query": f"question {i}"})
+        writer.flush()
+    writer.close()
+    assert not writer.write({"kind": "query", "query": "after close"})
+
+    assert sorted(file.name for file in tmp_path.iterdir()) == [
+        "queries.jsonl",
+        "queries.jsonl.1",
+        "queries.jsonl.2",
+    ]
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(path.read_bytes()) <= 200
+    assert records[-1]["query"] == "question 19"
@@ -0,0 +1,67 @@
+import multiprocessing
+import time
+
+import pytest
+
+from goldenverba.ratelimit import BULK, INTERACTIVE, RateLimitTimeout, SharedRateLimiter
+
+
+def test_disabled_limiter_is_a_no_op(tmp_path):
+    limiter = SharedRateLimiter(rpm=0, tpm=0, path=str(tmp_path / "state.json"))
+    assert limiter.acquire(tokens=10**9) == 0.0
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_bulk_calls_leave_the_reserve_to_interactive_calls(tmp_path):
+    path = str(tmp_path / "state.json")
+    bulk = SharedRateLimiter(rpm=600, tpm=1000, path=path, tenant="a", reserve=0.2)
+    chat = SharedRateLimiter(rpm=600, tpm=1000, path=path, tenant="b", reserve=0.2)
+
+    bulk.acquire(tokens=800, priority=BULK)
+    with pytest.raises(RateLimitTimeout):
+        bulk.acquire(tokens=100, priority=BULK, timeout=0.1)
+    assert chat.acquire(tokens=150, priority=INTERACTIVE, timeout=0.1) < 0.1
+
+    # Reported usage gives back what the estimate took in excess
+    chat.settle(150, {"total_tokens": 50})
+    assert chat.acquire(tokens=100, priority=INTERACTIVE, timeout=0.1) < 0.1
+
+
+def test_batches_larger_than_the_bucket_run_once_it_is_full(tmp_path):
+    limiter = SharedRateLimiter(rpm=100, tpm=0, path=str(tmp_path / "state.json"), reserve=0.2)
+
+    # The full bucket fits it at the first attempt
+    acquired, _ = limiter._try_acquire(100, 0, BULK)
+    assert acquired
+    # The batch left the bucket in debt, the next call waits for the refill
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(requests=1, priority=INTERACTIVE, timeout=0.1)
+
+
+def _take(path, tenant, results):
+    limiter = SharedRateLimiter(rpm=120, tpm=0, path=path, tenant=tenant, reserve=0)
+    for _ in range(3):
+        limiter.acquire(priority=BULK, timeout=10)
+        results.put((tenant, time.time()))
+
+
+def test_processes_share_the_buckets_fairly(tmp_path):
+    path = str(tmp_path / "state.json")
+    # Drain the request bucket so that the two processes compete for the refill of 2 requests per second
+    SharedRateLimiter(rpm=120, tpm=0, path=path, tenant="warmup").acquire(requests=120, priority=INTERACTIVE)
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_take, args=(path, tenant, results)) for tenant in ("a", "b")
+    ]
+    start = time.time()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    grants = sorted((results.get(timeout=1) for _ in range(6)), key=lambda grant: grant[1])
+
+    # 6 requests at 2 per second, alternating between the tenants
+    assert grants[-1][1] - start >= 2.5
+    assert {tenant for tenant, _ in grants[:2]} == {"a", "b"}
+    assert {tenant for tenant, _ in grants[2:4]} == {"a", "b"}
@@ -0,0 +1,41 @@
+import contextvars
+
+from goldenverba.metrics import Histogram
+from goldenverba.tracing import (
+    current_trace,
+    start_trace,
+    count_weaviate_call,
+    record_token_usage,
+)
+
+
+def run_request():
+    trace = start_trace()
+    histogram = Histogram("verba_trace_test_seconds", "Trace test", ("stage",))
+    with histogram.time(stage="hybrid_search"):
+        count_weaviate_call()
+    for _ in range(3):
+        with histogram.time(stage="window_expansion"):
+            count_weaviate_call()
+    record_token_usage({"prompt_tokens": 812, "completion_tokens": 97})
+    return trace
+
+
+def test_stage_timers_feed_the_active_trace():
+    trace = contextvars.copy_context().run(run_request)
+
+    timings = trace.to_dict()
+    assert set(timings["stages_ms"]) == {"hybrid_search", "window_expansion"}
+    assert timings["weaviate_calls"] == 4
+    assert (timings["prompt_tokens"], timings["completion_tokens"]) == (812, 97)
+
+    header = trace.server_timing()
+    assert header.startswith("hybrid_search;dur=")
+    assert "window_expansion;dur=" in header
+    assert 'weaviate;desc="4 calls"' in header
+    assert ", total;dur=" in header
+
+
+def test_recording_without_a_trace_is_a_no_op():
+    assert contextvars.copy_context().run(current_trace) is None
+    contextvars.copy_context().run(count_weaviate_call)
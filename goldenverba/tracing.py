@@ -0,0 +1,102 @@
+import time
+
+from contextvars import ContextVar
+from typing import Optional
+
+
+class QueryTrace:
+    """
+    Latency breakdown of a single request: seconds per stage, number of Weaviate calls and OpenAI token usage.
+    The active trace lives in a context variable so that engines record into it without threading it through every call
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.weaviate_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit = False
+        self.coalesced = False
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        # A stage can run several times per request, e.g. one lookup per neighbor chunk
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "stages_ms": {
+                stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()
+            },
+            "total_ms": round(self.total() * 1000, 2),
+            "weaviate_calls": self.weaviate_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit": self.cache_hit,
+            "coalesced": self.coalesced,
+        }
+
+    def server_timing(self) -> str:
+        """Render the trace as a Server-Timing header value (durations in milliseconds)"""
+        metrics = [
+            f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()
+        ]
+        metrics.append(f'weaviate;desc="{self.weaviate_calls} calls"')
+        metrics.append(
+            f'tokens;desc="{self.prompt_tokens} prompt, {self.completion_tokens} completion"'
+        )
+        metrics.append(f"total;dur={self.total() * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar(
+    "verba_query_trace", default=None
+)
+
+
+def start_trace() -> QueryTrace:
+    """Start a new trace for the current request and make it the active one"""
+    trace = QueryTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current_trace.get()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_stage(stage, seconds)
+
+
+def count_weaviate_call(calls: int = 1) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.weaviate_calls += calls
+
+
+def record_token_usage(usage: Optional[dict]) -> None:
+    """Add the usage block of an OpenAI response to the active trace"""
+    trace = _current_trace.get()
+    if trace is not None and usage:
+        trace.prompt_tokens += int(usage.get("prompt_tokens", 0))
+        trace.completion_tokens += int(usage.get("completion_tokens", 0))
+
+
+def mark_cache_hit() -> None:
+    """The answer of the active request came from the semantic cache"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.cache_hit = True
+
+
+def mark_coalesced() -> None:
+    """The answer of the active request was computed by an identical request in flight"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.coalesced = True
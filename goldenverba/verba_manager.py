@@ -1,10 +1,12 @@
 import os
 import ssl
+import importlib.util
 
 import weaviate
 
 from typing import Optional
 from weaviate import Client
+from weaviate.batch import Batch
 from weaviate.embedded import EmbeddedOptions
 from wasabi import msg
 
@@ -12,11 +14,16 @@ from goldenverba.ingestion.reader.manager import ReaderManager
 from goldenverba.ingestion.chunking.manager import ChunkerManager
 from goldenverba.ingestion.embedding.manager import EmbeddingManager
 from goldenverba.ingestion.reader.document import Document
+from goldenverba.ingestion.reader.corpus import VerbaCorpus
 from goldenverba.ingestion.reader.interface import Reader
 from goldenverba.ingestion.chunking.interface import Chunker
+from goldenverba.ingestion.chunking.chunk import join_chunks
 from goldenverba.ingestion.embedding.interface import Embedder
 
 from goldenverba.ingestion.component import VerbaComponent
+from goldenverba.ingestion.pipeline import BatchPool, IngestIncomplete, PipelineSpec
+from goldenverba.metrics import INGEST_STAGE_SECONDS, record_weaviate_error
+from goldenverba.memory import check_upload, headroom_bytes, memory_stage, plan_batches, upload_sizes
 
 import goldenverba.ingestion.schema.schema_generation as schema_manager
 
@@ -33,6 +40,7 @@ class VerbaManager:
         self.installed_libraries = {}
         self.weaviate_type = ""
         self.client = self.setup_client()
+        self.batches = BatchPool(self.client, self.new_batch)
 
         self.verify_installed_libraries()
         self.verify_variables()
@@ -40,11 +48,7 @@ class VerbaManager:
         self.last_error=None
 
         # Check if all schemas exist for all possible vectorizers
-        for vectorizer in schema_manager.VECTORIZERS:
-            schema_manager.init_schemas(self.client, vectorizer, False, True)
-
-        for embedding in schema_manager.EMBEDDINGS:
-            schema_manager.init_schemas(self.client, embedding, False, True)
+        self.bootstrap_schemas([TENANT])
 
     def import_data(
         self,
@@ -56,29 +60,129 @@ class VerbaManager:
         units: int = 100,
         overlap: int = 50,
     ) -> list[Document]:
-        loaded_documents = self.reader_manager.load(
-            bytes, contents, paths, fileNames, document_type
+        """Import with the selected components, see ingest"""
+        spec = PipelineSpec(
+            reader=self.selected_key(self.reader_manager.readers, self.reader_manager.selected_reader),
+            chunker=self.selected_key(self.chunker_manager.chunker, self.chunker_manager.selected_chunker),
+            embedder=self.selected_key(self.embedder_manager.embedders, self.embedder_manager.selected_embedder),
+            units=units,
+            overlap=overlap,
+            document_type=document_type,
         )
+        return self.ingest(spec, bytes, contents, paths, fileNames)
+
+    def ingest(
+        self,
+        spec: PipelineSpec,
+        bytes: list[str],
+        contents: list[str],
+        paths: list[str],
+        fileNames: list[str],
+    ) -> list[Document]:
+        """Read, chunk and embed files into Weaviate, safe to run concurrently with other imports
+        @parameter spec : PipelineSpec - Components and chunking settings of this import
+        @parameter bytes : list[str] - Base64 encoded files
+        @parameter contents : list[str] - Texts
+        @parameter paths : list[str] - Paths to files or directories
+        @parameter fileNames : list[str] - Names of the encoded files
+        @returns list[Document] - Imported documents
+        @raises IngestIncomplete - A batch failed after earlier batches were imported
+        """
+        self.check_pipeline(spec)
+
+        # Raises MemoryLimitExceeded before anything is decoded or read
+        headroom = headroom_bytes()
+        if headroom is not None:
+            check_upload(upload_sizes(bytes, contents, paths), headroom)
+
+        with memory_stage("read"), INGEST_STAGE_SECONDS.time(stage="read"):
+            loaded_documents = self.reader_manager.load(
+                bytes, contents, paths, fileNames, spec.document_type, spec.reader
+            )
 
         filtered_documents = []
 
         # Check if document names exist in DB
         for document in loaded_documents:
-            if not self.check_if_document_exits(document):
+            if not self.check_if_document_exits(document, spec.embedder):
                 filtered_documents.append(document)
 
-        modified_documents = self.chunker_manager.chunk(
-            filtered_documents, units, overlap
+        batches = plan_batches(
+            [len(document.text) for document in filtered_documents], headroom_bytes()
         )
-        try:
-            if self.embedder_manager.embed(modified_documents, client=self.client):
-                msg.good("Embedding successful")
-                return modified_documents
-            else:
+        if len(batches) > 1:
+            msg.warn(
+                f"Import of {len(filtered_documents)} documents exceeds the memory soft limit, importing them in {len(batches)} batches"
+            )
+
+        imported_documents = []
+        for batch in batches:
+            with memory_stage("chunk"):
+                modified_documents = self.chunker_manager.chunk(
+                    [filtered_documents[i] for i in batch], spec.units, spec.overlap, spec.chunker
+                )
+            with self.batches.lease() as client:
+                try:
+                    with memory_stage("embed"):
+                        embedded = self.embedder_manager.embed(
+                            modified_documents, client=client, embedder=spec.embedder
+                        )
+                except Exception as e:
+                    cause = f"Embedding failed.\nCause: {e}\nPossible root cause:{client.pop_last_error()}"
+                    if imported_documents:
+                        raise IngestIncomplete(cause, imported_documents) from e
+                    raise Exception(cause)
+            if not embedded:
                 msg.fail("Embedding failed")
+                # The earlier batches are in Weaviate, report them instead of nothing
+                if imported_documents:
+                    raise IngestIncomplete("Embedding failed", imported_documents)
                 return []
-        except Exception as e:
-            raise Exception(f"Embedding failed.\nCause: {e}\nPossible root cause:{self.pop_last_error()}" )
+            if len(batches) > 1:
+                # Only the chunk count is needed once a batch is in Weaviate
+                for document in modified_documents:
+                    for chunk in document.chunks:
+                        chunk.set_tokens([])
+                        chunk.set_vector(None)
+            imported_documents += modified_documents
+
+        msg.good("Embedding successful")
+        return imported_documents
+
+    def import_corpus(self, file_path: str) -> int:
+        """Stream a prepared .verba corpus into Weaviate, one document at a time, without re-chunking
+        @parameter file_path : str - Path to the .verba corpus file
+        @returns int - Number of imported documents
+        """
+        corpus = VerbaCorpus(file_path)
+        embedder = self.embedder_manager.selected_embedder
+
+        if corpus.vectors is not None and corpus.vectorizer != embedder.vectorizer:
+            raise Exception(
+                f"Corpus was embedded with {corpus.vectorizer} but the selected embedder uses {embedder.vectorizer}"
+            )
+
+        imported = 0
+        for document in corpus.iter_documents():
+            if self.check_if_document_exits(document):
+                continue
+
+            # Sets the chunk tokens used to size the Weaviate batches
+            self.chunker_manager.check_chunks([document])
+
+            try:
+                if corpus.vectors is not None:
+                    embedder.import_data([document], self.client)
+                else:
+                    embedder.embed([document], client=self.client)
+            except Exception as e:
+                raise Exception(
+                    f"Corpus import failed.\nCause: {e}\nPossible root cause:{self.pop_last_error()}"
+                )
+            imported += 1
+
+        msg.good(f"Imported {imported}/{corpus.document_count} documents from {file_path}")
+        return imported
 
     def reader_set_reader(self, reader: str) -> bool:
         available, message = self.check_verba_component(
@@ -162,7 +266,13 @@ class VerbaManager:
 
         # Check Verba URL ENV
         weaviate_url = os.environ.get("VERBA_URL", "")
-        if weaviate_url != "":
+        if os.getenv("VERBA_WEAVIATE_STANDIN", "false").lower() == "true":
+            # In-memory stand-in for offline load tests, nothing is persisted
+            from goldenverba.benchmark.fake_weaviate import FakeWeaviateClient
+
+            self.weaviate_type = "Weaviate Stand-in"
+            client = FakeWeaviateClient()
+        elif weaviate_url != "":
             weaviate_key = os.environ.get("VERBA_API_KEY", "")
             self.environment_variables["VERBA_URL"] = True
             self.weaviate_type = "Weaviate Cluster"
@@ -202,6 +312,7 @@ class VerbaManager:
                         if "result" in result and "errors" in result["result"]:
                             if "error" in result["result"]["errors"]:
                                 msg.fail(result["result"])
+                                record_weaviate_error("batch")
                                 self.last_error=result["result"]
 
             client.batch.configure(callback=batch_callback)
@@ -211,6 +322,20 @@ class VerbaManager:
 
         return client
     
+    def reconnect(self) -> None:
+        """Open a new Weaviate connection, in a worker forked from the process that created the manager"""
+        if self.weaviate_type == "Weaviate Stand-in":
+            # Holds no connection, and a new one would start empty
+            return
+        self.client = self.setup_client()
+        self.batches = BatchPool(self.client, self.new_batch)
+
+    def new_batch(self):
+        """Weaviate batch of its own on the connection of the client, for one import at a time"""
+        if hasattr(self.client, "new_batch"):
+            return self.client.new_batch()
+        return Batch(self.client._connection)
+
     def pop_last_error(self):
         last_error=self.last_error
         self.last_error = None
@@ -218,37 +343,18 @@ class VerbaManager:
 
     def verify_installed_libraries(self) -> None:
         """
-        Checks which libraries are installed and fills out the self.installed_libraries dictionary for the frontend to access
+        Checks which libraries are installed and fills out the self.installed_libraries dictionary for the frontend to access.
+        Only looks the libraries up, importing torch or transformers here would cost seconds and hundreds of MB per process
         """
 
-        # spaCy, used for Chunking
-        try:
-            import spacy
-
-            self.installed_libraries["spacy"] = True
-        except Exception as e:
-            self.installed_libraries["spacy"] = False
-
-        try:
-            import openai
-
-            self.installed_libraries["openai"] = True
-        except Exception as e:
-            self.installed_libraries["openai"] = False
-
-        try:
-            import transformers
-
-            self.installed_libraries["transformers"] = True
-        except Exception as e:
-            self.installed_libraries["transformers"] = False
-
-        try:
-            import torch
-
-            self.installed_libraries["torch"] = True
-        except Exception as e:
-            self.installed_libraries["torch"] = False
+        # spaCy is used for Chunking, torch, transformers and onnxruntime for local embeddings
+        for library in ["spacy", "openai", "transformers", "torch", "onnxruntime"]:
+            try:
+                self.installed_libraries[library] = (
+                    importlib.util.find_spec(library) is not None
+                )
+            except (ImportError, ValueError):
+                self.installed_libraries[library] = False
 
     def verify_variables(self) -> None:
         """
@@ -261,12 +367,17 @@ class VerbaManager:
         else:
             self.environment_variables["OPENAI_API_KEY"] = False
 
+        # Local directory of the quantized MiniLM ONNX export
+        self.environment_variables["VERBA_MINILM_ONNX_PATH"] = os.path.isdir(
+            os.environ.get("VERBA_MINILM_ONNX_PATH", "")
+        )
+
     def get_schemas(self) -> dict:
         """
         @returns dict - A dictionary with the schema names and their object count
         """
 
-        schema_info = self.client.schema.get().with_tenant(TENANT)
+        schema_info = self.client.schema.get()
         schemas = {}
 
         for _class in schema_info["classes"]:
@@ -282,13 +393,14 @@ class VerbaManager:
 
         return schemas
 
-    def retrieve_all_documents(self, doc_type: str) -> list:
+    def retrieve_all_documents(self, doc_type: str, embedder: Optional[str] = None) -> list:
         """Return all documents from Weaviate
+        @parameter embedder : Optional[str] - Embedder whose documents to list, default the selected one
         @returns list - Document list
         """
 
         class_name = "Document_" + schema_manager.strip_non_letters(
-            self.embedder_manager.selected_embedder.vectorizer
+            self.embedder_manager.get_embedder(embedder).vectorizer
         )
 
         if doc_type == "":
@@ -324,37 +436,100 @@ class VerbaManager:
         results = query_results["data"]["Get"][class_name]
         return results
 
-    def retrieve_document(self, doc_id: str) -> dict:
-        """Return a document by it's ID (UUID format) from Weaviate
+    def retrieve_document(
+        self,
+        doc_id: str,
+        embedder: Optional[str] = None,
+        chunk_start: int = 0,
+        chunk_limit: Optional[int] = None,
+    ) -> dict:
+        """Return a document by it's ID (UUID format) from Weaviate. The text of a document stored without it is
+        rebuilt from its chunks, optionally only of a range of them
         @parameter doc_id : str - Document ID
-        @returns dict - Document dict
+        @parameter embedder : Optional[str] - Embedder the document was imported with, default the selected one
+        @parameter chunk_start : int - First chunk of the text, for documents stored without text
+        @parameter chunk_limit : Optional[int] - Number of chunks of the text, all by default
+        @returns dict - Document dict, with chunk_range when the text was rebuilt
         """
-        class_name = "Document_" + schema_manager.strip_non_letters(
-            self.embedder_manager.selected_embedder.vectorizer
-        )
+        vectorizer = schema_manager.strip_non_letters(self.embedder_manager.get_embedder(embedder).vectorizer)
+        class_name = "Document_" + vectorizer
 
         document = self.client.data_object.get_by_id(
             doc_id,
             class_name=class_name,
             tenant=TENANT
         )
+        if document is None or document["properties"].get("text"):
+            return document
+
+        total = int(document["properties"].get("chunk_count") or 0)
+        start = min(max(chunk_start, 0), total)
+        end = total if chunk_limit is None else min(total, start + max(chunk_limit, 0))
+        chunks = self.retrieve_chunks("Chunk_" + vectorizer, doc_id, start, end)
+        document["properties"]["text"] = join_chunks(chunks)
+        document["chunk_range"] = {"start": start, "end": end, "total": total}
         return document
 
-    def reset(self):
-        for vectorizer in schema_manager.VECTORIZERS:
-            schema_manager.init_schemas(self.client, vectorizer, False, True,reset=True)
+    def retrieve_chunks(self, class_name: str, doc_id: str, start: int, end: int, page: int = 1000) -> list[dict]:
+        """Chunks of a document with start <= chunk_id < end, ordered by chunk_id"""
+        value_key = schema_manager.filter_value_key(self.client, class_name, "chunk_id")
+        chunks = []
+        for first in range(start, end, page):
+            last = min(first + page, end)
+            results = (
+                self.client.query.get(class_name, ["text", "chunk_id", "span_start", "gap"])
+                .with_tenant(TENANT)
+                .with_where(
+                    {
+                        "operator": "And",
+                        "operands": [
+                            {"path": ["doc_uuid"], "operator": "Equal", "valueText": doc_id},
+                            {"path": ["chunk_id"], "operator": "GreaterThanEqual", value_key: first},
+                            {"path": ["chunk_id"], "operator": "LessThan", value_key: last},
+                        ],
+                    }
+                )
+                .with_limit(last - first)
+                .do()
+            )
+            if "errors" in results:
+                record_weaviate_error("graphql")
+                raise Exception(results["errors"])
+            chunks += results["data"]["Get"][class_name]
+        return sorted(chunks, key=lambda chunk: int(chunk["chunk_id"]))
+
+    def bootstrap_schemas(self, tenants: list[str], reset: bool = False, force: bool = False) -> Optional[dict]:
+        """Create the classes of every vectorizer and embedding and the given tenants in them
+        @parameter tenants : list[str] - Tenants to create
+        @parameter reset : bool - Empty the tenants first
+        @parameter force : bool - Check Weaviate even if the fingerprint says nothing changed
+        @returns Optional[dict] - What bootstrap_schemas did, None if it failed
+        """
+        fingerprint_path = None if force else schema_manager.SCHEMA_FINGERPRINT_PATH
+        try:
+            return schema_manager.bootstrap_schemas(
+                self.client,
+                schema_manager.VECTORIZERS | schema_manager.EMBEDDINGS,
+                tenants,
+                reset=reset,
+                fingerprint_path=fingerprint_path,
+            )
+        except Exception as e:
+            msg.fail(f"Schema initialization failed {str(e)}")
+            return None
 
-        for embedding in schema_manager.EMBEDDINGS:
-            schema_manager.init_schemas(self.client, embedding, False, True,reset=True)
+    def reset(self):
+        self.bootstrap_schemas([TENANT], reset=True)
 
-    def check_if_document_exits(self, document: Document) -> bool:
+    def check_if_document_exits(self, document: Document, embedder: Optional[str] = None) -> bool:
         """Return a document by it's ID (UUID format) from Weaviate
         @parameter document : Document - Document object
+        @parameter embedder : Optional[str] - Embedder of the import, default the selected one
         @returns bool - Whether the doc name exist in the cluster
         """
 
         class_name = "Document_" + schema_manager.strip_non_letters(
-            self.embedder_manager.selected_embedder.vectorizer
+            self.embedder_manager.get_embedder(embedder).vectorizer
         )
 
         results = (
@@ -382,6 +557,24 @@ class VerbaManager:
         else:
             return False
 
+    def check_pipeline(self, spec: PipelineSpec) -> None:
+        """Raise if a component of the spec does not exist or is not available"""
+        for kind, components, key in (
+            ("Reader", self.reader_manager.readers, spec.reader),
+            ("Chunker", self.chunker_manager.chunker, spec.chunker),
+            ("Embedder", self.embedder_manager.embedders, spec.embedder),
+        ):
+            if key not in components:
+                raise Exception(f"{kind} {key} not found")
+            available, message = self.check_verba_component(components[key])
+            if not available:
+                raise Exception(f"{kind} {key} is not available: {message}")
+
+    @staticmethod
+    def selected_key(components: dict, selected: VerbaComponent) -> str:
+        """Key of the selected component, names of components and their keys differ (PDFReader is a PathReader)"""
+        return next(key for key, component in components.items() if component is selected)
+
     def check_verba_component(self, component: VerbaComponent) -> tuple[bool, str]:
         for library in component.requires_library:
             if library in self.installed_libraries:
@@ -399,12 +592,12 @@ class VerbaManager:
 
         return (True, f"Available")
 
-    def delete_document_by_id(self, doc_id: str) -> None:
-        self.embedder_manager.selected_embedder.remove_document_by_id(
+    def delete_document_by_id(self, doc_id: str, embedder: Optional[str] = None) -> None:
+        self.embedder_manager.get_embedder(embedder).remove_document_by_id(
             self.client, doc_id
         )
 
-    def search_documents(self, query: str, doc_type: str) -> list:
-        return self.embedder_manager.selected_embedder.search_documents(
+    def search_documents(self, query: str, doc_type: str, embedder: Optional[str] = None) -> list:
+        return self.embedder_manager.get_embedder(embedder).search_documents(
             self.client, query, doc_type
         )
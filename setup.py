@@ -34,6 +34,10 @@ setup(
         "fastapi>=0.102.0",
         "uvicorn[standard]",
         "click>= 8.1.7",
+        "numpy",
     ],
-    extras_require={"dev": ["pytest", "wheel", "twine", "black", "setuptools"]},
+    extras_require={
+        "dev": ["pytest", "wheel", "twine", "black", "setuptools"],
+        "redis": ["redis"],
+    },
 )
@@ -118,14 +118,17 @@ def main(verba_port, verba_base_url, chunk_size):
                     log.debug(f"User prompt : {prompt}")
                     response, documents = None, None
                     if prompt is not None:
-                        response, documents = generate_answer(
+                        response, documents, timings = generate_answer(
                             prompt,
                             api_client,
                             max_nb_words=max_worlds_answers,
                             return_documents=True,
+                            return_timings=True,
                         )
                         st.markdown(response)
-                        append_documents_in_session_manager(prompt, documents)
+                        append_documents_in_session_manager(
+                            prompt, documents, timings
+                        )
                     if response:
                         message = {"role": "assistant", "content": response}
                         st.session_state.messages.append(message)
@@ -169,7 +169,7 @@ else:
                                 f'Something went wrong when submitting documents {loadPayload.fileNames} http response  [{response.status}] -> "{response.status_msg}"'
                             )
                             st.info(
-                                "Please check the error message above. If it is an Error 429 it means that the API is overloaded. Please try again later. If it is an encoding related error you might try to upload files one by one to check which one is causing the error."
+                                "Please check the error message above. If it is an Error 429 Verba is busy with other uploads, retry after the delay given above. If it is an encoding related error you might try to upload files one by one to check which one is causing the error."
                             )
                             st.title("Debug info :")
                             with st.expander("Sent POST payload :"):
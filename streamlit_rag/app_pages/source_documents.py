@@ -4,7 +4,11 @@ import pathlib
 
 import streamlit as st
 from verba_utils.api_client import APIClient, test_api_connection
-from verba_utils.utils import get_prompt_history, get_retrieved_documents_from_prompt
+from verba_utils.utils import (
+    get_prompt_history,
+    get_retrieved_documents_from_prompt,
+    get_timings_from_prompt,
+)
 
 BASE_ST_DIR = pathlib.Path(os.path.dirname(__file__)).parent
 log = logging.getLogger(__name__)
@@ -61,6 +65,21 @@ else:
             index=0,
         )
         retrieved_documents = get_retrieved_documents_from_prompt(chosen_prompt)
+        timings = get_timings_from_prompt(chosen_prompt)
+        if timings:
+            with st.expander(
+                f"⏱️ Answered in {timings.get('total_ms', 0) / 1000:.2f}s"
+            ):
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Weaviate calls", timings.get("weaviate_calls", 0))
+                col2.metric("Prompt tokens", timings.get("prompt_tokens", 0))
+                col3.metric("Completion tokens", timings.get("completion_tokens", 0))
+                st.table(
+                    [
+                        {"stage": stage, "duration (ms)": duration}
+                        for stage, duration in timings.get("stages_ms", {}).items()
+                    ]
+                )
         st.divider()
         for document in retrieved_documents:
             st.text_area(
@@ -1,5 +1,7 @@
+import json
 import logging
-from typing import Dict
+import time
+from typing import Dict, Iterator
 
 import requests
 from pydantic import Field
@@ -21,12 +23,16 @@ from verba_utils.payloads import (
 
 log = logging.getLogger(__name__)
 
+# A busy backend answering with a Retry-After up to this is waited for instead of showing an error
+MAX_QUERY_RETRY_WAIT_S = 10
+
 
 class API_routes(BaseSettings):
     verba_port: str | int = Field(default="8000", env="VERBA_PORT")
     verba_base_url: str = Field(default="http://localhost", env="VERBA_BASE_URL")
     health: str = "health"
     query: str = "query"
+    query_batch: str = "query_batch"
     get_all_documents: str = "get_all_documents"
     get_document: str = "get_document"
     get_components: str = "get_components"
@@ -90,14 +96,31 @@ class APIClient:
         # This is meant to avoid error when verba is starting
         return self.make_request("GET", self.api_routes.health)
 
-    def query(self, data: str) -> QueryResponsePayload:
+    def query(self, data: str, include_timings: bool = False) -> QueryResponsePayload:
+        request = {
+            "query": data.decode('utf-8'),
+            "include_timings": include_timings,
+        }
         response = self.make_request(
             method="POST",
             endpoint=self.api_routes.query,
-            json={
-                "query":data.decode('utf-8')
-            }
+            json=request,
         )
+        if response.status_code == requests.status_codes.codes["too_many_requests"]:
+            # The backend is at capacity, wait as told once when it is short, otherwise tell the user when to retry
+            retry_after = int(response.headers.get("Retry-After", "5"))
+            if retry_after <= MAX_QUERY_RETRY_WAIT_S:
+                log.info(f"Verba backend busy, retrying the query in {retry_after} s")
+                time.sleep(retry_after)
+                response = self.make_request(
+                    method="POST", endpoint=self.api_routes.query, json=request
+                )
+        if response.status_code == requests.status_codes.codes["too_many_requests"]:
+            retry_after = response.headers.get("Retry-After", "a few")
+            return QueryResponsePayload(
+                system=f"The assistant is answering a lot of questions right now, please ask again in {retry_after} seconds.",
+                documents=[],
+            )
         if response.status_code == requests.status_codes.codes["ok"]:
             try:
                 return QueryResponsePayload.model_validate(response.json())
@@ -112,6 +135,28 @@ class APIClient:
             documents=[],
         )
 
+    def query_batch(
+        self, questions: list[str], include_timings: bool = False
+    ) -> Iterator[tuple[int, QueryResponsePayload]]:
+        """Answer a list of questions in one request, answers are yielded as the backend finishes them
+
+        :param list[str] questions: questions to answer
+        :param bool include_timings: add the latency breakdown of every answer
+        :return Iterator[tuple[int, QueryResponsePayload]]: index of the question and its answer, in completion order
+        """
+        response = requests.post(
+            self.build_url(self.api_routes.query_batch),
+            json={"questions": questions, "include_timings": include_timings},
+            stream=True,
+        )
+        if response.status_code != requests.status_codes.codes["ok"]:
+            log.warning(f"POST query_batch returned code [{response.status_code}]")
+            return
+        for line in response.iter_lines():
+            if line:
+                answer = json.loads(line)
+                yield answer["index"], QueryResponsePayload.model_validate(answer)
+
     def get_all_documents(
         self, query: str = "", doc_type: str = ""
     ) -> SearchQueryResponsePayload:
@@ -167,6 +212,20 @@ class APIClient:
                 log.warning(
                     f"Impossible to convert get_all_documents response as SearchQueryResponsePayload : {response.json()}, details : {e}"
                 )
+        elif response.status_code == requests.status_codes.codes["too_many_requests"]:
+            retry_after = response.headers.get("Retry-After", "a few")
+            log.warning(f"Upload rejected by busy verba backend, retry after {retry_after} s")
+            return LoadResponsePayload(
+                status=response.status_code,
+                status_msg=f"Verba is busy importing other documents, please retry in {retry_after} seconds",
+            )
+        elif response.status_code == requests.status_codes.codes["request_entity_too_large"]:
+            # Upload rejected by the memory soft limit of the backend, the message says how much is left
+            log.warning(f"Upload rejected by verba backend : {response.text}")
+            return LoadResponsePayload(
+                status=response.status_code,
+                status_msg=response.json().get("status_msg", response.text),
+            )
         else:
             log.error(
                 f"POST query returned code [{response.status_code}] details {response.content}"
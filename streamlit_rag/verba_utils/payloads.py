@@ -1,15 +1,25 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
 
 class QueryPayload(BaseModel):
     query: str
+    include_timings: bool = False
+
+
+class QueryTimingsPayload(BaseModel):
+    stages_ms: Dict[str, float] = {}
+    total_ms: float = 0
+    weaviate_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
 
 
 class QueryResponsePayload(BaseModel):
     system: str
     documents: List[dict] = []
+    timings: Optional[QueryTimingsPayload] = None
 
 
 class APIKeyPayload(BaseModel):
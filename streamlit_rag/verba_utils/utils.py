@@ -42,7 +42,8 @@ def generate_answer(
     min_nb_words: int = None,
     max_nb_words: int = None,
     return_documents: bool = False,
-) -> str | Tuple[str, List]:
+    return_timings: bool = False,
+) -> str | Tuple[str, List] | Tuple[str, List, Dict]:
     """
     Generate answers to a list of questions. Uses the previously defined query_verba
     :param prompt: str
@@ -50,7 +51,8 @@ def generate_answer(
     :param min_nb_words: int
     :param max_nb_words: int
     :param return_documents: bool default False. If true returns (text_response, documents_list)
-    :returns: str | Tuple(str, List)
+    :param return_timings: bool default False. If true (with return_documents) returns (text_response, documents_list, timings)
+    :returns: str | Tuple(str, List) | Tuple(str, List, Dict)
     """
 
     if max_nb_words is None and min_nb_words is not None:
@@ -67,14 +69,17 @@ def generate_answer(
     log.info(f"Cleaned user query : {elaborated_question}")
 
     if test_api_connection(api_client):
-        response = api_client.query(elaborated_question)
+        response = api_client.query(elaborated_question, include_timings=return_timings)
     else:
         log.error(
             f"Verba API not available {api_client.build_url(api_client.api_routes.health)}, query not submitted"
         )
         response = QueryResponsePayload(system="Verba API not available")
 
-    if return_documents:
+    if return_documents and return_timings:
+        timings = response.timings.model_dump() if response.timings else {}
+        return response.system, response.documents, timings
+    elif return_documents:
         return response.system, response.documents
     else:
         return response.system
@@ -104,17 +109,20 @@ def display_centered_image(
         )
 
 
-def append_documents_in_session_manager(prompt: str, documents: List[Dict]):
+def append_documents_in_session_manager(
+    prompt: str, documents: List[Dict], timings: Dict = None
+):
     """Append retrieved document in streamlit session_manager
     :param str prompt:
     :param List[Dict] documents:
+    :param Dict timings: latency breakdown returned by verba, optional
     """
     if not "retrieved_documents" in st.session_state:
         # init empty list
         st.session_state["retrieved_documents"] = []
 
     st.session_state["retrieved_documents"].append(
-        {"prompt": prompt, "documents": documents}
+        {"prompt": prompt, "documents": documents, "timings": timings or {}}
     )
 
 
@@ -140,6 +148,17 @@ def get_retrieved_documents_from_prompt(prompt: str) -> List[Dict]:
     return []
 
 
+def get_timings_from_prompt(prompt: str) -> Dict:
+    """Get the latency breakdown of the answer to the given prompt
+    :param str prompt:
+    :return Dict: empty if verba did not return timings
+    """
+    for e in reversed(st.session_state["retrieved_documents"]):
+        if e["prompt"] == prompt:
+            return e.get("timings", {})
+    return {}
+
+
 def doc_id_from_filename(
     filename: str, search_query_response: SearchQueryResponsePayload
 ) -> str | None: